@@ -0,0 +1,277 @@
+"""Load-test the API in process against an in-memory Mongo stand-in.
+
+Seeds synthetic incidents and tollgates at each scale, then drives
+concurrent requests at the route, incident listing and stats endpoints
+through the ASGI app (no network, no uvicorn). Reports p50/p95/p99 latency
+and throughput per endpoint and can save the run as a JSON baseline or
+compare against one.
+
+Needs mongomock-motor and httpx. mongomock filters and sorts in Python, so
+/api/incidents numbers at large scales mostly measure the stand-in; use
+--mongo-url for those. Run from the backend directory:
+
+    python benchmarks/bench_api.py
+    python benchmarks/bench_api.py --scales 1000 10000 100000 --concurrency 32 --save baseline.json
+    python benchmarks/bench_api.py --compare baseline.json
+    python benchmarks/bench_api.py --mongo-url mongodb://localhost:27017   # real Mongo instead
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server reads these at import; the client it builds is replaced below
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "safestpath_bench")
+os.environ.setdefault("INCIDENT_SNAPSHOT_PATH", str(Path(tempfile.gettempdir()) / "safestpath_bench_incidents.bin"))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from geo_index import ensure_indexes, geo_point  # noqa: E402
+
+INCIDENT_TYPES = ("harassment", "theft", "unsafe_zone", "assault", "stalking")
+PERCENTILES = (50, 95, 99)
+SEED_CHUNK_SIZE = 10_000
+# A p95 this much slower than the baseline is reported as a regression
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+
+def make_incidents(n, rng, bbox):
+    min_lat, min_lng, max_lat, max_lng = bbox
+    now = datetime.now(timezone.utc)
+    docs = []
+    for _ in range(n):
+        lat, lng = rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)
+        docs.append({
+            "id": str(uuid.uuid4()),
+            "lat": lat,
+            "lng": lng,
+            "incident_type": rng.choice(INCIDENT_TYPES),
+            "severity": rng.randint(1, 5),
+            "description": None,
+            "timestamp": (now - timedelta(seconds=rng.uniform(0, 365 * 86400))).isoformat(),
+            "anonymous": True,
+            "location": geo_point(lat, lng),
+        })
+    return docs
+
+
+def make_tollgates(n, rng, bbox):
+    min_lat, min_lng, max_lat, max_lng = bbox
+    docs = []
+    for i in range(n):
+        lat, lng = rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)
+        docs.append({"id": str(uuid.uuid4()), "lat": lat, "lng": lng, "name": f"Toll {i}", "monitored": True,
+                     "location": geo_point(lat, lng)})
+    return docs
+
+
+def make_route_requests(n, rng, bbox, max_km=10.0):
+    """Random endpoint pairs inside the service area, at most about max_km apart"""
+    min_lat, min_lng, max_lat, max_lng = bbox
+    span = max_km / 111.0
+    bodies = []
+    for _ in range(n):
+        start_lat, start_lng = rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)
+        bodies.append({
+            "start_lat": start_lat,
+            "start_lng": start_lng,
+            "end_lat": min(max_lat, max(min_lat, start_lat + rng.uniform(-span, span))),
+            "end_lng": min(max_lng, max(min_lng, start_lng + rng.uniform(-span, span))),
+        })
+    return bodies
+
+
+async def prepare(db, scale, tollgates, rng, use_indexes):
+    """Seed a fresh database and load it the way the startup hook does"""
+    await db.incidents.drop()
+    await db.tollgates.drop()
+    await db.counters.drop()
+    server.db = db
+    incidents = make_incidents(scale, rng, server.SERVICE_AREA_BBOX)
+    for start in range(0, len(incidents), SEED_CHUNK_SIZE):
+        await db.incidents.insert_many(incidents[start:start + SEED_CHUNK_SIZE])
+    await db.tollgates.insert_many(make_tollgates(tollgates, rng, server.SERVICE_AREA_BBOX))
+    if use_indexes:
+        await ensure_indexes(db)
+
+    started = time.perf_counter()
+    await server.stats_counters.load()
+    await server.incident_snapshot.reload()
+    await server.tollgate_snapshot.reload()
+    await server.rebuild_derived_state()
+    if server.road_graph is None:
+        server.road_graph = server.build_road_graph()
+    load_s = time.perf_counter() - started
+
+    # What a restart pays for the incident store: map the file, catch up from Mongo
+    started = time.perf_counter()
+    mapped = await server.incident_snapshot.load_file()
+    cold_s = time.perf_counter() - started if mapped else None
+    await server.rebuild_derived_state()
+    return load_s, cold_s
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def drive(http, name, make_call, requests, concurrency):
+    """Issue `requests` calls from `concurrency` workers; returns a result summary"""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            t0 = time.perf_counter()
+            response = await make_call(http, i)
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    summary = {"requests": requests, "errors": errors, "seconds": round(elapsed, 3),
+               "throughput_rps": round(requests / elapsed, 1) if elapsed else None}
+    for pct in PERCENTILES:
+        value = percentile(latencies, pct)
+        summary[f"p{pct}_ms"] = round(value * 1000, 2) if value is not None else None
+    print(f"{name:>24} {requests:>6} {summary['throughput_rps']:>9} "
+          + " ".join(f"{summary[f'p{pct}_ms']:>9}" for pct in PERCENTILES)
+          + f" {errors:>6}")
+    return summary
+
+
+def scenarios(route_bodies):
+    return {
+        "POST /api/routes/calculate": lambda http, i: http.post("/api/routes/calculate",
+                                                                json=route_bodies[i % len(route_bodies)]),
+        "GET /api/incidents": lambda http, i: http.get("/api/incidents", params={"limit": 100}),
+        "GET /api/stats": lambda http, i: http.get("/api/stats"),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print p95/throughput deltas against a saved run; returns the number of regressions"""
+    regressions = 0
+    print(f"\ncompared with {baseline.get('revision') or 'baseline'} ({baseline.get('created_at')}):")
+    for scale, endpoints in results["scales"].items():
+        for name, current in endpoints["endpoints"].items():
+            previous = baseline.get("scales", {}).get(scale, {}).get("endpoints", {}).get(name)
+            if not previous or not previous.get("p95_ms") or current["p95_ms"] is None:
+                continue
+            change = current["p95_ms"] / previous["p95_ms"] - 1
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{scale:>8} {name:>28}: p95 {previous['p95_ms']:>8} -> {current['p95_ms']:>8} ms "
+                  f"({change:+.1%}), rps {previous['throughput_rps']} -> {current['throughput_rps']}{flag}")
+    return regressions
+
+
+async def run(args):
+    # server configures INFO logging; one line per request would swamp the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    rng = random.Random(args.seed)
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        mongo = AsyncIOMotorClient(args.mongo_url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        mongo = AsyncMongoMockClient()
+
+    results = {
+        "revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "backend": "mongo" if args.mongo_url else "mongomock",
+        "python": platform.python_version(),
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "seed": args.seed,
+        "scales": {},
+    }
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        for scale in args.scales:
+            load_s, cold_s = await prepare(mongo[f"{args.db_prefix}_{scale}"], scale, args.tollgates, rng,
+                                   use_indexes=bool(args.mongo_url))
+            store = server.incident_snapshot.store
+            print(f"\n{scale} incidents, {args.tollgates} tollgates (snapshot + derived state in {load_s:.2f}s)")
+            if cold_s is not None:
+                print(f"incident store: {store.memory_bytes() // 1024} KiB, mapped from file in {cold_s:.3f}s")
+            print(f"{'endpoint':>24} {'reqs':>6} {'rps':>9} " + " ".join(f"{f'p{p} ms':>9}" for p in PERCENTILES)
+                  + f" {'errors':>6}")
+
+            route_bodies = make_route_requests(args.distinct_routes, rng, server.SERVICE_AREA_BBOX)
+            endpoints = {}
+            for name, call in scenarios(route_bodies).items():
+                # Warm-up pass so first-request costs do not skew the percentiles
+                await drive(http, "(warm-up)", call, min(args.requests, args.concurrency), args.concurrency)
+                endpoints[name] = await drive(http, name, call, args.requests, args.concurrency)
+            results["scales"][str(scale)] = {"load_seconds": round(load_s, 3),
+                                             "cold_load_seconds": round(cold_s, 3) if cold_s is not None else None,
+                                             "incident_store_bytes": store.memory_bytes(), "endpoints": endpoints}
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nsaved {args.save}")
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="incident counts to seed, one run each")
+    parser.add_argument("--tollgates", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint and scale")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--distinct-routes", type=int, default=400,
+                        help="distinct endpoint pairs; fewer than --requests exercises the route cache")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--mongo-url", help="benchmark against a real MongoDB instead of mongomock")
+    parser.add_argument("--db-prefix", default="safestpath_bench")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exits 1 on p95 regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="relative p95 slowdown counted as a regression")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
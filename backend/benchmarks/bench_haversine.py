@@ -0,0 +1,109 @@
+"""Benchmark scalar corridor scoring against the vectorized NumPy engine.
+
+Both sides count incidents within the proximity threshold of any segment
+of a route, as score_routes does through geometry.polyline_distances: the
+scalar side loops over incidents and segments in Python, the NumPy side is
+the serving code.
+
+Run from the backend directory:
+
+    python benchmarks/bench_haversine.py
+    python benchmarks/bench_haversine.py --sizes 10000 100000 --repeat 5
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from geometry import KM_PER_DEGREE, polyline_distances  # noqa: E402
+from haversine import docs_to_arrays  # noqa: E402
+
+PROXIMITY_THRESHOLD_KM = 0.5
+
+# Greater Mumbai bounding box, matching the sample data
+MIN_LAT, MAX_LAT = 18.90, 19.30
+MIN_LNG, MAX_LNG = 72.77, 73.05
+
+
+def scalar_corridor_count(route_points, incidents):
+    """Incidents within the threshold of any segment, one point-to-segment distance at a time"""
+    ref_lat = sum(lat for lat, _ in route_points) / len(route_points)
+    x_scale = KM_PER_DEGREE * math.cos(math.radians(ref_lat))
+    route = [(lng * x_scale, lat * KM_PER_DEGREE) for lat, lng in route_points]
+    count = 0
+    for incident in incidents:
+        px, py = incident['lng'] * x_scale, incident['lat'] * KM_PER_DEGREE
+        for (ax, ay), (bx, by) in zip(route, route[1:]):
+            dx, dy = bx - ax, by - ay
+            length_sq = dx * dx + dy * dy
+            t = min(1.0, max(0.0, ((px - ax) * dx + (py - ay) * dy) / length_sq)) if length_sq > 0 else 0.0
+            if math.hypot(px - (ax + t * dx), py - (ay + t * dy)) < PROXIMITY_THRESHOLD_KM:
+                count += 1
+                break
+    return count
+
+
+def vectorized_corridor_count(route_points, incident_lats, incident_lngs):
+    distance, _ = polyline_distances(incident_lats, incident_lngs, route_points)
+    return int((distance < PROXIMITY_THRESHOLD_KM).sum())
+
+
+def make_incidents(n, rng, min_lat=MIN_LAT, max_lat=MAX_LAT):
+    return [{"lat": rng.uniform(min_lat, max_lat), "lng": rng.uniform(MIN_LNG, MAX_LNG)} for _ in range(n)]
+
+
+def make_route(rng, steps=10, min_lat=MIN_LAT, max_lat=MAX_LAT):
+    start = (rng.uniform(min_lat, max_lat), rng.uniform(MIN_LNG, MAX_LNG))
+    end = (rng.uniform(min_lat, max_lat), rng.uniform(MIN_LNG, MAX_LNG))
+    return [(start[0] + (end[0] - start[0]) * i / steps, start[1] + (end[1] - start[1]) * i / steps)
+            for i in range(steps + 1)]
+
+
+def best_of(fn, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mid_lat = (MIN_LAT + MAX_LAT) / 2
+    scenarios = {
+        # Route in the northern half, incidents in the southern half: no incident
+        # is near, so the scalar loop measures every incident against every segment
+        "clear": lambda size: (make_incidents(size, rng, MIN_LAT, mid_lat - 0.01),
+                               make_route(rng, min_lat=mid_lat + 0.01)),
+        # Incidents everywhere: near ones stop at their first close segment
+        "dense": lambda size: (make_incidents(size, rng), make_route(rng)),
+    }
+
+    print(f"{'scenario':>9} {'incidents':>10} {'scalar ms':>12} {'numpy ms':>12} {'speedup':>9}")
+    for name, scenario in scenarios.items():
+        for size in args.sizes:
+            incidents, route = scenario(size)
+            incident_lats, incident_lngs = docs_to_arrays(incidents)
+
+            scalar_s, scalar_count = best_of(lambda: scalar_corridor_count(route, incidents), args.repeat)
+            numpy_s, numpy_count = best_of(lambda: vectorized_corridor_count(route, incident_lats, incident_lngs),
+                                           args.repeat)
+            assert scalar_count == numpy_count, (scalar_count, numpy_count)
+
+            print(f"{name:>9} {size:>10} {scalar_s * 1000:>12.2f} {numpy_s * 1000:>12.2f} {scalar_s / numpy_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
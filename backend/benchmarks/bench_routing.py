@@ -0,0 +1,69 @@
+"""Benchmark graph construction and A* queries on the service-area road graph.
+
+Run from the backend directory:
+
+    python benchmarks/bench_routing.py
+    python benchmarks/bench_routing.py --step 0.0005 --incidents 50000 --queries 50
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from risk_grid import RiskGrid  # noqa: E402
+from routing import RoadGraph  # noqa: E402
+from spatial_index import haversine_km  # noqa: E402
+
+DEFAULT_BBOX = (18.85, 72.75, 19.35, 73.10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--step", type=float, default=0.001, help="lattice spacing in degrees")
+    parser.add_argument("--incidents", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--safe-weight", type=float, default=1.5, help="heuristic weight for the safest path")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    min_lat, min_lng, max_lat, max_lng = DEFAULT_BBOX
+
+    grid = RiskGrid(min_lat, min_lng, max_lat, max_lng, args.step)
+    started = time.perf_counter()
+    graph = RoadGraph(min_lat, min_lng, max_lat, max_lng, args.step, node_risk=grid.risk.reshape(-1))
+    print(f"graph: {graph.node_count} nodes, {graph.edge_count} edges, built in {time.perf_counter() - started:.2f}s")
+
+    incidents = [{"lat": rng.uniform(min_lat, max_lat), "lng": rng.uniform(min_lng, max_lng),
+                  "severity": rng.randint(1, 5)} for _ in range(args.incidents)]
+    started = time.perf_counter()
+    grid.rebuild(incidents, [])
+    # The rebuild swaps in a new raster
+    graph.set_node_risk(grid.risk.reshape(-1))
+    print(f"risk grid: {args.incidents} incidents stamped in {time.perf_counter() - started:.2f}s")
+
+    for label, max_km in (("short (<5 km)", 5), ("medium (5-15 km)", 15)):
+        timings = {"shortest": [], "safest": []}
+        done = 0
+        while done < args.queries:
+            start = (rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng))
+            end = (rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng))
+            if not max_km - 10 < haversine_km(*start, *end) <= max_km:
+                continue
+            for name, kwargs in (("shortest", {}), ("safest", {"use_risk": True, "heuristic_weight": args.safe_weight})):
+                t0 = time.perf_counter()
+                graph.route(*start, *end, **kwargs)
+                timings[name].append((time.perf_counter() - t0) * 1000)
+            done += 1
+        for name, values in timings.items():
+            values.sort()
+            print(f"{label:>17} {name:>8}: median {statistics.median(values):7.1f} ms, "
+                  f"p95 {values[int(len(values) * 0.95) - 1]:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
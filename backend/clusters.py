@@ -0,0 +1,179 @@
+import math
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MAX_ZOOM = 20
+# Each web-mercator tile is split into CELLS_PER_TILE x CELLS_PER_TILE cells (32 px on 256 px tiles)
+CELLS_PER_TILE = 8
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def tile_xy(lat: float, lng: float, zoom: int) -> Tuple[float, float]:
+    """Fractional web-mercator tile coordinates of a point"""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    n = 2 ** zoom
+    x = (lng + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) of a tile"""
+    n = 2 ** zoom
+    min_lng = x / n * 360.0 - 180.0
+    max_lng = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def tiles_for_bbox(min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+                   zoom: int) -> List[Tuple[int, int]]:
+    """Tiles at zoom that intersect the bounding box"""
+    n = 2 ** zoom
+    x0, y0 = tile_xy(max_lat, min_lng, zoom)
+    x1, y1 = tile_xy(min_lat, max_lng, zoom)
+    xs = range(max(0, int(x0)), min(n - 1, int(x1)) + 1)
+    ys = range(max(0, int(y0)), min(n - 1, int(y1)) + 1)
+    return [(x, y) for x in xs for y in ys]
+
+
+def aggregate_tile_columns(lats: np.ndarray, lngs: np.ndarray, severities: np.ndarray, incident_types: List[str],
+                           x: int, y: int, zoom: int) -> List[dict]:
+    """Bin incident columns into the tile's cells: count, centroid, max severity and type histogram"""
+    if not len(lats):
+        return []
+    n = 2 ** zoom
+    severities = np.asarray(severities, dtype=np.int64)
+
+    clipped = np.radians(np.clip(lats, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    fx = (lngs + 180.0) / 360.0 * n
+    fy = (1.0 - np.arcsinh(np.tan(clipped)) / np.pi) / 2.0 * n
+    inside = (np.floor(fx) == x) & (np.floor(fy) == y)
+    if not inside.any():
+        return []
+
+    cx = np.clip(((fx - x) * CELLS_PER_TILE).astype(np.int64), 0, CELLS_PER_TILE - 1)
+    cy = np.clip(((fy - y) * CELLS_PER_TILE).astype(np.int64), 0, CELLS_PER_TILE - 1)
+    cell = (cy * CELLS_PER_TILE + cx)[inside]
+    size = CELLS_PER_TILE * CELLS_PER_TILE
+
+    counts = np.bincount(cell, minlength=size)
+    lat_sums = np.bincount(cell, weights=lats[inside], minlength=size)
+    lng_sums = np.bincount(cell, weights=lngs[inside], minlength=size)
+    max_severity = np.zeros(size, dtype=np.int64)
+    np.maximum.at(max_severity, cell, severities[inside])
+
+    types: Dict[int, Dict[str, int]] = {}
+    for cell_id, index in zip(cell.tolist(), np.flatnonzero(inside).tolist()):
+        histogram = types.setdefault(cell_id, {})
+        incident_type = incident_types[index]
+        histogram[incident_type] = histogram.get(incident_type, 0) + 1
+
+    cells = []
+    for cell_id in np.flatnonzero(counts).tolist():
+        count = int(counts[cell_id])
+        cells.append({
+            "lat": float(lat_sums[cell_id] / count),
+            "lng": float(lng_sums[cell_id] / count),
+            "count": count,
+            "max_severity": int(max_severity[cell_id]),
+            "types": types[cell_id],
+        })
+    return cells
+
+
+class TileCache:
+    """LRU cache of aggregated tiles keyed by (zoom, x, y).
+
+    New incidents evict only the tiles that contain them, one per zoom level;
+    a full data reload clears everything.
+    """
+
+    def __init__(self, max_tiles: int = 4096):
+        self.max_tiles = max_tiles
+        self._tiles: "OrderedDict[Tuple[int, int, int], List[dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[int, int, int]) -> Optional[List[dict]]:
+        cells = self._tiles.get(key)
+        if cells is None:
+            self.misses += 1
+            return None
+        self._tiles.move_to_end(key)
+        self.hits += 1
+        return cells
+
+    def put(self, key: Tuple[int, int, int], cells: List[dict]) -> None:
+        self._tiles[key] = cells
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_points(self, points: Iterable[Tuple[float, float]]) -> None:
+        """Evict every cached tile containing one of the points"""
+        keys = set()
+        for lat, lng in points:
+            for zoom in range(MAX_ZOOM + 1):
+                x, y = tile_xy(lat, lng, zoom)
+                keys.add((zoom, int(x), int(y)))
+        for key in keys:
+            self._tiles.pop(key, None)
+
+    def clear(self) -> None:
+        self._tiles.clear()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "tiles": len(self._tiles),
+            "max_tiles": self.max_tiles,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def cluster_pipeline(match: dict, zoom: int) -> List[dict]:
+    """Aggregation pipeline grouping incidents into lat/lng cells for uncached datasets.
+
+    Cells are equal-degree squares the width of a tile cell at this zoom,
+    which approximates the mercator cells of the in-memory path.
+    """
+    cell_deg = 360.0 / (2 ** zoom * CELLS_PER_TILE)
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "row": {"$floor": {"$divide": ["$lat", cell_deg]}},
+                "col": {"$floor": {"$divide": ["$lng", cell_deg]}},
+                "type": "$incident_type",
+            },
+            "count": {"$sum": 1},
+            "lat_sum": {"$sum": "$lat"},
+            "lng_sum": {"$sum": "$lng"},
+            "max_severity": {"$max": "$severity"},
+        }},
+        {"$group": {
+            "_id": {"row": "$_id.row", "col": "$_id.col"},
+            "count": {"$sum": "$count"},
+            "lat_sum": {"$sum": "$lat_sum"},
+            "lng_sum": {"$sum": "$lng_sum"},
+            "max_severity": {"$max": "$max_severity"},
+            "types": {"$push": {"k": "$_id.type", "v": "$count"}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "lat": {"$divide": ["$lat_sum", "$count"]},
+            "lng": {"$divide": ["$lng_sum", "$count"]},
+            "count": 1,
+            "max_severity": 1,
+            "types": {"$arrayToObject": "$types"},
+        }},
+    ]
@@ -0,0 +1,72 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from metrics import registry
+
+T = TypeVar("T")
+
+COALESCED_REQUESTS = registry.counter("safestpath_coalesced_requests_total",
+                                      "Coalescable requests by endpoint and role (leader computed, follower shared)",
+                                      ("endpoint", "role"))
+
+
+class SingleFlight:
+    """Collapses concurrent identical requests into one in-flight computation.
+
+    The first caller for a key (the leader) starts the computation as its
+    own task; callers arriving with the same key while it runs (followers)
+    await that task and share its result or exception. Nothing is kept once
+    it finishes, so this only merges overlapping requests; RouteCache and
+    the snapshots handle repeats over time.
+
+    The task is shielded from its callers: a client that disconnects does
+    not cancel work the others are waiting on. Results are shared objects
+    and must be treated as read-only.
+
+    key() normalizes request parameters. With precision_deg set, float parts
+    are snapped to that grid, so requests a few metres apart coalesce too.
+    """
+
+    def __init__(self, name: str, precision_deg: Optional[float] = None):
+        self.name = name
+        self.precision_deg = precision_deg or None
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def key(self, *parts: Hashable) -> Tuple[Hashable, ...]:
+        if self.precision_deg is None:
+            return parts
+        snap = self.precision_deg
+        return tuple(round(part / snap) if isinstance(part, float) else part for part in parts)
+
+    async def run(self, key: Hashable, fn: Callable[..., Awaitable[T]], *args) -> T:
+        """Await fn(*args), or the identical computation already running for key"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.followers += 1
+            COALESCED_REQUESTS.inc(self.name, "follower")
+        else:
+            self.leaders += 1
+            COALESCED_REQUESTS.inc(self.name, "leader")
+            task = asyncio.ensure_future(fn(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Every waiter may have gone; retrieve the exception so it is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, object]:
+        calls = self.leaders + self.followers
+        return {
+            "precision_deg": self.precision_deg,
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesced_ratio": round(self.followers / calls, 4) if calls else 0.0,
+        }
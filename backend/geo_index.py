@@ -0,0 +1,97 @@
+import logging
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, UpdateOne
+from pymongo.errors import OperationFailure, PyMongoError
+
+from spatial_index import degree_window
+
+logger = logging.getLogger(__name__)
+
+# GeoJSON field mirrored from the flat lat/lng fields for 2dsphere queries
+LOCATION_FIELD = "location"
+
+# Above this span a 2% pad no longer covers the geodesic bulge of the edges
+MAX_POLYGON_SPAN_DEG = 10.0
+
+
+def geo_point(lat: float, lng: float) -> Dict[str, object]:
+    """GeoJSON point for (lat, lng); GeoJSON orders coordinates lng, lat"""
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+async def migrate_locations(collection, batch_size: int = 1000) -> int:
+    """Backfill the GeoJSON location field on documents that only have flat lat/lng.
+
+    Uses a single pipeline update where the server supports it (MongoDB 4.2+)
+    and falls back to batched per-document updates otherwise. Returns the
+    number of documents migrated.
+    """
+    missing = {LOCATION_FIELD: {"$exists": False}, "lat": {"$type": "number"}, "lng": {"$type": "number"}}
+    try:
+        result = await collection.update_many(
+            missing, [{"$set": {LOCATION_FIELD: {"type": "Point", "coordinates": ["$lng", "$lat"]}}}]
+        )
+        return result.modified_count
+    except (OperationFailure, NotImplementedError, TypeError, ValueError):
+        pass
+
+    migrated = 0
+    batch = []
+    async for doc in collection.find(missing, {"_id": 1, "lat": 1, "lng": 1}):
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {LOCATION_FIELD: geo_point(doc["lat"], doc["lng"])}}))
+        if len(batch) >= batch_size:
+            migrated += (await collection.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        migrated += (await collection.bulk_write(batch, ordered=False)).modified_count
+    return migrated
+
+
+async def ensure_indexes(db) -> None:
+    """Create the geo and query indexes used by the API (idempotent)"""
+    specs: List[Tuple[str, list, dict]] = [
+        ("incidents", [(LOCATION_FIELD, GEOSPHERE)], {"name": "location_2dsphere"}),
+        ("incidents", [("severity", DESCENDING), ("timestamp", DESCENDING)], {"name": "severity_timestamp"}),
+        ("incidents", [("timestamp", DESCENDING), ("id", DESCENDING)], {"name": "timestamp_id"}),
+        ("incidents", [("id", ASCENDING)], {"name": "id_unique", "unique": True}),
+        ("tollgates", [(LOCATION_FIELD, GEOSPHERE)], {"name": "location_2dsphere"}),
+    ]
+    for collection_name, keys, options in specs:
+        try:
+            await db[collection_name].create_index(keys, **options)
+        except PyMongoError as e:
+            # Typically a document with out-of-range coordinates; queries still work unindexed
+            logger.warning(f"Could not create index {options['name']} on {collection_name}: {e}")
+
+
+def polygon_filter(min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> Dict[str, object]:
+    """$geoWithin filter for a lat/lng rectangle (edges are geodesics, as GeoJSON requires)"""
+    ring = [[min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat], [min_lng, max_lat], [min_lng, min_lat]]
+    return {LOCATION_FIELD: {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}}
+
+
+def corridor_filter(start_lat: float, start_lng: float, end_lat: float, end_lng: float,
+                    buffer_km: float) -> Dict[str, object]:
+    """$geoWithin filter for the start/end bounding box grown by buffer_km on every side"""
+    dlat, dlng = degree_window(max(abs(start_lat), abs(end_lat)), buffer_km)
+    return polygon_filter(max(-90.0, min(start_lat, end_lat) - dlat), max(-180.0, min(start_lng, end_lng) - dlng),
+                          min(90.0, max(start_lat, end_lat) + dlat), min(180.0, max(start_lng, end_lng) + dlng))
+
+
+def bbox_filter(min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> Dict[str, object]:
+    """Exact lat/lng rectangle filter that can still use the 2dsphere index.
+
+    Geodesic polygon edges bow away from lines of constant latitude, so the
+    indexed $geoWithin polygon is padded and the flat lat/lng range trims the
+    result back to the exact rectangle. Very large boxes skip the polygon.
+    """
+    query: Dict[str, object] = {}
+    if max_lat - min_lat <= MAX_POLYGON_SPAN_DEG and max_lng - min_lng <= MAX_POLYGON_SPAN_DEG:
+        pad_lat = 0.02 * (max_lat - min_lat) + 1e-6
+        pad_lng = 0.02 * (max_lng - min_lng) + 1e-6
+        query = polygon_filter(max(-90.0, min_lat - pad_lat), max(-180.0, min_lng - pad_lng),
+                               min(90.0, max_lat + pad_lat), min(180.0, max_lng + pad_lng))
+    query["lat"] = {"$gte": min_lat, "$lte": max_lat}
+    query["lng"] = {"$gte": min_lng, "$lte": max_lng}
+    return query
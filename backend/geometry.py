@@ -0,0 +1,95 @@
+"""Point-to-polyline geometry for route corridors.
+
+Distances use a local equirectangular projection around the polyline's
+mean latitude. Over city-scale corridors (a few tenths of a degree) this
+stays within 0.1% of the haversine distance, and it makes point-to-segment
+projection plain vector arithmetic.
+"""
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from haversine import EARTH_RADIUS_KM, as_coordinate_arrays
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+# Upper bound on elements in a single point x segment block (~8 MB per float64 matrix)
+MATRIX_BLOCK_ELEMENTS = 1_000_000
+
+
+def project(lats: np.ndarray, lngs: np.ndarray, ref_lat: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Planar (x, y) in km around ref_lat"""
+    x = np.asarray(lngs, dtype=np.float64) * (KM_PER_DEGREE * math.cos(math.radians(ref_lat)))
+    y = np.asarray(lats, dtype=np.float64) * KM_PER_DEGREE
+    return x, y
+
+
+def segment_lengths(points: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """Length in km of each segment of a polyline"""
+    lats, lngs = as_coordinate_arrays(points)
+    if len(lats) < 2:
+        return np.zeros(0)
+    x, y = project(lats, lngs, float(lats.mean()))
+    return np.hypot(np.diff(x), np.diff(y))
+
+
+def polyline_distances(lats: np.ndarray, lngs: np.ndarray,
+                       polyline: Sequence[Tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Distance from each point to the nearest segment of the polyline, and where that is.
+
+    Returns (distance_km, along_km): along_km is the distance along the
+    polyline from its start to the point's closest position on it. A
+    single-point polyline degenerates to point distances.
+    """
+    n = len(lats)
+    distance = np.full(n, np.inf)
+    along = np.zeros(n)
+    route_lats, route_lngs = as_coordinate_arrays(polyline)
+    if n == 0 or len(route_lats) == 0:
+        return distance, along
+
+    ref_lat = float(route_lats.mean())
+    px, py = project(lats, lngs, ref_lat)
+    rx, ry = project(route_lats, route_lngs, ref_lat)
+    if len(rx) == 1:
+        return np.hypot(px - rx[0], py - ry[0]), along
+
+    ax, ay = rx[:-1], ry[:-1]
+    dx, dy = np.diff(rx), np.diff(ry)
+    length_sq = dx * dx + dy * dy
+    length = np.sqrt(length_sq)
+    start_along = np.concatenate(([0.0], np.cumsum(length)[:-1]))
+    safe_sq = np.where(length_sq > 0, length_sq, 1.0)
+
+    rows = max(1, MATRIX_BLOCK_ELEMENTS // len(ax))
+    for start in range(0, n, rows):
+        bx = px[start:start + rows, None]
+        by = py[start:start + rows, None]
+        # Projection parameter of each point on each segment, clamped to the segment
+        t = np.clip(((bx - ax) * dx + (by - ay) * dy) / safe_sq, 0.0, 1.0)
+        dist = np.hypot(bx - (ax + t * dx), by - (ay + t * dy))
+        nearest = dist.argmin(axis=1)
+        picked = np.arange(len(nearest))
+        distance[start:start + rows] = dist[picked, nearest]
+        along[start:start + rows] = start_along[nearest] + t[picked, nearest] * length[nearest]
+    return distance, along
+
+
+def densify(points: Sequence[Tuple[float, float]], max_segment_km: float) -> List[Tuple[float, float]]:
+    """Insert evenly spaced points so no segment is longer than max_segment_km.
+
+    Segments already short enough are left alone, so dense inputs (lattice
+    paths) cost nothing and long straight runs get just enough points.
+    """
+    if len(points) < 2:
+        return list(points)
+    lengths = segment_lengths(points)
+    result = [tuple(points[0])]
+    for (lat1, lng1), (lat2, lng2), length in zip(points, points[1:], lengths.tolist()):
+        pieces = max(1, math.ceil(length / max_segment_km))
+        for i in range(1, pieces):
+            t = i / pieces
+            result.append((lat1 + (lat2 - lat1) * t, lng1 + (lng2 - lng1) * t))
+        result.append((lat2, lng2))
+    return result
@@ -0,0 +1,35 @@
+"""Vectorized haversine distances on NumPy arrays.
+
+All functions take degrees and return kilometres, matching
+spatial_index.haversine_km for scalar inputs.
+"""
+from typing import Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_to_many(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Distances from one point to every point in (lats, lngs)"""
+    lat_rad = np.radians(lat)
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    delta_lat = lats_rad - lat_rad
+    delta_lng = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(lat_rad) * np.cos(lats_rad) * np.sin(delta_lng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def as_coordinate_arrays(points: Sequence[Tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Split a sequence of (lat, lng) tuples into two float64 arrays"""
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return coords[:, 0], coords[:, 1]
+
+
+def docs_to_arrays(docs: Sequence[dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Extract lat/lng arrays from documents with 'lat'/'lng' keys"""
+    n = len(docs)
+    lats = np.fromiter((doc['lat'] for doc in docs), dtype=np.float64, count=n)
+    lngs = np.fromiter((doc['lng'] for doc in docs), dtype=np.float64, count=n)
+    return lats, lngs
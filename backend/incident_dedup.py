@@ -0,0 +1,191 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+from geo_index import LOCATION_FIELD
+from haversine import haversine_to_many
+from incident_query import iso_utc
+from incident_store import IncidentStore
+from risk_model import parse_timestamp
+from spatial_index import EARTH_RADIUS_KM, SpatialIndex, degree_window
+
+# Most candidates a Mongo lookup considers before picking the nearest
+MAX_MATCH_CANDIDATES = 20
+# The only fields a fold updates; nothing derived from incidents reads them
+FOLD_FIELDS = ("report_count", "last_reported_at")
+
+
+async def migrate_report_counts(collection) -> int:
+    """Set report_count = 1 on incidents stored before reports were folded; returns the number updated"""
+    result = await collection.update_many({"report_count": {"$exists": False}}, {"$set": {"report_count": 1}})
+    return result.modified_count
+
+
+class IncidentDeduplicator:
+    """Folds repeat reports of one event into a single incident at ingest.
+
+    A report duplicates an incident of the same incident_type closer than
+    radius_km whose timestamp is within window_seconds of its own, in
+    either direction because imports may be backdated. The matched incident
+    keeps its position, severity and first-report timestamp; its
+    report_count grows and last_reported_at moves forward. Nothing derived
+    from incidents changes, so route risk and stats count distinct events.
+    A later report of higher severity therefore does not raise the stored
+    severity: that would restamp the risk grid and shift severity counters
+    on every fold, and the first report is usually the best observed.
+
+    Reports in one batch are first folded into each other with a SpatialIndex.
+    Each survivor is then screened against the in-process IncidentStore:
+    when the store is complete and has no candidate, the report is new
+    without a database round trip. Otherwise Mongo is asked, since another
+    worker may have written the match.
+
+    Matching and inserting are not one atomic step, so callers reserve()
+    their reports first and release() them once stored or folded. A report
+    that could fold into one already reserved waits for it to be written,
+    then looks again; unrelated reports never wait on each other. Two
+    workers receiving the same event at the same moment can still both
+    store it, since no unique key exists for "near in space and time".
+    """
+
+    def __init__(self, radius_km: float = 0.1, window_seconds: float = 3600):
+        self.radius_km = radius_km
+        self.window_seconds = window_seconds
+        # Reports reserved by this worker, and the futures their waiters await
+        self._reserved = SpatialIndex()
+        self._released: Dict[int, asyncio.Future] = {}
+        self.folded_in_batch = 0
+        self.folded_into_existing = 0
+        self.screened = 0
+        self.lookups = 0
+
+    def _within_window(self, a: Optional[float], b: Optional[float]) -> bool:
+        return a is not None and b is not None and abs(a - b) <= self.window_seconds
+
+    def _same_event(self, index: SpatialIndex, doc: dict) -> Optional[dict]:
+        """A report in index that doc would fold into, if any"""
+        reported = parse_timestamp(doc.get('timestamp'))
+        return next(index.nearby(doc['lat'], doc['lng'], self.radius_km,
+                                 lambda other: other['incident_type'] == doc['incident_type']
+                                 and self._within_window(parse_timestamp(other['timestamp']), reported)),
+                    None)
+
+    def fold_batch(self, docs: List[dict]) -> List[dict]:
+        """Fold duplicates within docs into the first report of each event; returns the survivors"""
+        index = SpatialIndex()
+        survivors = []
+        for doc in docs:
+            match = self._same_event(index, doc)
+            if match is not None:
+                match['report_count'] = match.get('report_count', 1) + doc.get('report_count', 1)
+                match['last_reported_at'] = max(match.get('last_reported_at') or match['timestamp'],
+                                                doc.get('last_reported_at') or doc['timestamp'])
+                self.folded_in_batch += 1
+                continue
+            index.insert(doc)
+            survivors.append(doc)
+        return survivors
+
+    async def reserve(self, docs: List[dict]) -> None:
+        """Wait until none of docs could fold into a reserved report, then reserve them all.
+
+        The check and the reservation run in one event-loop step. Callers
+        never wait while holding reservations, so concurrent batches cannot
+        deadlock. Pass reports already folded with fold_batch().
+        """
+        while True:
+            blocker = next((match for match in (self._same_event(self._reserved, doc) for doc in docs)
+                            if match is not None), None)
+            if blocker is None:
+                break
+            # Shielded: a cancelled waiter must not cancel the future other waiters share
+            await asyncio.shield(self._released[id(blocker)])
+        loop = asyncio.get_running_loop()
+        for doc in docs:
+            self._reserved.insert(doc)
+            self._released[id(doc)] = loop.create_future()
+
+    def release(self, docs: List[dict]) -> None:
+        """Drop reservations once the reports are stored or folded, waking their waiters"""
+        for doc in docs:
+            future = self._released.pop(id(doc), None)
+            if future is not None:
+                self._reserved.remove(doc)
+                future.set_result(None)
+
+    def may_match(self, store: IncidentStore, doc: dict) -> bool:
+        """False when the store (holding every incident) has no incident the report could fold into"""
+        code = store.code_of(doc['incident_type'])
+        reported = parse_timestamp(doc.get('timestamp'))
+        if code is None or reported is None:
+            self.screened += 1
+            return False
+        rows = store.within(doc['lat'], doc['lng'], self.radius_km)
+        if np.any((rows.type_code == code) & (np.abs(rows.ts - reported) <= self.window_seconds)):
+            return True
+        self.screened += 1
+        return False
+
+    def _match_filter(self, doc: dict, geo: bool = True) -> Dict[str, object]:
+        reported = datetime.fromtimestamp(parse_timestamp(doc['timestamp']), timezone.utc)
+        window = timedelta(seconds=self.window_seconds)
+        match: Dict[str, object] = {
+            "incident_type": doc['incident_type'],
+            "timestamp": {"$gte": iso_utc(reported - window), "$lte": iso_utc(reported + window)},
+            "id": {"$ne": doc['id']},
+        }
+        if geo:
+            match[LOCATION_FIELD] = {"$geoWithin": {"$centerSphere": [[doc['lng'], doc['lat']],
+                                                                      self.radius_km / EARTH_RADIUS_KM]}}
+        else:
+            dlat, dlng = degree_window(doc['lat'], self.radius_km)
+            match["lat"] = {"$gte": doc['lat'] - dlat, "$lte": doc['lat'] + dlat}
+            match["lng"] = {"$gte": doc['lng'] - dlng, "$lte": doc['lng'] + dlng}
+        return match
+
+    async def _nearest_match(self, collection, doc: dict) -> Optional[dict]:
+        self.lookups += 1
+        projection = {"_id": 0, "id": 1, "lat": 1, "lng": 1}
+        try:
+            candidates = await collection.find(self._match_filter(doc), projection).to_list(MAX_MATCH_CANDIDATES)
+        except (OperationFailure, NotImplementedError):
+            # No geo query support (e.g. documents without a location): match on the flat fields
+            candidates = await collection.find(self._match_filter(doc, geo=False),
+                                               projection).to_list(MAX_MATCH_CANDIDATES)
+        if not candidates:
+            return None
+        lats = np.array([c['lat'] for c in candidates])
+        lngs = np.array([c['lng'] for c in candidates])
+        distance = haversine_to_many(doc['lat'], doc['lng'], lats, lngs)
+        nearest = int(distance.argmin())
+        return candidates[nearest] if distance[nearest] < self.radius_km else None
+
+    async def fold(self, collection, doc: dict, projection: Optional[dict] = None) -> Optional[dict]:
+        """Fold doc into the nearest matching stored incident; returns it updated, or None if there is none"""
+        match = await self._nearest_match(collection, doc)
+        if match is None:
+            return None
+        merged = await collection.find_one_and_update(
+            {"id": match['id']},
+            {"$inc": {"report_count": doc.get('report_count', 1)},
+             "$max": {"last_reported_at": doc.get('last_reported_at') or doc['timestamp']}},
+            projection=projection, return_document=ReturnDocument.AFTER,
+        )
+        if merged is not None:
+            self.folded_into_existing += 1
+        return merged
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "radius_km": self.radius_km,
+            "window_seconds": self.window_seconds,
+            "folded_in_batch": self.folded_in_batch,
+            "folded_into_existing": self.folded_into_existing,
+            "screened": self.screened,
+            "lookups": self.lookups,
+            "reserved": len(self._reserved),
+        }
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+Bbox = Tuple[float, float, float, float]
+
+# Marker queued for a subscriber that fell behind: it should refetch instead of replaying
+RESYNC = object()
+
+
+class Subscription:
+    """One subscriber's bounded queue of incidents inside its viewport"""
+
+    def __init__(self, bbox: Optional[Bbox], max_queue: int):
+        self.bbox = bbox
+        self.queue: "asyncio.Queue[object]" = asyncio.Queue(maxsize=max_queue)
+        self.lagged = False
+
+    def wants(self, incident: dict) -> bool:
+        if self.bbox is None:
+            return True
+        min_lat, min_lng, max_lat, max_lng = self.bbox
+        return min_lat <= incident['lat'] <= max_lat and min_lng <= incident['lng'] <= max_lng
+
+    def offer(self, incident: dict) -> bool:
+        """Queue an incident without blocking; returns False once the subscriber has lagged.
+
+        A full queue is dropped and replaced by a single RESYNC marker, so a
+        slow client costs bounded memory and never slows down publishers.
+        """
+        if self.lagged:
+            return False
+        try:
+            self.queue.put_nowait(incident)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            self.lagged = True
+            return False
+
+    async def next(self, timeout: float) -> Optional[object]:
+        """Next queued item, or None if nothing arrived within timeout"""
+        try:
+            item = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if item is RESYNC:
+            self.lagged = False
+        return item
+
+
+class IncidentFeed:
+    """In-process fan-out of newly created incidents to viewport subscribers"""
+
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._subscribers: Set[Subscription] = set()
+        self.published = 0
+        self.queued = 0
+        self.resyncs = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, bbox: Optional[Bbox] = None) -> Subscription:
+        subscription = Subscription(bbox, self.max_queue)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, incidents: Iterable[dict]) -> None:
+        """Hand incidents to every subscriber whose viewport contains them"""
+        for incident in incidents:
+            self.published += 1
+            for subscription in self._subscribers:
+                if not subscription.wants(incident):
+                    continue
+                was_lagged = subscription.lagged
+                if subscription.offer(incident):
+                    self.queued += 1
+                elif not was_lagged:
+                    self.resyncs += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "subscribers": len(self._subscribers),
+            "lagged": sum(1 for s in self._subscribers if s.lagged),
+            "published": self.published,
+            "queued": self.queued,
+            "resyncs": self.resyncs,
+        }
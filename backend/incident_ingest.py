@@ -0,0 +1,54 @@
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Tuple, Union
+
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+
+# A parsed row, or the reason it could not be parsed
+ParsedRow = Union[Dict[str, object], str]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines without holding the whole body"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace").rstrip("\r")
+
+
+async def iter_records(chunks: AsyncIterator[bytes], is_csv: bool) -> AsyncIterator[Tuple[int, ParsedRow]]:
+    """Yield (line number, row dict or parse error) for an NDJSON or CSV body.
+
+    CSV needs a header row and one record per line; empty cells are
+    dropped so optional fields fall back to their defaults. Blank lines
+    are skipped in both formats.
+    """
+    header: List[str] = []
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        if is_csv:
+            values = next(csv.reader([line]))
+            if not header:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            yield line_no, {name: value for name, value in zip(header, values) if value != ""}
+        else:
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, "Expected a JSON object"
+                continue
+            yield line_no, row
@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from geo_index import bbox_filter
+
+# Keyset order for incident listings: newest first, id breaks timestamp ties
+INCIDENT_SORT = [("timestamp", -1), ("id", -1)]
+
+
+def encode_cursor(timestamp: str, incident_id: str) -> str:
+    """Opaque pagination cursor for the last incident on a page"""
+    raw = json.dumps([timestamp, incident_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, incident_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(timestamp, str) or not isinstance(incident_id, str):
+        raise ValueError("Invalid cursor")
+    return timestamp, incident_id
+
+
+def iso_utc(value: datetime) -> str:
+    """ISO string comparable with stored timestamps (naive values are taken as UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def parse_bbox(bbox: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    """Parse 'min_lat,min_lng,max_lat,max_lng'; raises ValueError on malformed input"""
+    if bbox is None:
+        return None
+    parts = bbox.split(",")
+    try:
+        if len(parts) != 4:
+            raise ValueError
+        min_lat, min_lng, max_lat, max_lng = (float(p) for p in parts)
+    except ValueError as e:
+        raise ValueError("bbox must be four comma-separated numbers: min_lat,min_lng,max_lat,max_lng") from e
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+        raise ValueError("bbox is out of range or inverted")
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def incident_filter(bbox: Optional[Tuple[float, float, float, float]] = None,
+                    since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    min_severity: Optional[int] = None, max_severity: Optional[int] = None,
+                    cursor: Optional[Tuple[str, str]] = None) -> Dict[str, object]:
+    """Mongo filter for an incident listing.
+
+    Timestamps are stored as UTC ISO strings, which sort chronologically as
+    plain strings, so time windows and cursors compare strings directly.
+    """
+    clauses: List[Dict[str, object]] = []
+    if bbox is not None:
+        clauses.append(bbox_filter(*bbox))
+
+    timestamp: Dict[str, str] = {}
+    if since is not None:
+        timestamp["$gte"] = iso_utc(since)
+    if until is not None:
+        timestamp["$lt"] = iso_utc(until)
+    if timestamp:
+        clauses.append({"timestamp": timestamp})
+
+    severity: Dict[str, int] = {}
+    if min_severity is not None:
+        severity["$gte"] = min_severity
+    if max_severity is not None:
+        severity["$lte"] = max_severity
+    if severity:
+        clauses.append({"severity": severity})
+
+    if cursor is not None:
+        last_timestamp, last_id = cursor
+        clauses.append({"$or": [
+            {"timestamp": {"$lt": last_timestamp}},
+            {"timestamp": last_timestamp, "id": {"$lt": last_id}},
+        ]})
+
+    if not clauses:
+        return {}
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
@@ -0,0 +1,593 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from haversine import haversine_to_many
+from risk_model import NO_TIMESTAMP, parse_timestamp
+from snapshot import CollectionSnapshot
+from spatial_index import MAX_POLYLINE_CELLS, degree_window, polyline_window
+
+logger = logging.getLogger(__name__)
+
+CELL_SIZE_DEG = 0.01
+# Cell key = (row + KEY_OFFSET) * KEY_STRIDE + (col + KEY_OFFSET); covers the globe at 0.01 degrees
+KEY_OFFSET = 1 << 19
+KEY_STRIDE = 1 << 20
+# Appended rows are merged into the sorted base once this many accumulate
+TAIL_MERGE_SIZE = 4096
+
+SNAPSHOT_MAGIC = b"SPINCID\0"
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_ALIGNMENT = 64
+# Catch-up re-reads this much before the saved watermark (see IncidentSnapshot)
+WATERMARK_MARGIN_SECONDS = 300
+
+COLUMN_DTYPES = {"lat": np.float64, "lng": np.float64, "severity": np.int8, "ts": np.int64, "type_code": np.int16}
+
+
+class IncidentRows(NamedTuple):
+    """Column slices for a selection of incidents"""
+    lat: np.ndarray
+    lng: np.ndarray
+    severity: np.ndarray
+    ts: np.ndarray
+    type_code: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def take(self, mask_or_index: np.ndarray) -> "IncidentRows":
+        return IncidentRows(*(column[mask_or_index] for column in self))
+
+
+def empty_rows() -> IncidentRows:
+    return IncidentRows(*(np.zeros(0, dtype=dtype) for dtype in COLUMN_DTYPES.values()))
+
+
+def cell_keys(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    rows = np.floor(np.asarray(lats) / CELL_SIZE_DEG).astype(np.int64)
+    cols = np.floor(np.asarray(lngs) / CELL_SIZE_DEG).astype(np.int64)
+    return (rows + KEY_OFFSET) * KEY_STRIDE + (cols + KEY_OFFSET)
+
+
+def _cell(lat: float, lng: float) -> Tuple[int, int]:
+    return math.floor(lat / CELL_SIZE_DEG), math.floor(lng / CELL_SIZE_DEG)
+
+
+def encode_ids(ids: Iterable[str]) -> np.ndarray:
+    """Ids as a fixed-width bytes array (UTF-8, so any id fits)"""
+    return np.array([incident_id.encode() for incident_id in ids], dtype="S")
+
+
+class _Base(NamedTuple):
+    """Immutable cell-sorted columns, in memory or mapped from a snapshot file"""
+    columns: IncidentRows
+    keys: np.ndarray
+    ids: np.ndarray
+
+
+class _Tail:
+    """Rows appended since the last merge, kept in Python lists"""
+
+    def __init__(self):
+        self.columns: Dict[str, list] = {name: [] for name in COLUMN_DTYPES}
+        self.ids: set = set()
+        self.size = 0
+        self._arrays: Optional[Tuple[int, IncidentRows, np.ndarray]] = None
+
+    def arrays(self) -> Tuple[IncidentRows, np.ndarray]:
+        """Tail columns and cell keys as arrays, cached until the next append"""
+        size = self.size
+        cached = self._arrays
+        if cached is None or cached[0] != size:
+            rows = IncidentRows(*(np.array(self.columns[name][:size], dtype=dtype)
+                                  for name, dtype in COLUMN_DTYPES.items()))
+            cached = self._arrays = (size, rows, cell_keys(rows.lat, rows.lng))
+        return cached[1], cached[2]
+
+
+class IncidentStore:
+    """Columnar incident store with a cell-sorted base and an append tail.
+
+    Each incident costs about 27 bytes of columns: float64 lat/lng, int8
+    severity, int64 epoch-second timestamp and an int16 code into an
+    interned incident-type table. Ids are kept once, UTF-8 encoded and
+    sorted, for duplicate checks only. The base is sorted by 0.01 degree
+    cell, so a cell's rows are one contiguous slice. It is never modified
+    in place and may be a read-only memory map of a snapshot file. New rows go to a tail that
+    queries scan directly; the tail is merged into a fresh base every
+    TAIL_MERGE_SIZE rows.
+
+    Queries return IncidentRows (gathered column arrays), never per-record
+    objects. Readers on other threads see a consistent state because the
+    base and tail are swapped together in one attribute assignment.
+    """
+
+    def __init__(self, types: Optional[List[str]] = None):
+        self.types: List[str] = list(types or [])
+        self._type_codes: Dict[str, int] = {name: code for code, name in enumerate(self.types)}
+        self._state: Tuple[_Base, _Tail] = (self._build_base(empty_rows(), np.zeros(0, dtype="S1")), _Tail())
+        self.mapped_path: Optional[Path] = None
+
+    def __len__(self) -> int:
+        base, tail = self._state
+        return len(base.keys) + tail.size
+
+    @staticmethod
+    def _build_base(rows: IncidentRows, ids: np.ndarray) -> _Base:
+        keys = cell_keys(rows.lat, rows.lng)
+        order = np.argsort(keys, kind="stable")
+        return _Base(rows.take(order), keys[order], np.sort(ids))
+
+    # Writes (event loop only)
+
+    def type_code(self, incident_type: str) -> int:
+        code = self._type_codes.get(incident_type)
+        if code is None:
+            code = self._type_codes[incident_type] = len(self.types)
+            self.types.append(incident_type)
+        return code
+
+    def code_of(self, incident_type: str) -> Optional[int]:
+        """Interned code of an incident type, or None if no stored incident has it"""
+        return self._type_codes.get(incident_type)
+
+    def contains_id(self, incident_id: str) -> bool:
+        base, tail = self._state
+        if incident_id in tail.ids:
+            return True
+        encoded = incident_id.encode()
+        if not len(base.ids) or len(encoded) > base.ids.dtype.itemsize:
+            return False
+        position = int(np.searchsorted(base.ids, encoded))
+        return position < len(base.ids) and base.ids[position] == encoded
+
+    @staticmethod
+    def _doc_id(doc: dict) -> str:
+        """The document's id, else its Mongo _id, else a fresh one so id-less rows stay distinct"""
+        incident_id = doc.get('id')
+        if incident_id is None:
+            incident_id = doc.get('_id')
+        return str(incident_id) if incident_id is not None else uuid.uuid4().hex
+
+    def _row(self, doc: dict) -> Tuple[float, float, int, int, int]:
+        reported = parse_timestamp(doc.get('timestamp'))
+        return (float(doc['lat']), float(doc['lng']), int(doc.get('severity') or 0),
+                int(reported) if reported is not None else NO_TIMESTAMP,
+                self.type_code(str(doc.get('incident_type', 'unknown'))))
+
+    def add(self, doc: dict) -> bool:
+        """Append an incident document; returns False if its id is already stored"""
+        incident_id = self._doc_id(doc)
+        if self.contains_id(incident_id):
+            return False
+        _, tail = self._state
+        for column, value in zip(tail.columns.values(), self._row(doc)):
+            column.append(value)
+        tail.ids.add(incident_id)
+        # Published last so readers never see a partially appended row
+        tail.size += 1
+        if tail.size >= TAIL_MERGE_SIZE:
+            self.merge()
+        return True
+
+    def extend(self, docs: Iterable[dict]) -> int:
+        """Append many documents; returns how many were new.
+
+        Batches of TAIL_MERGE_SIZE or more skip the tail: ids are checked
+        against the base in one pass and the rows go straight into a merge.
+        """
+        docs = list(docs)
+        if len(docs) < TAIL_MERGE_SIZE:
+            return sum(1 for doc in docs if self.add(doc))
+
+        base, tail = self._state
+        seen = set(tail.ids)
+        new_docs, new_ids = [], []
+        for doc in docs:
+            incident_id = self._doc_id(doc)
+            if incident_id not in seen:
+                seen.add(incident_id)
+                new_docs.append(doc)
+                new_ids.append(incident_id)
+        ids = encode_ids(new_ids)
+        if len(base.ids) and len(ids):
+            fresh = ~np.isin(ids, base.ids)
+            ids = ids[fresh]
+            new_docs = [doc for doc, keep in zip(new_docs, fresh.tolist()) if keep]
+        if not new_docs:
+            return 0
+
+        values = list(zip(*(self._row(doc) for doc in new_docs)))
+        new_rows = IncidentRows(*(np.array(column, dtype=dtype)
+                                  for column, dtype in zip(values, COLUMN_DTYPES.values())))
+        tail_rows, _ = tail.arrays()
+        rows = IncidentRows(*(np.concatenate(parts) for parts in zip(base.columns, tail_rows, new_rows)))
+        all_ids = np.concatenate((base.ids, encode_ids(sorted(tail.ids)), ids))
+        self._state = (self._build_base(rows, all_ids), _Tail())
+        self.mapped_path = None
+        return len(new_docs)
+
+    def merge(self) -> None:
+        """Fold the tail into a new sorted base"""
+        base, tail = self._state
+        if not tail.size:
+            return
+        tail_rows, _ = tail.arrays()
+        rows = IncidentRows(*(np.concatenate((b, t)) for b, t in zip(base.columns, tail_rows)))
+        ids = np.concatenate((base.ids, encode_ids(sorted(tail.ids))))
+        self._state = (self._build_base(rows, ids), _Tail())
+        self.mapped_path = None
+
+    # Reads (any thread)
+
+    def _select(self, lo_keys: np.ndarray, hi_keys: np.ndarray, tail_mask_fn) -> IncidentRows:
+        """Base rows with a cell key in any [lo, hi] range, plus tail rows picked by tail_mask_fn"""
+        base, tail = self._state
+        starts = np.searchsorted(base.keys, lo_keys, "left")
+        ends = np.searchsorted(base.keys, hi_keys, "right")
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        if len(starts):
+            lengths = ends - starts
+            index = np.repeat(ends - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+            selected = base.columns.take(index)
+        else:
+            selected = empty_rows()
+        if tail.size:
+            tail_rows, tail_keys = tail.arrays()
+            picked = tail_rows.take(tail_mask_fn(tail_rows, tail_keys))
+            if len(picked):
+                selected = IncidentRows(*(np.concatenate((a, b)) for a, b in zip(selected, picked)))
+        return selected
+
+    def all(self) -> IncidentRows:
+        base, tail = self._state
+        if not tail.size:
+            return base.columns
+        tail_rows, _ = tail.arrays()
+        return IncidentRows(*(np.concatenate((b, t)) for b, t in zip(base.columns, tail_rows)))
+
+    def candidates(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> IncidentRows:
+        """Incidents in cells overlapping the bounding box (superset of the box)"""
+        row0, col0 = _cell(min_lat, min_lng)
+        row1, col1 = _cell(max_lat, max_lng)
+        # Keys are row-major, so each row of the box is one contiguous key range
+        rows = np.arange(row0, row1 + 1, dtype=np.int64) + KEY_OFFSET
+        lo_keys = rows * KEY_STRIDE + (col0 + KEY_OFFSET)
+        hi_keys = rows * KEY_STRIDE + (col1 + KEY_OFFSET)
+        lo_row, hi_row = row0 + KEY_OFFSET, row1 + KEY_OFFSET
+        lo_col, hi_col = col0 + KEY_OFFSET, col1 + KEY_OFFSET
+
+        def in_box(_rows, tail_keys):
+            key_rows, key_cols = np.divmod(tail_keys, KEY_STRIDE)
+            return (key_rows >= lo_row) & (key_rows <= hi_row) & (key_cols >= lo_col) & (key_cols <= hi_col)
+
+        return self._select(lo_keys, hi_keys, in_box)
+
+    def polyline_candidates(self, points: Sequence[Tuple[float, float]], radius_km: float) -> IncidentRows:
+        """Incidents in cells that could lie within radius_km of any segment of the polyline.
+
+        Segments are walked in cell-sized pieces, as in SpatialIndex, and
+        past MAX_POLYLINE_CELLS visited cells the bounding box is used instead.
+        """
+        points = list(points)
+        if not points:
+            return empty_rows()
+        if len(points) == 1:
+            points = points * 2
+        wanted = set()
+        visited = 0
+        for (lat1, lng1), (lat2, lng2) in zip(points, points[1:]):
+            pieces = max(1, math.ceil(max(abs(lat2 - lat1), abs(lng2 - lng1)) / CELL_SIZE_DEG))
+            for i in range(pieces):
+                a, b = i / pieces, (i + 1) / pieces
+                piece_lats = (lat1 + (lat2 - lat1) * a, lat1 + (lat2 - lat1) * b)
+                piece_lngs = (lng1 + (lng2 - lng1) * a, lng1 + (lng2 - lng1) * b)
+                min_lat, max_lat = min(piece_lats), max(piece_lats)
+                min_lng, max_lng = min(piece_lngs), max(piece_lngs)
+                dlat, dlng = degree_window(max(abs(min_lat), abs(max_lat)), radius_km)
+                row0, col0 = _cell(min_lat - dlat, min_lng - dlng)
+                row1, col1 = _cell(max_lat + dlat, max_lng + dlng)
+                visited += (row1 - row0 + 1) * (col1 - col0 + 1)
+                if visited > MAX_POLYLINE_CELLS:
+                    return self.candidates(*polyline_window(points, radius_km))
+                wanted.update((row + KEY_OFFSET) * KEY_STRIDE + col + KEY_OFFSET
+                              for row in range(row0, row1 + 1) for col in range(col0, col1 + 1))
+        wanted_keys = np.fromiter(wanted, dtype=np.int64, count=len(wanted))
+        wanted_keys.sort()
+        return self._select(wanted_keys, wanted_keys, lambda _rows, tail_keys: np.isin(tail_keys, wanted_keys))
+
+    def within(self, lat: float, lng: float, radius_km: float) -> IncidentRows:
+        """Incidents strictly closer than radius_km to (lat, lng)"""
+        dlat, dlng = degree_window(lat, radius_km)
+        rows = self.candidates(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+        if not len(rows):
+            return rows
+        return rows.take(haversine_to_many(lat, lng, rows.lat, rows.lng) < radius_km)
+
+    def fingerprint(self) -> Tuple[int, int, float, float]:
+        """(count, severity sum, lat sum, lng sum), to compare against the collection"""
+        rows = self.all()
+        return (len(rows), int(rows.severity.sum(dtype=np.int64)), float(rows.lat.sum()), float(rows.lng.sum()))
+
+    def type_names(self, codes: np.ndarray) -> List[str]:
+        types = self.types
+        return [types[code] for code in codes.tolist()]
+
+    def memory_bytes(self) -> int:
+        """Bytes held by column arrays (mapped pages included)"""
+        base, tail = self._state
+        return (sum(column.nbytes for column in base.columns) + base.keys.nbytes + base.ids.nbytes
+                + tail.size * 64)
+
+    # Snapshot files
+
+    def save(self, path: Path, meta: Optional[dict] = None) -> None:
+        """Write the base (call merge() first) as a versioned snapshot, atomically replacing path"""
+        base, _ = self._state
+        arrays = {**base.columns._asdict(), "keys": base.keys, "ids": base.ids}
+        header = {"count": len(base.keys), "types": self.types, "meta": meta or {},
+                  "created_at": datetime.now(timezone.utc).isoformat(), "columns": []}
+        # Offsets depend on the header length, so lay out with a fixed-width placeholder first
+        offset = 0
+        for name, array in arrays.items():
+            header["columns"].append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape),
+                                      "offset": offset})
+            offset += -(-array.nbytes // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+        header_bytes = json.dumps(header).encode()
+        data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + len(header_bytes)) // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(np.array([SNAPSHOT_FORMAT_VERSION, len(header_bytes)], dtype="<u4").tobytes())
+            f.write(header_bytes)
+            for column, array in zip(header["columns"], arrays.values()):
+                f.seek(data_start + column["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def remap(self, path: Path) -> bool:
+        """Swap the in-memory base for the same rows mapped from the file save() just wrote.
+
+        Returns False if the base was merged again meanwhile (merges only
+        ever grow it), in which case the in-memory base is kept.
+        """
+        mapped, _ = IncidentStore.load(path)
+        base, tail = self._state
+        if len(mapped._state[0].keys) != len(base.keys):
+            return False
+        self._state = (mapped._state[0], tail)
+        self.mapped_path = Path(path)
+        return True
+
+    @classmethod
+    def load(cls, path: Path) -> Tuple["IncidentStore", dict]:
+        """Map a snapshot file read-only; returns (store, meta). Raises ValueError if unreadable"""
+        path = Path(path)
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not an incident snapshot")
+            version, header_len = np.frombuffer(f.read(8), dtype="<u4").tolist()
+            if version != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(f"{path} has snapshot format {version}, expected {SNAPSHOT_FORMAT_VERSION}")
+            header = json.loads(f.read(header_len))
+        data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + header_len) // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+        arrays = {}
+        for column in header["columns"]:
+            dtype, shape = np.dtype(column["dtype"]), tuple(column["shape"])
+            if math.prod(shape) == 0:
+                arrays[column["name"]] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[column["name"]] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + column["offset"],
+                                                   shape=shape)
+        store = cls(header["types"])
+        columns = IncidentRows(*(arrays[name] for name in COLUMN_DTYPES))
+        store._state = (_Base(columns, arrays["keys"], arrays["ids"]), _Tail())
+        store.mapped_path = path
+        return store, header["meta"]
+
+
+class IncidentSnapshot(CollectionSnapshot):
+    """CollectionSnapshot of the incidents collection held as an IncidentStore.
+
+    get() returns the store instead of a document list. Full reloads
+    stream the collection in batches, never holding it as dicts, and then
+    persist the store to `path`. At startup load_file() maps that file and
+    fetches only documents inserted since it was written. Catch-up goes by
+    ObjectId, which is insertion time, so backdated imports are not missed.
+    Deletes and edits made while the process was down are not visible that
+    way, so the caught-up store is checked against a count and column sums
+    computed by the database, and load_file() declines the file (the
+    caller then reloads) if they differ.
+
+    The watermark is the newest ObjectId seen, from scans, the change
+    stream and advance_watermark(). Writers in other processes can commit
+    a slightly older ObjectId later, so catch-up re-reads the last
+    WATERMARK_MARGIN_SECONDS before it; rows already held are skipped.
+
+    Only one process should write a given path: save() does nothing while
+    is_writer() returns False (e.g. in shared-state followers).
+    """
+
+    def __init__(self, name: str, collection, projection: Optional[dict] = None, ttl_seconds: float = 300,
+                 max_documents: int = 1_000_000, path: Optional[str] = None, batch_size: int = 10_000,
+                 is_writer: Callable[[], bool] = lambda: True):
+        super().__init__(name, collection, projection, ttl_seconds, max_documents)
+        self.store = IncidentStore()
+        self.docs = self.store
+        self.path = Path(path) if path else None
+        self.batch_size = batch_size
+        self.is_writer = is_writer
+        self.watermark: Optional[ObjectId] = None
+        self._saved_version: Optional[int] = None
+        self.cold_loads = 0
+        self.caught_up = 0
+        self.saves = 0
+
+    def _set_store(self, store: IncidentStore) -> None:
+        self.store = store
+        self.docs = store
+
+    async def _scan(self, query: dict, store: IncidentStore) -> int:
+        """Stream matching documents into store, advancing the watermark; returns rows added"""
+        projection = {field: include for field, include in self.projection.items() if field != "_id"} or None
+        added = 0
+        batch: List[dict] = []
+        async for doc in self._collection().find(query, projection).sort("_id", 1).batch_size(self.batch_size):
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                added += self._absorb(batch, store)
+                batch = []
+                # Let requests run between batches of a large scan
+                await asyncio.sleep(0)
+        if batch:
+            added += self._absorb(batch, store)
+        return added
+
+    def _absorb(self, docs: List[dict], store: IncidentStore) -> int:
+        self.advance_watermark(docs[-1].get("_id"))
+        return store.extend(docs)
+
+    def advance_watermark(self, oid: object) -> None:
+        """Record that the document with this _id is in the store"""
+        if isinstance(oid, ObjectId) and (self.watermark is None or oid > self.watermark):
+            self.watermark = oid
+
+    def _saw_insert(self, doc: dict) -> None:
+        self.advance_watermark(doc.get("_id"))
+
+    async def reload(self) -> None:
+        """Rebuild the store from the whole collection and persist it"""
+        async with self._lock:
+            collection = self._collection()
+            count = await collection.count_documents({})
+            store = IncidentStore()
+            if count > self.max_documents:
+                if not self.oversized:
+                    logger.warning(f"{self.name} snapshot evicted: {count} documents exceeds {self.max_documents}")
+                self.oversized = True
+            else:
+                self.watermark = None
+                await self._scan({}, store)
+                store.merge()
+                self.oversized = False
+
+            self._set_store(store)
+            self.version += 1
+            self.loaded_at = time.monotonic()
+            self._stale = False
+            self.reloads += 1
+            if not self.oversized:
+                await self.save()
+
+            for listener in self._reload_listeners:
+                await listener(store)
+
+    async def load_file(self) -> bool:
+        """Map the persisted store and catch up on newer inserts; False if there is no usable file.
+
+        A file whose caught-up rows no longer match the collection is not usable either.
+        """
+        if self.path is None or not self.path.exists():
+            return False
+        try:
+            store, meta = await asyncio.to_thread(IncidentStore.load, self.path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring {self.name} snapshot file {self.path}: {e}")
+            return False
+        async with self._lock:
+            self.watermark = ObjectId(meta["watermark"]) if meta.get("watermark") else None
+            query = {}
+            if self.watermark is not None:
+                since = self.watermark.generation_time - timedelta(seconds=WATERMARK_MARGIN_SECONDS)
+                query = {"_id": {"$gt": ObjectId.from_datetime(since)}}
+            caught_up = await self._scan(query, store)
+            expected = await self._collection_fingerprint()
+            if not self._matches(store.fingerprint(), expected):
+                logger.warning(f"{self.name} snapshot file {self.path} is out of date "
+                               f"({len(store)} rows mapped, {expected[0]} in the collection); reloading")
+                return False
+            self._set_store(store)
+            self.oversized = False
+            self.version += 1
+            self.loaded_at = time.monotonic()
+            self._stale = False
+            self.cold_loads += 1
+            self.caught_up += caught_up
+        logger.info(f"Mapped {self.name} snapshot {self.path} ({len(store)} rows, {caught_up} caught up)")
+        return True
+
+    async def _collection_fingerprint(self) -> Tuple[int, int, float, float]:
+        """The same sums as IncidentStore.fingerprint(), computed by the database"""
+        pipeline = [{"$group": {"_id": None, "count": {"$sum": 1}, "severity": {"$sum": "$severity"},
+                                "lat": {"$sum": "$lat"}, "lng": {"$sum": "$lng"}}}]
+        groups = await self._collection().aggregate(pipeline).to_list(1)
+        if not groups:
+            return 0, 0, 0.0, 0.0
+        group = groups[0]
+        return int(group["count"]), int(group["severity"]), float(group["lat"]), float(group["lng"])
+
+    @staticmethod
+    def _matches(held: Tuple[int, int, float, float], expected: Tuple[int, int, float, float]) -> bool:
+        return held[:2] == expected[:2] and bool(np.allclose(held[2:], expected[2:], rtol=1e-9, atol=1e-6))
+
+    async def save(self) -> None:
+        """Persist the store if it changed and this process is the writer, then back it by the file"""
+        if self.path is None or self.oversized or self._saved_version == self.version or not self.is_writer():
+            return
+        store, version = self.store, self.version
+        store.merge()
+        meta = {"watermark": str(self.watermark) if self.watermark is not None else None, "version": version}
+        try:
+            await asyncio.to_thread(store.save, self.path, meta)
+            # Same rows, but in the page cache instead of process memory
+            store.remap(self.path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not persist {self.name} snapshot to {self.path}: {e}")
+            return
+        self._saved_version = version
+        self.saves += 1
+
+    async def run_saver(self, interval_seconds: float) -> None:
+        """Persist every interval_seconds until cancelled, and once more on cancel"""
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                await self.save()
+        except asyncio.CancelledError:
+            await self.save()
+            raise
+
+    def apply_insert(self, doc: dict) -> bool:
+        if self.oversized or not self.store.add(doc):
+            return False
+        self.version += 1
+        self.patches += 1
+        return True
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            **super().stats(),
+            "memory_bytes": self.store.memory_bytes(),
+            "mapped": self.store.mapped_path is not None,
+            "cold_loads": self.cold_loads,
+            "caught_up": self.caught_up,
+            "saves": self.saves,
+        }
@@ -0,0 +1,284 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and three additions under a lock"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(counts), total[0])) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.label_names, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += counts[-1]
+            inf = _format_labels(self.label_names, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+REQUEST_SECONDS = registry.histogram("safestpath_request_duration_seconds", "HTTP request latency",
+                                     ("method", "endpoint"))
+REQUESTS = registry.counter("safestpath_requests_total", "HTTP requests by status", ("method", "endpoint", "status"))
+PHASE_SECONDS = registry.histogram("safestpath_phase_duration_seconds", "Latency of instrumented request phases",
+                                   ("endpoint", "phase"))
+MONGO_COMMANDS = registry.counter("safestpath_mongo_commands_total", "Mongo commands sent", ("command",))
+MONGO_COMMAND_SECONDS = registry.histogram("safestpath_mongo_command_duration_seconds",
+                                           "Mongo command round-trip time", ("command",))
+MONGO_COMMANDS_PER_REQUEST = registry.histogram("safestpath_mongo_commands_per_request",
+                                                "Mongo commands issued while serving one request",
+                                                ("endpoint",), buckets=COUNT_BUCKETS)
+
+EVENT_LOOP_LAG_SECONDS = registry.histogram("safestpath_event_loop_lag_seconds",
+                                            "How late the event loop woke a periodic probe")
+
+
+async def monitor_event_loop(interval_seconds: float = 0.25) -> None:
+    """Record event-loop lag until cancelled; CPU work on the loop shows up as lag"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval_seconds
+        await asyncio.sleep(interval_seconds)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+
+
+class RequestMetrics:
+    """Per-request state, shared with Motor's executor threads through a context variable"""
+    __slots__ = ("scope", "mongo_commands")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.mongo_commands = 0
+
+    @property
+    def endpoint(self) -> str:
+        return endpoint_label(self.scope)
+
+
+_current_request: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "safestpath_request_metrics", default=None
+)
+_endpoint_paths: Dict[Callable, str] = {}
+
+
+def endpoint_label(scope: dict) -> str:
+    """Route path template of the matched endpoint (bounded cardinality), or 'unmatched'"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _endpoint_paths.get(endpoint)
+    if path is None:
+        app = scope.get("app")
+        for route in getattr(app, "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                path = route.path
+                break
+        else:
+            path = getattr(endpoint, "__name__", "unknown")
+        _endpoint_paths[endpoint] = path
+    return path
+
+
+def record_phase(name: str, seconds: float) -> None:
+    request = _current_request.get()
+    PHASE_SECONDS.observe(seconds, request.endpoint if request is not None else "background", name)
+
+
+class phase:
+    """Time a named phase of the current request, as a context manager or a decorator.
+
+        with phase("db_fetch"): ...
+
+        @phase("safety_scan")
+        def score_routes(...): ...
+    """
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._start = 0.0
+
+    def __enter__(self) -> "phase":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        record_phase(self.name, time.perf_counter() - self._start)
+
+    def __call__(self, fn: Callable) -> Callable:
+        name = self.name
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    record_phase(name, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_phase(name, time.perf_counter() - start)
+        return wrapper
+
+
+class MongoCommandCounter(monitoring.CommandListener):
+    """Counts and times Mongo commands, attributing them to the request that issued them"""
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        MONGO_COMMANDS.inc(event.command_name)
+        request = _current_request.get()
+        if request is not None:
+            request.mongo_commands += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, event.command_name)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and Mongo command count per endpoint.
+
+    Latency runs until the last body chunk is sent, so streamed responses
+    are measured in full.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics(scope)
+        token = _current_request.set(request)
+        start = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            endpoint = request.endpoint
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], endpoint)
+            REQUESTS.inc(scope["method"], endpoint, str(status))
+            MONGO_COMMANDS_PER_REQUEST.observe(request.mongo_commands, endpoint)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
+            _current_request.reset(token)
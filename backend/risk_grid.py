@@ -0,0 +1,260 @@
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from geometry import densify, polyline_distances
+from haversine import as_coordinate_arrays, haversine_to_many
+from risk_model import DecayModel
+from spatial_index import degree_window
+
+TOLLGATE_BONUS = 0.3
+RISK_RADIUS_KM = 0.5
+
+
+class RiskGrid:
+    """Raster of per-cell risk over the service area.
+
+    Cell (row, col) is centred on (min_lat + row * step, min_lng + col * step),
+    which is also the routing lattice node with the same index. Layers:
+
+    - risk: time-decayed, severity-weighted incident density minus
+      tollgate coverage, stamped on cells whose centre is within
+      RISK_RADIUS_KM. The routing lattice reads this layer.
+    - incident_weight / incident_count: decayed weight sum and number of
+      the incidents whose nearest cell centre is this cell. Route scoring
+      reads these through corridor_cells() instead of re-weighing every
+      incident near the route.
+
+    Weights are relative to decay_epoch (see DecayModel): corridor_cells()
+    ages them to the time asked for, and rebuilds re-base the epoch.
+    """
+
+    def __init__(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float, cell_size_deg: float,
+                 radius_km: float = RISK_RADIUS_KM, decay: Optional[DecayModel] = None):
+        self.min_lat = min_lat
+        self.min_lng = min_lng
+        self.step_deg = cell_size_deg
+        self.radius_km = radius_km
+        self.rows = int(round((max_lat - min_lat) / cell_size_deg)) + 1
+        self.cols = int(round((max_lng - min_lng) / cell_size_deg)) + 1
+        self.max_lat = min_lat + (self.rows - 1) * cell_size_deg
+        self.max_lng = min_lng + (self.cols - 1) * cell_size_deg
+
+        self.decay = decay or DecayModel()
+        self.decay_epoch = time.time()
+
+        self.risk = np.zeros((self.rows, self.cols), dtype=np.float32)
+        self.incident_weight = np.zeros((self.rows, self.cols), dtype=np.float32)
+        self.incident_count = np.zeros((self.rows, self.cols), dtype=np.int32)
+        self.version = 0
+        # The incident layers only vouch for empty cells once a rebuild has run
+        self.ready = False
+        self._lock = threading.Lock()
+        # Incidents added while each in-progress rebuild runs (see begin_rebuild)
+        self._journals: List[List[dict]] = []
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.rows, self.cols
+
+    def _empty_layers(self) -> Dict[str, np.ndarray]:
+        return {"risk": np.zeros(self.shape, dtype=np.float32),
+                "incident_weight": np.zeros(self.shape, dtype=np.float32),
+                "incident_count": np.zeros(self.shape, dtype=np.int32)}
+
+    def _set_layers(self, layers: Dict[str, np.ndarray]) -> None:
+        """Swap in a full set of layers; call with the lock held"""
+        self.risk = layers["risk"]
+        self.incident_weight = layers["incident_weight"]
+        self.incident_count = layers["incident_count"]
+
+    def cells_of(self, lats: np.ndarray, lngs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vectorized nearest-cell lookup: (rows, cols, inside mask); outside points map to cell 0"""
+        rows = np.rint((np.asarray(lats, dtype=np.float64) - self.min_lat) / self.step_deg).astype(np.int64)
+        cols = np.rint((np.asarray(lngs, dtype=np.float64) - self.min_lng) / self.step_deg).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        return np.where(inside, rows, 0), np.where(inside, cols, 0), inside
+
+    def _window(self, lat: float, lng: float, radius_km: Optional[float] = None) -> Tuple[slice, slice]:
+        """Cells whose extent overlaps the radius window around (lat, lng)"""
+        dlat, dlng = degree_window(lat, self.radius_km if radius_km is None else radius_km)
+        row0 = max(0, int(round((lat - dlat - self.min_lat) / self.step_deg)))
+        row1 = min(self.rows - 1, int(round((lat + dlat - self.min_lat) / self.step_deg)))
+        col0 = max(0, int(round((lng - dlng - self.min_lng) / self.step_deg)))
+        col1 = min(self.cols - 1, int(round((lng + dlng - self.min_lng) / self.step_deg)))
+        return slice(row0, row1 + 1), slice(col0, col1 + 1)
+
+    def _stamp(self, risk: np.ndarray, lat: float, lng: float, weight: float) -> None:
+        rows, cols = self._window(lat, lng)
+        if rows.start >= rows.stop or cols.start >= cols.stop:
+            return
+
+        centre_lats = self.min_lat + np.arange(rows.start, rows.stop) * self.step_deg
+        centre_lngs = self.min_lng + np.arange(cols.start, cols.stop) * self.step_deg
+        dist = haversine_to_many(lat, lng, np.repeat(centre_lats, len(centre_lngs)),
+                                 np.tile(centre_lngs, len(centre_lats)))
+        mask = (dist < self.radius_km).reshape(len(centre_lats), len(centre_lngs))
+        risk[rows, cols][mask] += weight
+
+    def _stamp_columns(self, layers: Dict[str, np.ndarray], lats: np.ndarray, lngs: np.ndarray,
+                       weights: np.ndarray) -> None:
+        """Stamp incidents onto every layer: their radius on risk, their own cell on the others"""
+        for lat, lng, weight in zip(np.asarray(lats).tolist(), np.asarray(lngs).tolist(), weights.tolist()):
+            self._stamp(layers["risk"], lat, lng, weight)
+        rows, cols, inside = self.cells_of(lats, lngs)
+        np.add.at(layers["incident_weight"], (rows[inside], cols[inside]), weights[inside])
+        np.add.at(layers["incident_count"], (rows[inside], cols[inside]), 1)
+
+    def _stamp_incidents(self, layers: Dict[str, np.ndarray], incidents: Iterable[dict], reference: float) -> None:
+        incidents = list(incidents)
+        if not incidents:
+            return
+        now = time.time()
+        weights = np.array([self.decay.weight(incident, reference, now) for incident in incidents])
+        self._stamp_columns(layers, np.array([incident['lat'] for incident in incidents], dtype=np.float64),
+                            np.array([incident['lng'] for incident in incidents], dtype=np.float64), weights)
+
+    def add_incidents(self, incidents: Iterable[dict]) -> None:
+        """Stamp a batch of new incidents onto the current raster with one version bump.
+
+        Weights are taken relative to the current decay epoch, so existing
+        cells do not need to be re-aged. Rebuilds in progress journal the
+        batch and replay it onto their raster before swapping it in.
+
+        The lock only covers reading the raster and journaling, never the
+        stamping, so this does not wait on a rebuild. Call it from one
+        thread (the event loop): concurrent stamps could lose increments.
+        """
+        incidents = list(incidents)
+        with self._lock:
+            layers, epoch = self.layers(), self.decay_epoch
+            for journal in self._journals:
+                journal.extend(incidents)
+            self.version += 1
+        # A swap after this point has replayed the batch from its journal
+        self._stamp_incidents(layers, incidents, epoch)
+
+    def begin_rebuild(self) -> List[dict]:
+        """Start journaling add_incidents() for a rebuild; returns the journal to pass to it.
+
+        Call this right before reading the incidents the rebuild will use,
+        with nothing added in between, so each incident lands on the new
+        raster exactly once.
+        """
+        journal: List[dict] = []
+        with self._lock:
+            self._journals.append(journal)
+        return journal
+
+    def _build(self, stamp_incidents: Callable[[Dict[str, np.ndarray], float], None], tollgates: Iterable[dict],
+               journal: Optional[List[dict]]) -> None:
+        """Stamp fresh layers and replay the journal outside the lock; the lock covers only the swap"""
+        now = time.time()
+        try:
+            layers = self._empty_layers()
+            stamp_incidents(layers, now)
+            for tollgate in tollgates:
+                self._stamp(layers["risk"], tollgate['lat'], tollgate['lng'], -TOLLGATE_BONUS)
+            replayed = 0
+            while True:
+                with self._lock:
+                    pending = journal[replayed:] if journal is not None else []
+                    if not pending:
+                        self._set_layers(layers)
+                        self.decay_epoch = now
+                        self.ready = True
+                        self.version += 1
+                        break
+                # Replay outside the lock; loop until nothing new arrived meanwhile
+                self._stamp_incidents(layers, pending, now)
+                replayed += len(pending)
+        finally:
+            if journal is not None:
+                with self._lock:
+                    self._journals.remove(journal)
+
+    def rebuild(self, incidents: Iterable[dict], tollgates: Iterable[dict],
+                journal: Optional[List[dict]] = None) -> None:
+        """Recompute every layer from scratch, re-basing the decay epoch to now.
+
+        Layers are built into new arrays; readers keep the previous ones
+        until the swap, so they never see a partly stamped grid. Callers
+        holding a reference to `risk` (the routing lattice) must re-read it.
+        """
+        self._build(lambda layers, now: self._stamp_incidents(layers, incidents, now), tollgates, journal)
+
+    def rebuild_columns(self, lats: np.ndarray, lngs: np.ndarray, severities: np.ndarray, timestamps: np.ndarray,
+                        tollgates: Iterable[dict], journal: Optional[List[dict]] = None) -> None:
+        """rebuild() from incident columns (see IncidentStore) instead of documents"""
+        def stamp(layers: Dict[str, np.ndarray], now: float) -> None:
+            self._stamp_columns(layers, lats, lngs, self.decay.column_weights(severities, timestamps, now, now))
+
+        self._build(stamp, tollgates, journal)
+
+    def clear(self) -> None:
+        """Swap in empty layers; corridor_cells() declines until the next rebuild"""
+        with self._lock:
+            self._set_layers(self._empty_layers())
+            self.ready = False
+            self.version += 1
+
+    def layers(self) -> Dict[str, np.ndarray]:
+        """The layers by name, for publishing to other processes"""
+        return {"risk": self.risk, "incident_weight": self.incident_weight, "incident_count": self.incident_count}
+
+    def adopt(self, layers: dict, decay_epoch: float) -> None:
+        """Replace every layer with arrays built elsewhere (e.g. mapped from another worker's rebuild)"""
+        for name, layer in layers.items():
+            if layer.shape != self.shape:
+                raise ValueError(f"{name} layer has shape {layer.shape}, expected {self.shape}")
+        with self._lock:
+            self._set_layers(layers)
+            self.decay_epoch = decay_epoch
+            self.ready = True
+            self.version += 1
+
+    def corridor_cells(self, polyline: Sequence[Tuple[float, float]], radius_km: float,
+                       now: Optional[float] = None) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Incident weight (aged to `now`) and count of each occupied cell near the polyline.
+
+        A cell is near if its centre is strictly closer than radius_km to
+        some segment, so incidents are placed to within half a cell. Returns
+        (weights, counts, along_km), or None if the grid cannot answer:
+        before the first rebuild, or when the corridor leaves the grid.
+        """
+        with self._lock:
+            weight, count, epoch, ready = self.incident_weight, self.incident_count, self.decay_epoch, self.ready
+        lats, lngs = as_coordinate_arrays(polyline)
+        if not ready or not len(lats):
+            return None
+        dlat, dlng = degree_window(float(np.abs(lats).max()), radius_km)
+        half = self.step_deg / 2
+        if (lats.min() - dlat < self.min_lat - half or lats.max() + dlat > self.max_lat + half
+                or lngs.min() - dlng < self.min_lng - half or lngs.max() + dlng > self.max_lng + half):
+            return None
+
+        # Cells near a vertex of the route densified to radius_km spacing cover the corridor
+        dlat, dlng = degree_window(float(np.abs(lats).max()), 1.5 * radius_km)
+        row0, col0 = (max(0, int(math.floor((lats.min() - dlat - self.min_lat) / self.step_deg))),
+                      max(0, int(math.floor((lngs.min() - dlng - self.min_lng) / self.step_deg))))
+        row1, col1 = (min(self.rows - 1, int(math.ceil((lats.max() + dlat - self.min_lat) / self.step_deg))),
+                      min(self.cols - 1, int(math.ceil((lngs.max() + dlng - self.min_lng) / self.step_deg))))
+        near = np.zeros((row1 - row0 + 1, col1 - col0 + 1), dtype=bool)
+        for lat, lng in densify(list(zip(lats.tolist(), lngs.tolist())), radius_km):
+            rows, cols = self._window(lat, lng, 1.5 * radius_km)
+            near[rows.start - row0:rows.stop - row0, cols.start - col0:cols.stop - col0] = True
+        rows, cols = np.nonzero(near & (count[row0:row1 + 1, col0:col1 + 1] > 0))
+        rows += row0
+        cols += col0
+        distance, along = polyline_distances(self.min_lat + rows * self.step_deg, self.min_lng + cols * self.step_deg,
+                                             polyline)
+        hit = distance < radius_km
+        rows, cols = rows[hit], cols[hit]
+        factor = self.decay.factor((time.time() if now is None else now) - epoch)
+        return weight[rows, cols].astype(np.float64) * factor, count[rows, cols].astype(np.int64), along[hit]
+
+    def memory_bytes(self) -> int:
+        return sum(layer.nbytes for layer in self.layers().values())
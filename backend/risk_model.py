@@ -0,0 +1,76 @@
+import math
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+# Weight of a brand-new incident by severity
+SEVERITY_WEIGHTS = {1: 0.2, 2: 0.4, 3: 0.6, 4: 0.8, 5: 1.0}
+DEFAULT_SEVERITY_WEIGHT = 0.6
+# SEVERITY_WEIGHTS as a lookup table indexed by severity (0 = missing)
+SEVERITY_WEIGHT_TABLE = np.array([SEVERITY_WEIGHTS.get(s, DEFAULT_SEVERITY_WEIGHT) for s in range(6)])
+# Timestamp column value for reports without a usable timestamp
+NO_TIMESTAMP = -1
+DEFAULT_HALF_LIFE_DAYS = 180.0
+SECONDS_PER_DAY = 86400.0
+
+
+def parse_timestamp(value: object) -> Optional[float]:
+    """Epoch seconds for an ISO string or datetime (naive values are UTC); None if unparseable"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class DecayModel:
+    """Severity weight with exponential time decay.
+
+    An incident reported at t contributes severity_weight * exp(-rate * (T - t))
+    at time T. Because the decay factor splits as exp(-rate * (T - E)) *
+    exp(-rate * (E - t)) for any reference time E, per-cell sums can be kept
+    relative to a fixed E: new incidents are added as they arrive, and ageing
+    the whole sum is one multiplication at read time.
+    """
+
+    def __init__(self, half_life_days: float = DEFAULT_HALF_LIFE_DAYS):
+        self.half_life_days = half_life_days
+        self.rate = math.log(2) / (half_life_days * SECONDS_PER_DAY)
+
+    def factor(self, elapsed_seconds: float) -> float:
+        """Decay over elapsed_seconds"""
+        return math.exp(-self.rate * elapsed_seconds)
+
+    def weight(self, incident: dict, reference: float, now: Optional[float] = None) -> float:
+        """Contribution of an incident relative to the reference time.
+
+        Reports without a usable timestamp, or stamped in the future, are
+        taken as reported at `now` (which defaults to the reference time).
+        """
+        now = reference if now is None else now
+        reported = parse_timestamp(incident.get('timestamp'))
+        if reported is None or reported > now:
+            reported = now
+        severity = SEVERITY_WEIGHTS.get(incident.get('severity', 3), DEFAULT_SEVERITY_WEIGHT)
+        return severity * math.exp(-self.rate * (reference - reported))
+
+    def column_weights(self, severities: np.ndarray, timestamps: np.ndarray, reference: float,
+                       now: Optional[float] = None) -> np.ndarray:
+        """Vectorized weight() over severity and epoch-second timestamp columns.
+
+        NO_TIMESTAMP entries, and timestamps after `now`, count as reported at `now`.
+        """
+        now = reference if now is None else now
+        severities = np.asarray(severities)
+        valid = (severities >= 0) & (severities < len(SEVERITY_WEIGHT_TABLE))
+        severity = np.where(valid, SEVERITY_WEIGHT_TABLE[np.clip(severities, 0, len(SEVERITY_WEIGHT_TABLE) - 1)],
+                            DEFAULT_SEVERITY_WEIGHT)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        reported = np.where((timestamps == NO_TIMESTAMP) | (timestamps > now), now, timestamps)
+        return severity * np.exp(-self.rate * (reference - reported))
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from haversine import as_coordinate_arrays
+from spatial_index import degree_window
+
+RouteKey = Tuple[int, int, int, int, int]
+
+
+class RouteCache:
+    """LRU cache of route results keyed on snapped endpoints and a data version.
+
+    Endpoints are snapped to a grid of precision_deg, so requests a few
+    metres apart share an entry. Each entry remembers the corridor its route
+    can depend on (the endpoint box grown by corridor_km); a new incident
+    inside the corridor evicts it. bump_version() retires every entry at
+    once after a full data reload.
+    """
+
+    def __init__(self, max_entries: int = 2048, precision_deg: float = 0.0005, corridor_km: float = 2.5):
+        self.max_entries = max_entries
+        self.precision_deg = precision_deg
+        self.corridor_km = corridor_km
+        self.version = 0
+        self._entries: "OrderedDict[RouteKey, Tuple[Tuple[float, float, float, float], object]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, start_lat: float, start_lng: float, end_lat: float, end_lng: float) -> RouteKey:
+        snap = self.precision_deg
+        return (self.version, round(start_lat / snap), round(start_lng / snap),
+                round(end_lat / snap), round(end_lng / snap))
+
+    def _corridor(self, key: RouteKey) -> Tuple[float, float, float, float]:
+        snap = self.precision_deg
+        _, start_lat, start_lng, end_lat, end_lng = (k * snap for k in key)
+        # Half a snap step covers every request that maps to this key
+        dlat, dlng = degree_window(max(abs(start_lat), abs(end_lat)), self.corridor_km)
+        dlat += snap / 2
+        dlng += snap / 2
+        return (min(start_lat, end_lat) - dlat, min(start_lng, end_lng) - dlng,
+                max(start_lat, end_lat) + dlat, max(start_lng, end_lng) + dlng)
+
+    def get(self, key: RouteKey) -> Optional[object]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: RouteKey, value: object) -> None:
+        if key[0] != self.version:
+            # Computed against data that has since been reloaded
+            return
+        self._entries[key] = (self._corridor(key), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_points(self, points: Iterable[Tuple[float, float]]) -> int:
+        """Evict every entry whose corridor contains one of the points; returns the number evicted"""
+        lats, lngs = as_coordinate_arrays(list(points))
+        if not self._entries or len(lats) == 0:
+            return 0
+        stale = [key for key, ((min_lat, min_lng, max_lat, max_lng), _) in self._entries.items()
+                 if np.any((lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng))]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def bump_version(self) -> None:
+        """Retire all entries after the underlying data changed wholesale"""
+        self.version += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "precision_deg": self.precision_deg,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
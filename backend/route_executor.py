@@ -0,0 +1,158 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+from metrics import registry
+
+T = TypeVar("T")
+
+EXECUTOR_MODES = ("thread", "inline")
+
+ROUTE_JOBS = registry.counter("safestpath_route_jobs_total", "Route computations by outcome", ("outcome",))
+ROUTE_QUEUE_SECONDS = registry.histogram("safestpath_route_queue_seconds",
+                                         "Time route computations waited for an executor thread")
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing when max_pending computations are already admitted"""
+
+
+class RouteExecutor:
+    """Runs CPU-bound route work off the event loop with bounded admission.
+
+    In thread mode computations run on a fixed thread pool. NumPy releases
+    the GIL in the vectorized scoring kernels, and the pure-Python A*
+    search is preempted every switch interval, so the event loop keeps
+    serving other requests. The search itself holds the GIL, though, so
+    threads overlap planning with scoring and I/O but do not run searches
+    in parallel: keep max_workers small and add processes (uvicorn workers
+    with shared state) to use more cores. At most max_pending computations are admitted,
+    counting both queued and running ones; beyond that run() raises
+    Overloaded at once instead of growing the queue. A computation that
+    exceeds timeout_seconds raises TimeoutError to the caller and gives its
+    admission slot back. If it has not started it is cancelled; otherwise
+    its thread is abandoned to finish on its own. Abandoned threads do not
+    count against admission. Once max_workers of them are stuck in the
+    pool, the pool is retired and new work gets a fresh one, so a few
+    runaway searches cannot starve every later request.
+
+    Inline mode runs computations on the loop, as before, for debugging and
+    single-core deployments.
+    """
+
+    def __init__(self, mode: str = "thread", max_workers: int = 4, max_pending: int = 16,
+                 timeout_seconds: float = 10.0):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"executor mode must be one of {', '.join(EXECUTOR_MODES)}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        # Abandoned computations still running on the current pool
+        self._stuck = 0
+        self._lock = threading.Lock()
+
+        self.completed = 0
+        self.shed = 0
+        self.timeouts = 0
+        self.abandoned = 0
+        self.retired_pools = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _abandon(self, pool: ThreadPoolExecutor, future: Future) -> None:
+        """Stop waiting for a running computation; retire its pool once max_workers are stuck in it"""
+        with self._lock:
+            self.abandoned += 1
+            if pool is not self._pool:
+                return
+            self._stuck += 1
+            retire = self._stuck >= self.max_workers
+            if retire:
+                self._pool = None
+                self._stuck = 0
+                self.retired_pools += 1
+        if retire:
+            pool.shutdown(wait=False)
+        else:
+            future.add_done_callback(lambda _future: self._unstick(pool))
+
+    def _unstick(self, pool: ThreadPoolExecutor) -> None:
+        with self._lock:
+            if pool is self._pool:
+                self._stuck -= 1
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Run fn(*args) on the executor; raises Overloaded or TimeoutError"""
+        if self.mode == "inline":
+            result = fn(*args)
+            self.completed += 1
+            ROUTE_JOBS.inc("completed")
+            return result
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.shed += 1
+                ROUTE_JOBS.inc("shed")
+                raise Overloaded(f"{self._pending} route computations already pending")
+            self._pending += 1
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="route")
+        pool = self._pool
+        released = False
+
+        def release(_future=None) -> None:
+            # Once per computation: on completion, or on timeout if that comes first
+            nonlocal released
+            with self._lock:
+                if not released:
+                    released = True
+                    self._pending -= 1
+
+        # Carry the request's metrics context into the worker thread
+        context = contextvars.copy_context()
+        submitted = time.perf_counter()
+
+        def job():
+            ROUTE_QUEUE_SECONDS.observe(time.perf_counter() - submitted)
+            return context.run(fn, *args)
+
+        future = pool.submit(job)
+        future.add_done_callback(release)
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            if not future.cancel():
+                self._abandon(pool, future)
+            release()
+            self.timeouts += 1
+            ROUTE_JOBS.inc("timeout")
+            raise
+        self.completed += 1
+        ROUTE_JOBS.inc("completed")
+        return result
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self.completed,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+            "abandoned": self.abandoned,
+            "retired_pools": self.retired_pools,
+        }
@@ -0,0 +1,282 @@
+import heapq
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from spatial_index import haversine_km, degree_window
+
+# 8-connected lattice: (row offset, col offset)
+NEIGHBOUR_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+# Edge cost = length * max(MIN_COST_FACTOR, 1 + RISK_WEIGHT * mean endpoint risk)
+RISK_WEIGHT = 4.0
+MIN_COST_FACTOR = 0.7
+
+# Searches stay inside the start/end bounding box grown by this margin
+SEARCH_MARGIN_KM = 2.0
+
+# Heuristic inflation that breaks ties between the many equal-length lattice
+# paths; results stay within 0.1% of optimal
+TIE_BREAK_WEIGHT = 1.001
+
+# Arrays that fully describe the lattice for a given bounds and step
+EDGE_ARRAYS = ("node_lats", "node_lngs", "indptr", "indices", "lengths")
+
+
+class RoadGraph:
+    """Weighted lattice road graph over the service area, stored as CSR arrays.
+
+    Nodes sit on a regular lat/lng grid, so locating the nearest node is plain
+    arithmetic. Edge lengths are precomputed; risk lives on nodes and is folded
+    into edge costs during the search, so incident updates never touch the
+    edge arrays. node_risk is normally a flat view of RiskGrid.risk built with
+    the same bounds and cell size, so incidents patched into the raster are
+    seen immediately; a rebuilt raster is a new array, passed in with
+    set_node_risk().
+    """
+
+    def __init__(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float, step_deg: float,
+                 node_risk: Optional[np.ndarray] = None):
+        self.min_lat = min_lat
+        self.min_lng = min_lng
+        self.step_deg = step_deg
+        self.rows = int(round((max_lat - min_lat) / step_deg)) + 1
+        self.cols = int(round((max_lng - min_lng) / step_deg)) + 1
+        self.max_lat = min_lat + (self.rows - 1) * step_deg
+        self.max_lng = min_lng + (self.cols - 1) * step_deg
+
+        self.node_lats = np.repeat(min_lat + np.arange(self.rows) * step_deg, self.cols)
+        self.node_lngs = np.tile(min_lng + np.arange(self.cols) * step_deg, self.rows)
+        if node_risk is None:
+            node_risk = np.zeros(self.rows * self.cols, dtype=np.float32)
+        if node_risk.shape != (self.rows * self.cols,):
+            raise ValueError(f"node_risk must have {self.rows * self.cols} entries, got {node_risk.shape}")
+        self.node_risk = node_risk
+
+        self._build_edges()
+
+    @property
+    def node_count(self) -> int:
+        return self.rows * self.cols
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    def _build_edges(self) -> None:
+        """Build CSR adjacency (indptr, indices, lengths) for the 8-connected lattice"""
+        rows, cols = self.rows, self.cols
+        row_idx, col_idx = np.divmod(np.arange(rows * cols, dtype=np.int64), cols)
+
+        sources, targets = [], []
+        for d_row, d_col in NEIGHBOUR_OFFSETS:
+            n_row = row_idx + d_row
+            n_col = col_idx + d_col
+            valid = (n_row >= 0) & (n_row < rows) & (n_col >= 0) & (n_col < cols)
+            sources.append(np.flatnonzero(valid))
+            targets.append((n_row * cols + n_col)[valid])
+
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+        order = np.argsort(sources, kind='stable')
+        sources = sources[order]
+        targets = targets[order]
+
+        self.indptr = np.zeros(rows * cols + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=rows * cols), out=self.indptr[1:])
+        self.indices = targets.astype(np.int32)
+
+        lat_a = np.radians(self.node_lats[sources])
+        lat_b = np.radians(self.node_lats[targets])
+        d_lng = np.radians(self.node_lngs[targets] - self.node_lngs[sources])
+        a = np.sin((lat_b - lat_a) / 2) ** 2 + np.cos(lat_a) * np.cos(lat_b) * np.sin(d_lng / 2) ** 2
+        self.lengths = (2 * 6371 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))).astype(np.float32)
+        self._index_rows()
+
+    def _index_rows(self) -> None:
+        """Heuristic tables and memoryviews over the edge arrays"""
+        rows = self.rows
+        # Per-row horizontal and row-to-next-row diagonal lengths for the
+        # octile heuristic. Both shrink as |lat| grows, so over any band of
+        # rows the shortest edges sit next to the row with the largest |lat|.
+        row_lats = np.radians(self.min_lat + np.arange(rows) * self.step_deg)
+        half_step = np.radians(self.step_deg) / 2
+        horizontal = np.cos(row_lats) * np.sin(half_step) ** 2
+        diagonal = np.sin(half_step) ** 2 + np.cos(row_lats[:-1]) * np.cos(row_lats[1:]) * np.sin(half_step) ** 2
+        self._row_horizontal_km = (2 * 6371 * np.arcsin(np.sqrt(horizontal))).tolist()
+        self._row_diagonal_km = (2 * 6371 * np.arcsin(np.sqrt(diagonal))).tolist()
+        self._vertical_km = 2 * 6371 * float(half_step)
+
+        # memoryviews give fast scalar access from the pure-Python search loop
+        self._indptr_view = memoryview(self.indptr)
+        self._indices_view = memoryview(self.indices)
+        self._lengths_view = memoryview(self.lengths)
+        self._risk_view = memoryview(self.node_risk)
+
+    @classmethod
+    def from_arrays(cls, min_lat: float, min_lng: float, max_lat: float, max_lng: float, step_deg: float,
+                    arrays: Dict[str, np.ndarray], node_risk: Optional[np.ndarray] = None) -> "RoadGraph":
+        """Graph over edge arrays built elsewhere (see edge_arrays), skipping edge construction"""
+        graph = cls.__new__(cls)
+        graph.min_lat = min_lat
+        graph.min_lng = min_lng
+        graph.step_deg = step_deg
+        graph.rows = int(round((max_lat - min_lat) / step_deg)) + 1
+        graph.cols = int(round((max_lng - min_lng) / step_deg)) + 1
+        graph.max_lat = min_lat + (graph.rows - 1) * step_deg
+        graph.max_lng = min_lng + (graph.cols - 1) * step_deg
+        if arrays["indptr"].shape != (graph.rows * graph.cols + 1,):
+            raise ValueError("edge arrays do not match the graph bounds and step")
+        for key in EDGE_ARRAYS:
+            setattr(graph, key, arrays[key])
+        graph.node_risk = node_risk if node_risk is not None else np.zeros(graph.rows * graph.cols, dtype=np.float32)
+        graph._index_rows()
+        return graph
+
+    def edge_arrays(self) -> Dict[str, np.ndarray]:
+        """Node and CSR edge arrays by name, for publishing to other processes"""
+        return {key: getattr(self, key) for key in EDGE_ARRAYS}
+
+    def set_node_risk(self, node_risk: np.ndarray) -> None:
+        """Point the search at a new risk array (e.g. after the risk grid adopted new layers)"""
+        if node_risk.shape != (self.node_count,):
+            raise ValueError(f"node_risk must have {self.node_count} entries, got {node_risk.shape}")
+        self.node_risk = node_risk
+        self._risk_view = memoryview(node_risk)
+
+    def contains(self, lat: float, lng: float) -> bool:
+        return self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng
+
+    def nearest_node(self, lat: float, lng: float) -> Optional[int]:
+        """Index of the lattice node closest to (lat, lng), or None outside the graph"""
+        if not self.contains(lat, lng):
+            return None
+        row = int(round((lat - self.min_lat) / self.step_deg))
+        col = int(round((lng - self.min_lng) / self.step_deg))
+        return row * self.cols + col
+
+    def node_coords(self, node: int) -> Tuple[float, float]:
+        return float(self.node_lats[node]), float(self.node_lngs[node])
+
+    def shortest_path(self, source: int, target: int, use_risk: bool = False,
+                      heuristic_weight: float = 1.0, margin_km: float = SEARCH_MARGIN_KM) -> Optional[List[int]]:
+        """A* search from source to target.
+
+        With use_risk, edge costs are inflated by node risk and the heuristic
+        is scaled by MIN_COST_FACTOR so it stays admissible. heuristic_weight > 1
+        trades optimality (cost within that factor) for fewer expansions. The
+        search is confined to the start/end bounding box plus margin_km.
+        """
+        indptr = self._indptr_view
+        indices = self._indices_view
+        lengths = self._lengths_view
+        risk = self._risk_view
+        cols = self.cols
+        step = self.step_deg
+
+        source_lat, source_lng = self.node_coords(source)
+        target_lat, target_lng = self.node_coords(target)
+        dlat, dlng = degree_window(max(abs(source_lat), abs(target_lat)), margin_km)
+        row_lo = max(0, int((min(source_lat, target_lat) - dlat - self.min_lat) / step))
+        row_hi = min(self.rows - 1, int((max(source_lat, target_lat) + dlat - self.min_lat) / step) + 1)
+        col_lo = max(0, int((min(source_lng, target_lng) - dlng - self.min_lng) / step))
+        col_hi = min(self.cols - 1, int((max(source_lng, target_lng) + dlng - self.min_lng) / step) + 1)
+
+        # Octile distance using the shortest edges between the node's row and
+        # the target's row never overestimates the remaining path length
+        scale = (MIN_COST_FACTOR if use_risk else 1.0) * heuristic_weight * TIE_BREAK_WEIGHT
+        vertical = self._vertical_km
+        row_horizontal = self._row_horizontal_km
+        row_diagonal = self._row_diagonal_km
+        last_diagonal = len(row_diagonal) - 1
+        min_lat = self.min_lat
+        target_row, target_col = divmod(target, cols)
+        target_abs_lat = abs(target_lat)
+
+        def heuristic(node: int) -> float:
+            row, col = divmod(node, cols)
+            d_row = abs(row - target_row)
+            d_col = abs(col - target_col)
+            pivot = row if abs(min_lat + row * step) > target_abs_lat else target_row
+            horizontal = row_horizontal[pivot]
+            if d_row > d_col:
+                diagonal = min(row_diagonal[max(pivot - 1, 0)], row_diagonal[min(pivot, last_diagonal)])
+                return scale * (diagonal * d_col + vertical * (d_row - d_col))
+            if d_row == 0:
+                return scale * horizontal * d_col
+            diagonal = min(row_diagonal[max(pivot - 1, 0)], row_diagonal[min(pivot, last_diagonal)])
+            return scale * (diagonal * d_row + horizontal * (d_col - d_row))
+
+        best = {source: 0.0}
+        parent = {source: -1}
+        closed = set()
+        # Ties on f are broken towards the deeper node (larger cost so far)
+        heap = [(heuristic(source), 0.0, source)]
+
+        while heap:
+            _, neg_cost, node = heapq.heappop(heap)
+            cost = -neg_cost
+            if node == target:
+                path = [node]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                path.reverse()
+                return path
+            if node in closed:
+                continue
+            closed.add(node)
+
+            node_risk = risk[node]
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+                if neighbour in closed:
+                    continue
+                row, col = divmod(neighbour, cols)
+                if row < row_lo or row > row_hi or col < col_lo or col > col_hi:
+                    continue
+                edge_cost = lengths[edge]
+                if use_risk:
+                    edge_cost *= max(MIN_COST_FACTOR, 1 + RISK_WEIGHT * (node_risk + risk[neighbour]) / 2)
+                new_cost = cost + edge_cost
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    parent[neighbour] = node
+                    heapq.heappush(heap, (new_cost + heuristic(neighbour), -new_cost, neighbour))
+
+        return None
+
+    def route(self, start_lat: float, start_lng: float, end_lat: float, end_lng: float,
+              use_risk: bool = False, heuristic_weight: float = 1.0) -> Optional[List[Tuple[float, float]]]:
+        """Path between two coordinates as (lat, lng) points, or None if not routable"""
+        source = self.nearest_node(start_lat, start_lng)
+        target = self.nearest_node(end_lat, end_lng)
+        if source is None or target is None:
+            return None
+
+        nodes = self.shortest_path(source, target, use_risk=use_risk, heuristic_weight=heuristic_weight)
+        if nodes is None:
+            return None
+
+        points = [(start_lat, start_lng)]
+        points.extend(self.node_coords(node) for node in simplify_lattice_path(nodes))
+        points.append((end_lat, end_lng))
+        return points
+
+
+def simplify_lattice_path(nodes: List[int]) -> List[int]:
+    """Drop intermediate nodes on straight runs of a lattice path"""
+    if len(nodes) <= 2:
+        return nodes
+    kept = [nodes[0]]
+    for prev, node, nxt in zip(nodes, nodes[1:], nodes[2:]):
+        # On a lattice, equal consecutive index deltas mean the same direction
+        if node - prev != nxt - node:
+            kept.append(node)
+    kept.append(nodes[-1])
+    return kept
+
+
+def polyline_length(points: List[Tuple[float, float]]) -> float:
+    """Total length of a (lat, lng) polyline in km"""
+    return sum(haversine_km(a[0], a[1], b[0], b[1]) for a, b in zip(points, points[1:]))
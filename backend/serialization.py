@@ -0,0 +1,106 @@
+"""Fast JSON encoding and compact route geometry for large responses.
+
+Endpoints opt in by returning FastJSONResponse with plain dicts, which
+skips FastAPI's response_model validation and its jsonable_encoder pass.
+orjson is used when installed; the standard library encoder is the fallback.
+"""
+import json
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+# Route geometry encodings: [{"lat", "lng"}, ...], [lat, lng, lat, lng, ...], or a Google encoded polyline
+GEOMETRY_POINTS = "points"
+GEOMETRY_FLAT = "flat"
+GEOMETRY_POLYLINE = "polyline"
+GEOMETRY_ENCODINGS = (GEOMETRY_POINTS, GEOMETRY_FLAT, GEOMETRY_POLYLINE)
+GEOMETRY_PATTERN = "^(" + "|".join(GEOMETRY_ENCODINGS) + ")$"
+# 1e-5 degrees is about a metre, the precision the map draws at
+POLYLINE_PRECISION = 5
+
+
+def dumps(content: object) -> bytes:
+    """Compact JSON bytes; datetimes and other unknown values fall back to str()"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, separators=(",", ":"), default=str).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: object) -> bytes:
+        return dumps(content)
+
+
+def encode_polyline(points: Iterable[Tuple[float, float]], precision: int = POLYLINE_PRECISION) -> str:
+    """Google encoded polyline of (lat, lng) points"""
+    factor = 10 ** precision
+    chars: List[str] = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat, ilng = round(lat * factor), round(lng * factor)
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chars.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chars.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(chars)
+
+
+def decode_polyline(encoded: str, precision: int = POLYLINE_PRECISION) -> List[Tuple[float, float]]:
+    """Inverse of encode_polyline"""
+    factor = 10 ** precision
+    points: List[Tuple[float, float]] = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
+
+
+def encode_geometry(points: Sequence[Tuple[float, float]], encoding: str) -> Union[str, List[object]]:
+    """Route points in the requested geometry encoding"""
+    if encoding == GEOMETRY_POLYLINE:
+        return encode_polyline(points)
+    if encoding == GEOMETRY_FLAT:
+        return [coord for point in points for coord in point]
+    return [{"lat": lat, "lng": lng} for lat, lng in points]
+
+
+def negotiate_geometry(geometry: Optional[str], accept: Optional[str]) -> str:
+    """Geometry encoding from the query parameter, else an Accept parameter such as
+    `application/json; geometry=polyline`; defaults to points.
+
+    Raises ValueError for an unknown encoding in the Accept header.
+    """
+    if geometry is not None:
+        return geometry
+    for media_range in (accept or "").split(","):
+        for param in media_range.split(";")[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "geometry":
+                value = value.strip().strip('"').lower()
+                if value not in GEOMETRY_ENCODINGS:
+                    raise ValueError(f"geometry must be one of {', '.join(GEOMETRY_ENCODINGS)}")
+                return value
+    return GEOMETRY_POINTS
@@ -1,25 +1,158 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError, PyMongoError
 import os
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
+from typing import Dict, List, Optional, Tuple
 import uuid
 from datetime import datetime, timezone
-import math
-import heapq
+import json
+import time
+import numpy as np
+from spatial_index import SpatialIndex
+from haversine import docs_to_arrays
+from geometry import densify, polyline_distances
+from routing import SEARCH_MARGIN_KM, RoadGraph, polyline_length
+from risk_grid import RiskGrid
+from risk_model import DecayModel
+from route_cache import RouteCache
+from snapshot import CollectionSnapshot
+from incident_store import IncidentRows, IncidentSnapshot, IncidentStore
+from incident_dedup import FOLD_FIELDS, IncidentDeduplicator, migrate_report_counts
+from geo_index import LOCATION_FIELD, corridor_filter, ensure_indexes, geo_point, migrate_locations
+from clusters import CELLS_PER_TILE, MAX_ZOOM, TileCache, aggregate_tile_columns, cluster_pipeline, tile_bounds, tiles_for_bbox
+from stats_counters import StatsCounters
+from incident_query import INCIDENT_SORT, decode_cursor, encode_cursor, incident_filter, iso_utc, parse_bbox
+from incident_ingest import CSV_MEDIA_TYPES, iter_records
+from incident_feed import RESYNC, IncidentFeed
+from metrics import PROMETHEUS_MEDIA_TYPE, MetricsMiddleware, MongoCommandCounter, monitor_event_loop, phase, registry
+from route_executor import Overloaded, RouteExecutor
+from shared_state import SharedArrayStore
+from coalesce import SingleFlight
+from serialization import GEOMETRY_PATTERN, GEOMETRY_POINTS, FastJSONResponse, dumps, encode_geometry, negotiate_geometry
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandCounter()])
 db = client[os.environ['DB_NAME']]
 
+# Documents as served by the API: no Mongo _id, no GeoJSON mirror field
+DOCUMENT_PROJECTION = {"_id": 0, LOCATION_FIELD: 0}
+
+# Cached copies of the incident and tollgate collections serve the route hot path
+SNAPSHOT_TTL_SECONDS = float(os.environ.get('SNAPSHOT_TTL_SECONDS', '300'))
+SNAPSHOT_MAX_DOCUMENTS = int(os.environ.get('SNAPSHOT_MAX_DOCUMENTS', '1000000'))
+# Incidents are held as compact columns, persisted to INCIDENT_SNAPSHOT_PATH so a
+# restart maps the file and reads only newer documents (empty value disables it).
+# With shared state only the leader writes the file; without it every worker
+# does, each write an atomic rename of a complete snapshot.
+INCIDENT_SNAPSHOT_PATH = os.environ.get('INCIDENT_SNAPSHOT_PATH', str(ROOT_DIR / 'incident_snapshot.bin'))
+INCIDENT_SNAPSHOT_SAVE_SECONDS = float(os.environ.get('INCIDENT_SNAPSHOT_SAVE_SECONDS', '300'))
+incident_snapshot = IncidentSnapshot('incidents', lambda: db.incidents, DOCUMENT_PROJECTION,
+                                     ttl_seconds=SNAPSHOT_TTL_SECONDS, max_documents=SNAPSHOT_MAX_DOCUMENTS,
+                                     path=INCIDENT_SNAPSHOT_PATH or None,
+                                     is_writer=lambda: shared_state is None or shared_state.is_leader)
+tollgate_snapshot = CollectionSnapshot('tollgates', lambda: db.tollgates, DOCUMENT_PROJECTION,
+                                       ttl_seconds=SNAPSHOT_TTL_SECONDS, max_documents=SNAPSHOT_MAX_DOCUMENTS)
+background_tasks: List[asyncio.Task] = []
+
+# Dashboard counters for GET /api/stats, flushed to the counters collection
+STATS_FLUSH_SECONDS = float(os.environ.get('STATS_FLUSH_SECONDS', '30'))
+stats_counters = StatsCounters(lambda: db.counters)
+
+# GET /api/incidents paging
+INCIDENT_PAGE_SIZE = 1000
+INCIDENT_MAX_PAGE_SIZE = 5000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# POST /api/incidents/bulk
+INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', '1000'))
+INGEST_MAX_REPORTED_REJECTS = 1000
+
+# Repeat reports of one event (same type, within the radius and time window)
+# are folded into a single incident at ingest; a radius of 0 disables this
+DEDUP_RADIUS_KM = float(os.environ.get('DEDUP_RADIUS_KM', '0.1'))
+DEDUP_WINDOW_SECONDS = float(os.environ.get('DEDUP_WINDOW_MINUTES', '60')) * 60
+incident_dedup = IncidentDeduplicator(DEDUP_RADIUS_KM, DEDUP_WINDOW_SECONDS) if DEDUP_RADIUS_KM > 0 else None
+
+# Server-sent event push of new incidents (GET /api/incidents/stream)
+FEED_MAX_SUBSCRIBERS = int(os.environ.get('FEED_MAX_SUBSCRIBERS', '1000'))
+FEED_HEARTBEAT_SECONDS = 15.0
+incident_feed = IncidentFeed(max_queue=int(os.environ.get('FEED_QUEUE_SIZE', '256')))
+
+# Aggregated map tiles for GET /api/incidents/clusters
+CLUSTER_MAX_TILES_PER_REQUEST = 64
+cluster_tiles = TileCache(max_tiles=int(os.environ.get('CLUSTER_TILE_CACHE_SIZE', '4096')))
+
+# In-process spatial lookups: the incident snapshot's store, and a tollgate
+# index derived from the tollgate snapshot
+PROXIMITY_THRESHOLD_KM = 0.5
+incident_index = incident_snapshot.store
+tollgate_index = SpatialIndex()
+
+# Service area (min_lat,min_lng,max_lat,max_lng) and the cell size shared by
+# the risk grid and the routing lattice
+SERVICE_AREA_BBOX = tuple(float(v) for v in os.environ.get('SERVICE_AREA_BBOX', '18.85,72.75,19.35,73.10').split(','))
+GRID_CELL_DEG = float(os.environ.get('GRID_CELL_DEG', '0.001'))
+# Incident weight halves every RISK_HALF_LIFE_DAYS; one route point's risk is capped at RISK_POINT_CAP
+RISK_HALF_LIFE_DAYS = float(os.environ.get('RISK_HALF_LIFE_DAYS', '180'))
+RISK_POINT_CAP = 1.0
+risk_grid = RiskGrid(*SERVICE_AREA_BBOX, GRID_CELL_DEG, radius_km=PROXIMITY_THRESHOLD_KM,
+                     decay=DecayModel(RISK_HALF_LIFE_DAYS))
+SAFE_ROUTE_HEURISTIC_WEIGHT = float(os.environ.get('SAFE_ROUTE_HEURISTIC_WEIGHT', '1.5'))
+# Route risk is capped per stretch of this length, about the span one
+# incident's proximity window covers along a route
+ROUTE_RISK_BIN_KM = 2 * PROXIMITY_THRESHOLD_KM
+# Longest segment in generated (non-lattice) route geometry
+ROUTE_MAX_SEGMENT_KM = 0.25
+ROUTE_CORRIDOR_BUFFER_KM = SEARCH_MARGIN_KM + PROXIMITY_THRESHOLD_KM
+# Route results for nearby endpoint pairs, evicted by incidents in their corridor
+route_cache = RouteCache(max_entries=int(os.environ.get('ROUTE_CACHE_SIZE', '2048')),
+                         precision_deg=float(os.environ.get('ROUTE_CACHE_PRECISION_DEG', '0.0005')),
+                         corridor_km=ROUTE_CORRIDOR_BUFFER_KM)
+ROUTE_BATCH_MAX_ITEMS = int(os.environ.get('ROUTE_BATCH_MAX_ITEMS', '1000'))
+ROUTE_BATCH_CHUNK_SIZE = 25
+road_graph: Optional[RoadGraph] = None
+# Route planning and scoring run off the event loop with bounded admission.
+# The A* search is pure Python and holds the GIL, so extra threads add no
+# planning throughput; scale across cores with uvicorn workers (SHARED_STATE_DIR).
+ROUTE_EXECUTOR_WORKERS = int(os.environ.get('ROUTE_EXECUTOR_WORKERS', '2'))
+route_executor = RouteExecutor(mode=os.environ.get('ROUTE_EXECUTOR_MODE', 'thread'),
+                               max_workers=ROUTE_EXECUTOR_WORKERS,
+                               max_pending=int(os.environ.get('ROUTE_EXECUTOR_MAX_PENDING',
+                                                              str(max(32, 8 * ROUTE_EXECUTOR_WORKERS)))),
+                               timeout_seconds=float(os.environ.get('ROUTE_TIMEOUT_SECONDS', '10')))
+ROUTE_RETRY_AFTER_SECONDS = 1
+
+# Concurrent identical requests share one computation. Route endpoints are
+# snapped like RouteCache keys (each caller gets its own endpoints back);
+# incident pages are only shared by requests with the exact same query.
+route_flight = SingleFlight('routes', precision_deg=float(os.environ.get('COALESCE_ROUTE_PRECISION_DEG',
+                                                                        str(route_cache.precision_deg))))
+incident_flight = SingleFlight('incidents')
+
+# Multi-worker mode: with SHARED_STATE_DIR set, one worker builds the risk grid
+# and road graph and publishes them there; the others map the published arrays.
+#   SHARED_STATE_DIR=/dev/shm/safestpath uvicorn server:app --workers 4
+SHARED_STATE_DIR = os.environ.get('SHARED_STATE_DIR')
+SHARED_STATE_POLL_SECONDS = float(os.environ.get('SHARED_STATE_POLL_SECONDS', '2'))
+SHARED_STATE_WAIT_SECONDS = float(os.environ.get('SHARED_STATE_WAIT_SECONDS', '60'))
+# Derived state (indexes, risk grid, counters, shared layers) is rebuilt this
+# often even when no snapshot reloads; 0 disables it
+DERIVED_STATE_REBUILD_SECONDS = float(os.environ.get('DERIVED_STATE_REBUILD_SECONDS', '3600'))
+shared_state = SharedArrayStore(SHARED_STATE_DIR) if SHARED_STATE_DIR else None
+# Generation of the shared risk layers this worker has mapped
+shared_risk_generation: Optional[int] = None
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -37,14 +170,32 @@ class Incident(BaseModel):
     description: Optional[str] = None
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     anonymous: bool = True
+    report_count: int = 1
+    last_reported_at: Optional[datetime] = None
 
 class IncidentCreate(BaseModel):
-    lat: float
-    lng: float
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
     incident_type: str
     severity: int = Field(ge=1, le=5)
     description: Optional[str] = None
 
+class IncidentImport(IncidentCreate):
+    # Feeds may carry their own ids (re-imports are then rejected as duplicates) and report times
+    id: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+class BulkIngestReject(BaseModel):
+    line: int
+    error: str
+
+class BulkIngestResult(BaseModel):
+    accepted: int
+    rejected: int
+    # Accepted rows folded into an existing or earlier incident instead of stored
+    merged: int = 0
+    rejects: List[BulkIngestReject]
+
 class TollGate(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -54,10 +205,14 @@ class TollGate(BaseModel):
     monitored: bool = True
 
 class RouteRequest(BaseModel):
-    start_lat: float
-    start_lng: float
-    end_lat: float
-    end_lng: float
+    start_lat: float = Field(ge=-90, le=90)
+    start_lng: float = Field(ge=-180, le=180)
+    end_lat: float = Field(ge=-90, le=90)
+    end_lng: float = Field(ge=-180, le=180)
+
+class RouteBatchRequest(BaseModel):
+    # Items are validated one by one so errors can be reported per item
+    routes: List[dict]
 
 class RoutePoint(BaseModel):
     lat: float
@@ -72,6 +227,19 @@ class RouteResponse(BaseModel):
     toll_count: int
     estimated_time_min: int
 
+class ClusterCell(BaseModel):
+    lat: float
+    lng: float
+    count: int
+    max_severity: int
+    types: Dict[str, int]
+
+class ClusterResponse(BaseModel):
+    zoom: int
+    cells_per_tile: int
+    tiles: int
+    cells: List[ClusterCell]
+
 class EmergencyContact(BaseModel):
     name: str
     number: str
@@ -82,6 +250,7 @@ class SafetyStats(BaseModel):
     total_tollgates: int
     high_risk_areas: int
     safe_routes_calculated: int
+    routes_by_hour: Dict[str, int] = {}
 
 # Sample data initialization
 async def init_sample_data():
@@ -113,27 +282,13 @@ async def init_sample_data():
         await db.tollgates.insert_many(sample_tollgates)
 
 # Helper functions
-def calculate_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    """Calculate distance between two coordinates in km using Haversine formula"""
-    R = 6371  # Earth's radius in km
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lng = math.radians(lng2 - lng1)
-    
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
-
-def calculate_safety_score(incidents_nearby: int, tollgates_nearby: int, distance: float) -> float:
+def calculate_safety_score(incident_risk: float, tollgates_nearby: int, distance: float) -> float:
     """Calculate safety score (0-100, higher is safer)"""
     # Base score
     base_score = 100
     
-    # Reduce score for incidents (each incident reduces score)
-    incident_penalty = incidents_nearby * 15
+    # Reduce score for incident exposure (a route stretch next to a fresh severity-5 report costs 15)
+    incident_penalty = incident_risk * 15
     
     # Increase score for tollgates (each tollgate adds to safety)
     tollgate_bonus = tollgates_nearby * 10
@@ -144,143 +299,764 @@ def calculate_safety_score(incidents_nearby: int, tollgates_nearby: int, distanc
     final_score = max(0, min(100, base_score - incident_penalty + tollgate_bonus - distance_penalty))
     return round(final_score, 2)
 
-async def calculate_route_safety(route_points: List[Tuple[float, float]], incidents: List, tollgates: List) -> Tuple[int, int]:
-    """Calculate incidents and tollgates near a route"""
-    incident_count = 0
-    tollgate_count = 0
-    proximity_threshold = 0.5  # km
-    
-    for point in route_points:
-        for incident in incidents:
-            dist = calculate_distance(point[0], point[1], incident['lat'], incident['lng'])
-            if dist < proximity_threshold:
-                incident_count += 1
-                break
-        
-        for tollgate in tollgates:
-            dist = calculate_distance(point[0], point[1], tollgate['lat'], tollgate['lng'])
-            if dist < proximity_threshold:
-                tollgate_count += 1
-                break
+def corridor_hits(polyline: List[Tuple[float, float]], index: SpatialIndex) -> Tuple[List[dict], np.ndarray]:
+    """Documents within the proximity threshold of any segment of the polyline.
     
-    return incident_count, tollgate_count
+    Candidates come from the index cells along the route; each is then
+    measured against every segment exactly. Returns the hits and their
+    positions along the route in km.
+    """
+    candidates = index.polyline_candidates(polyline, PROXIMITY_THRESHOLD_KM)
+    if not candidates:
+        return [], np.zeros(0)
+    distance, along = polyline_distances(*docs_to_arrays(candidates), polyline)
+    near = distance < PROXIMITY_THRESHOLD_KM
+    return [doc for doc, hit in zip(candidates, near.tolist()) if hit], along[near]
+
+def corridor_incidents(polyline: List[Tuple[float, float]], store: IncidentStore) -> Tuple[IncidentRows, np.ndarray]:
+    """corridor_hits() for the columnar incident store: matching rows and their positions along the route"""
+    candidates = store.polyline_candidates(polyline, PROXIMITY_THRESHOLD_KM)
+    if not len(candidates):
+        return candidates, np.zeros(0)
+    distance, along = polyline_distances(candidates.lat, candidates.lng, polyline)
+    near = distance < PROXIMITY_THRESHOLD_KM
+    return candidates.take(near), along[near]
+
+@phase("safety_scan")
+def score_routes(routes: List[List[Tuple[float, float]]], incidents: IncidentStore,
+                 tollgates: SpatialIndex) -> List[Tuple[int, int, float]]:
+    """Incident count, tollgate count and incident risk along each route's full geometry.
+    
+    Counts are distinct incidents and tollgates within the proximity
+    threshold of the route. Risk is the decayed, severity-weighted sum of
+    those incidents, capped at RISK_POINT_CAP per ROUTE_RISK_BIN_KM stretch
+    so one hotspot cannot outweigh the whole route.
+    
+    Incidents are read from the risk grid's per-cell aggregates, aged to now
+    with one multiplication, when the grid covers the corridor and was built
+    from this store. Otherwise (fallback stores, routes leaving the service
+    area) each incident near the route is weighed individually.
+    """
+    now = time.time()
+    grid = risk_grid if incidents is incident_index else None
+    scores = []
+    for route in routes:
+        cells = grid.corridor_cells(route, PROXIMITY_THRESHOLD_KM, now) if grid is not None else None
+        if cells is not None:
+            weights, counts, along = cells
+            incident_count = int(counts.sum())
+        else:
+            near_incidents, along = corridor_incidents(route, incidents)
+            weights = risk_grid.decay.column_weights(near_incidents.severity, near_incidents.ts, now)
+            incident_count = len(near_incidents)
+        near_tollgates, _ = corridor_hits(route, tollgates)
+        incident_risk = 0.0
+        if len(weights):
+            stretches = (along // ROUTE_RISK_BIN_KM).astype(np.int64)
+            incident_risk = float(np.minimum(np.bincount(stretches, weights=weights), RISK_POINT_CAP).sum())
+        scores.append((incident_count, len(near_tollgates), incident_risk))
+    return scores
 
 def generate_route_points(start_lat: float, start_lng: float, end_lat: float, end_lng: float, 
-                         incidents: List, is_safest: bool = False) -> List[Tuple[float, float]]:
-    """Generate route points - safest route avoids high-incident areas"""
-    points = []
-    steps = 10
+                         incidents: IncidentStore, is_safest: bool = False) -> List[Tuple[float, float]]:
+    """Generate route points - safest route avoids high-incident areas.
     
+    Points are spaced at most ROUTE_MAX_SEGMENT_KM apart, so short routes
+    stay small and long ones keep their shape.
+    """
     if is_safest:
         # Calculate midpoint with offset to avoid incidents
         mid_lat = (start_lat + end_lat) / 2
         mid_lng = (start_lng + end_lng) / 2
         
-        # Check for incidents near midpoint and adjust
-        incident_nearby = False
-        for incident in incidents:
-            if incident['severity'] >= 4:
-                dist = calculate_distance(mid_lat, mid_lng, incident['lat'], incident['lng'])
-                if dist < 1.0:  # Within 1km
-                    incident_nearby = True
-                    # Offset the route
-                    mid_lat += 0.01
-                    mid_lng += 0.01
-                    break
+        # Check for high-severity incidents within 1km of the midpoint and adjust
+        if (incidents.within(mid_lat, mid_lng, 1.0).severity >= 4).any():
+            # Offset the route
+            mid_lat += 0.01
+            mid_lng += 0.01
         
-        # Create curved route through adjusted midpoint
-        for i in range(steps + 1):
-            t = i / steps
-            if t < 0.5:
-                t2 = t * 2
-                lat = start_lat + (mid_lat - start_lat) * t2
-                lng = start_lng + (mid_lng - start_lng) * t2
-            else:
-                t2 = (t - 0.5) * 2
-                lat = mid_lat + (end_lat - mid_lat) * t2
-                lng = mid_lng + (end_lng - mid_lng) * t2
-            points.append((lat, lng))
+        # Curved route through the adjusted midpoint
+        return densify([(start_lat, start_lng), (mid_lat, mid_lng), (end_lat, end_lng)], ROUTE_MAX_SEGMENT_KM)
+    
+    # Shortest route - direct line
+    return densify([(start_lat, start_lng), (end_lat, end_lng)], ROUTE_MAX_SEGMENT_KM)
+
+async def rebuild_derived_state(_docs: Optional[List[dict]] = None):
+    """Rebuild spatial indexes and the risk grid from the current snapshots.
+    
+    Fresh indexes and a freshly built risk raster are swapped in rather than
+    cleared in place, so route computations running on executor threads
+    keep a consistent view. The route cache is invalidated once the new
+    grid is in place.
+    """
+    global incident_index, tollgate_index
+    tollgates = SpatialIndex()
+    tollgates.extend(tollgate_snapshot.docs)
+    incident_index, tollgate_index = incident_snapshot.store, tollgates
+    cluster_tiles.clear()
+    
+    if incident_snapshot.available and tollgate_snapshot.available:
+        stats_counters.recount_columns(incident_index.all().severity, tollgate_snapshot.docs)
+        if shared_state is None or shared_state.is_leader:
+            await build_risk_grid()
+            if shared_state is not None:
+                publish_risk_grid()
+        elif not await adopt_shared_risk(wait=shared_risk_generation is None):
+            # No leader has published yet; build a private grid rather than serve without one
+            await build_risk_grid()
     else:
-        # Shortest route - direct line
-        for i in range(steps + 1):
-            t = i / steps
-            lat = start_lat + (end_lat - start_lat) * t
-            lng = start_lng + (end_lng - start_lng) * t
-            points.append((lat, lng))
+        await stats_counters.recount_from_db(db)
+        # Without a complete snapshot the grid cannot vouch for empty cells
+        risk_grid.clear()
+    attach_route_risk()
+    # After the swap, so routes cached meanwhile against the old grid are dropped
+    route_cache.bump_version()
+
+def register_new_incidents(docs: List[dict], local: bool = False):
+    """Patch freshly written incidents into the snapshot and everything derived from it.
+    
+    Derived structures are updated once per call, so batch writers should
+    pass the whole batch. Writes made by this process (local) are counted
+    even when there is no snapshot to patch; the next recount corrects them.
+    """
+    new_docs = [doc for doc in docs if incident_snapshot.apply_insert(doc)]
+    fresh = docs if local and incident_snapshot.oversized else new_docs
+    for doc in fresh:
+        stats_counters.record_incident(doc)
+    incident_feed.publish(fresh)
+    
+    points = [(doc['lat'], doc['lng']) for doc in docs]
+    route_cache.invalidate_points(points)
+    if new_docs:
+        # apply_insert has already appended them to the incident store
+        risk_grid.add_incidents(new_docs)
+        cluster_tiles.invalidate_points(points)
+
+@phase("db_fetch")
+async def route_indexes(request: RouteRequest) -> Tuple[IncidentStore, SpatialIndex]:
+    """Spatial lookups for route scoring, served from the snapshots when they are cached"""
+    incidents = await incident_snapshot.get()
+    tollgates = await tollgate_snapshot.get()
+    if incidents is not None and tollgates is not None:
+        return incident_index, tollgate_index
+    
+    # Collections too large to cache: read only the route corridor. The buffer
+    # covers the router's search margin plus the proximity threshold.
+    corridor = corridor_filter(request.start_lat, request.start_lng, request.end_lat, request.end_lng,
+                               ROUTE_CORRIDOR_BUFFER_KM)
+    fallback_incidents = IncidentStore()
+    fallback_incidents.extend(await db.incidents.find(corridor, DOCUMENT_PROJECTION).to_list(None))
+    fallback_tollgates = SpatialIndex()
+    fallback_tollgates.extend(await db.tollgates.find(corridor, DOCUMENT_PROJECTION).to_list(None))
+    return fallback_incidents, fallback_tollgates
+
+async def build_risk_grid():
+    """Rebuild the risk grid from the incident store and tollgate index in a worker thread.
     
-    return points
+    Incidents registered while it runs are journaled and replayed onto the new grid.
+    """
+    journal = risk_grid.begin_rebuild()
+    incidents = incident_index.all()
+    await asyncio.to_thread(risk_grid.rebuild_columns, incidents.lat, incidents.lng, incidents.severity,
+                            incidents.ts, list(tollgate_index), journal)
+
+def attach_route_risk():
+    """Point the routing lattice at the risk grid's current raster (rebuilds swap in a new array)"""
+    if road_graph is not None:
+        road_graph.set_node_risk(risk_grid.risk.reshape(-1))
+
+def build_road_graph() -> RoadGraph:
+    """Build the routing lattice on the risk grid's cells, reading risk from the grid"""
+    return RoadGraph(*SERVICE_AREA_BBOX, GRID_CELL_DEG, node_risk=risk_grid.risk.reshape(-1))
+
+def publish_risk_grid():
+    """Leader: publish the freshly built risk layers for the other workers"""
+    generation = shared_state.publish("risk", risk_grid.layers(), {"decay_epoch": risk_grid.decay_epoch})
+    logger.info(f"Published risk grid generation {generation}")
+
+async def wait_for_shared(name: str, timeout: float):
+    """Current generation of a shared set, waiting up to timeout for a first publication"""
+    deadline = time.monotonic() + timeout
+    while True:
+        loaded = shared_state.load(name)
+        if loaded is not None or time.monotonic() >= deadline:
+            return loaded
+        await asyncio.sleep(0.5)
+
+async def adopt_shared_risk(wait: bool = False) -> bool:
+    """Follower: map the latest published risk layers; returns False if none are published"""
+    global shared_risk_generation
+    loaded = await wait_for_shared("risk", SHARED_STATE_WAIT_SECONDS if wait else 0)
+    if loaded is None:
+        return False
+    generation, layers, meta = loaded
+    if generation == shared_risk_generation:
+        return True
+    risk_grid.adopt(layers, meta["decay_epoch"])
+    attach_route_risk()
+    shared_risk_generation = generation
+    route_cache.bump_version()
+    logger.info(f"Mapped shared risk grid generation {generation}")
+    return True
+
+async def load_road_graph() -> RoadGraph:
+    """Road graph for this worker: built (and published by the leader) or mapped from the leader's"""
+    if shared_state is not None and not shared_state.is_leader:
+        loaded = await wait_for_shared("graph", SHARED_STATE_WAIT_SECONDS)
+        if loaded is not None:
+            return RoadGraph.from_arrays(*SERVICE_AREA_BBOX, GRID_CELL_DEG, loaded[1],
+                                         node_risk=risk_grid.risk.reshape(-1))
+    graph = await asyncio.to_thread(build_road_graph)
+    if shared_state is not None and shared_state.is_leader:
+        shared_state.publish("graph", graph.edge_arrays())
+    return graph
+
+async def follow_shared_state():
+    """Follower: poll the shared manifests and map each new risk generation.
+    
+    Takes over as leader if the current leader exits; from then on this
+    worker's rebuilds are the ones published.
+    """
+    while True:
+        await asyncio.sleep(SHARED_STATE_POLL_SECONDS)
+        if shared_state.try_lead():
+            logger.info("Took over shared state leadership")
+            return
+        if shared_state.generation("risk") != shared_risk_generation:
+            await adopt_shared_risk()
+
+async def run_derived_state_rebuilds(interval_seconds: float):
+    """Rebuild derived state every interval_seconds until cancelled.
+    
+    Reloads used to be the only trigger, and snapshots kept live by a change
+    stream never expire. This re-bases the risk grid's decay epoch, so its
+    incident weights keep ageing against the tollgate bonus, and the leader
+    republishes the shared layers.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await rebuild_derived_state()
+        except PyMongoError as e:
+            logger.warning(f"Derived state rebuild failed: {e}")
 
 # Routes
 @api_router.get("/")
 async def root():
     return {"message": "SafestPath API - Women's Safety Route System"}
 
+async def fold_into_existing(doc: dict) -> Optional[dict]:
+    """Fold a report into the stored incident it duplicates; returns that incident, or None if it is new"""
+    if incident_snapshot.available and not incident_dedup.may_match(incident_snapshot.store, doc):
+        return None
+    return await incident_dedup.fold(db.incidents, doc, DOCUMENT_PROJECTION)
+
+async def insert_incident(doc: dict) -> None:
+    result = await db.incidents.insert_one({**doc, LOCATION_FIELD: geo_point(doc['lat'], doc['lng'])})
+    register_new_incidents([doc], local=True)
+    incident_snapshot.advance_watermark(result.inserted_id)
+
 @api_router.post("/incidents", response_model=Incident)
 async def create_incident(incident: IncidentCreate):
     """Report a new incident anonymously"""
     incident_dict = incident.model_dump()
     incident_obj = Incident(**incident_dict)
+    incident_obj.last_reported_at = incident_obj.timestamp
     
     doc = incident_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
+    doc['timestamp'] = doc['last_reported_at'] = doc['timestamp'].isoformat()
     
-    await db.incidents.insert_one(doc)
+    if incident_dedup is None:
+        await insert_incident(doc)
+        return incident_obj
+    await incident_dedup.reserve([doc])
+    try:
+        merged = await fold_into_existing(doc)
+        if merged is not None:
+            return merged
+        await insert_incident(doc)
+    finally:
+        incident_dedup.release([doc])
     return incident_obj
 
+@api_router.post("/incidents/bulk", response_model=BulkIngestResult)
+async def bulk_create_incidents(request: Request):
+    """Import incidents from an NDJSON or CSV body (Content-Type: text/csv).
+    
+    Rows are validated and written in chunks of INGEST_CHUNK_SIZE with
+    unordered insert_many, so one bad row never blocks the others. Derived
+    indexes and caches are updated once per chunk. Rejected rows are
+    reported by line number (the first INGEST_MAX_REPORTED_REJECTS of them).
+    
+    Rows without a feed id are deduplicated like single reports, against
+    each other and against stored incidents. Rows with an id are stored
+    as-is, so re-importing a feed is still rejected row by row.
+    """
+    is_csv = any(t in request.headers.get('content-type', '') for t in CSV_MEDIA_TYPES)
+    result = BulkIngestResult(accepted=0, rejected=0, rejects=[])
+    
+    def reject(line_no: int, error: str):
+        result.rejected += 1
+        if len(result.rejects) < INGEST_MAX_REPORTED_REJECTS:
+            result.rejects.append(BulkIngestReject(line=line_no, error=error))
+    
+    async def insert(chunk: List[Tuple[int, dict]]):
+        if not chunk:
+            # Every row folded into an existing incident
+            return
+        docs = [{**doc, LOCATION_FIELD: geo_point(doc['lat'], doc['lng'])} for _, doc in chunk]
+        failed: Dict[int, str] = {}
+        try:
+            await db.incidents.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {err['index']: err.get('errmsg', 'Write failed') for err in e.details.get('writeErrors', [])}
+        written = []
+        for position, (line_no, doc) in enumerate(chunk):
+            if position in failed:
+                reject(line_no, failed[position])
+            else:
+                written.append(doc)
+        result.accepted += len(written)
+        register_new_incidents(written, local=True)
+        # insert_many set _id on the documents it was given
+        incident_snapshot.advance_watermark(max((stored['_id'] for position, stored in enumerate(docs)
+                                                 if position not in failed), default=None))
+    
+    async def write(chunk: List[Tuple[int, dict, bool]]):
+        if incident_dedup is None:
+            await insert([(line_no, doc) for line_no, doc, _ in chunk])
+            return
+        reports = incident_dedup.fold_batch([doc for _, doc, feed_id in chunk if not feed_id])
+        await incident_dedup.reserve(reports)
+        try:
+            survivors = {id(doc) for doc in reports if await fold_into_existing(doc) is None}
+            kept = [(line_no, doc) for line_no, doc, feed_id in chunk if feed_id or id(doc) in survivors]
+            result.accepted += len(chunk) - len(kept)
+            result.merged += len(chunk) - len(kept)
+            await insert(kept)
+        finally:
+            incident_dedup.release(reports)
+    
+    chunk: List[Tuple[int, dict, bool]] = []
+    async for line_no, row in iter_records(request.stream(), is_csv):
+        if isinstance(row, str):
+            reject(line_no, row)
+            continue
+        try:
+            incident = IncidentImport.model_validate(row)
+        except ValidationError as e:
+            error = e.errors(include_url=False)[0]
+            reject(line_no, f"{'.'.join(str(p) for p in error['loc'])}: {error['msg']}")
+            continue
+        reported = iso_utc(incident.timestamp) if incident.timestamp else datetime.now(timezone.utc).isoformat()
+        chunk.append((line_no, {
+            "id": incident.id or str(uuid.uuid4()),
+            "lat": incident.lat,
+            "lng": incident.lng,
+            "incident_type": incident.incident_type,
+            "severity": incident.severity,
+            "description": incident.description,
+            "timestamp": reported,
+            "anonymous": True,
+            "report_count": 1,
+            "last_reported_at": reported,
+        }, incident.id is not None))
+        if len(chunk) >= INGEST_CHUNK_SIZE:
+            await write(chunk)
+            chunk = []
+    if chunk:
+        await write(chunk)
+    return result
+
+@api_router.get("/incidents/stream")
+async def stream_incidents(request: Request,
+                           bbox: Optional[str] = Query(None, description="Viewport as min_lat,min_lng,max_lat,max_lng")):
+    """Push newly created incidents inside the viewport as server-sent events.
+    
+    Sends `incident` events carrying the incident JSON, and a `resync` event
+    when this client fell behind and should refetch its viewport. Clients
+    reconnect with a new bbox when the viewport changes.
+    """
+    try:
+        viewport = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(incident_feed) >= FEED_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Too many live subscribers")
+    
+    subscription = incident_feed.subscribe(viewport)
+    
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                item = await subscription.next(FEED_HEARTBEAT_SECONDS)
+                if item is None:
+                    # Keeps proxies from closing the idle connection
+                    yield ": keepalive\n\n"
+                elif item is RESYNC:
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    yield f"event: incident\ndata: {json.dumps(item)}\n\n"
+        finally:
+            incident_feed.unsubscribe(subscription)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @api_router.get("/incidents", response_model=List[Incident])
-async def get_incidents():
-    """Get all incidents"""
-    incidents = await db.incidents.find({}, {"_id": 0}).to_list(1000)
+async def get_incidents(
+    response: Response,
+    bbox: Optional[str] = Query(None, description="Viewport as min_lat,min_lng,max_lat,max_lng"),
+    since: Optional[datetime] = Query(None, description="Only incidents at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only incidents before this time"),
+    min_severity: Optional[int] = Query(None, ge=1, le=5),
+    max_severity: Optional[int] = Query(None, ge=1, le=5),
+    limit: Optional[int] = Query(None, ge=1, description="Page size (JSON) or maximum rows (NDJSON)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    fast: bool = Query(False, description="Skip response model validation and encode with the fast JSON path"),
+    accept: Optional[str] = Header(None),
+):
+    """Get incidents, newest first, filtered by viewport, time window and severity.
     
-    for incident in incidents:
-        if isinstance(incident['timestamp'], str):
-            incident['timestamp'] = datetime.fromisoformat(incident['timestamp'])
+    JSON responses are paginated by keyset; the X-Next-Cursor header is set
+    when more results exist. NDJSON (format=ndjson or Accept:
+    application/x-ndjson) streams every match straight from the cursor.
+    With fast=true the stored documents are encoded as-is (timestamps keep
+    their stored ISO form) instead of being re-validated as Incident models.
+    """
+    try:
+        bounds = parse_bbox(bbox)
+        query = incident_filter(bounds, since, until, min_severity, max_severity,
+                                decode_cursor(cursor) if cursor else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
+    if format == "ndjson" or (format is None and accept and NDJSON_MEDIA_TYPE in accept):
+        mongo_cursor = db.incidents.find(query, DOCUMENT_PROJECTION).sort(INCIDENT_SORT)
+        if limit is not None:
+            mongo_cursor = mongo_cursor.limit(limit)
+        
+        async def stream():
+            async for incident in mongo_cursor:
+                yield dumps(incident) + b"\n"
+        
+        return StreamingResponse(stream(), media_type=NDJSON_MEDIA_TYPE)
+    
+    page_size = limit or INCIDENT_PAGE_SIZE
+    if page_size > INCIDENT_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be at most {INCIDENT_MAX_PAGE_SIZE}; use format=ndjson for bulk export")
+    
+    async def fetch_page():
+        # Fetch one extra row to learn whether another page exists
+        incidents = await db.incidents.find(query, DOCUMENT_PROJECTION).sort(INCIDENT_SORT).to_list(page_size + 1)
+        if len(incidents) <= page_size:
+            return incidents, None
+        incidents = incidents[:page_size]
+        last = incidents[-1]
+        return incidents, encode_cursor(str(last['timestamp']), last['id'])
+    
+    page_key = incident_flight.key(*(bounds or (None,)), since, until, min_severity, max_severity, cursor, page_size)
+    incidents, next_cursor = await incident_flight.run(page_key, fetch_page)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    if fast:
+        # A returned Response bypasses the injected one, so carry its headers over
+        return FastJSONResponse(incidents, headers=dict(response.headers))
     return incidents
 
+@api_router.get("/incidents/clusters", response_model=ClusterResponse)
+async def get_incident_clusters(
+    bbox: str = Query(..., description="Viewport as min_lat,min_lng,max_lat,max_lng"),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM),
+):
+    """Get incident clusters for a map viewport: per-cell count, centroid, max severity and type histogram"""
+    try:
+        bounds = parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    tiles = tiles_for_bbox(*bounds, zoom)
+    if len(tiles) > CLUSTER_MAX_TILES_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"Viewport spans {len(tiles)} tiles at zoom {zoom}; use a lower zoom")
+    
+    if await incident_snapshot.get() is None:
+        # Dataset too large to hold in memory: aggregate in Mongo instead
+        match = incident_filter(bounds)
+        cells = await db.incidents.aggregate(cluster_pipeline(match, zoom)).to_list(None)
+        return ClusterResponse(zoom=zoom, cells_per_tile=CELLS_PER_TILE, tiles=len(tiles), cells=cells)
+    
+    cells = []
+    for x, y in tiles:
+        key = (zoom, x, y)
+        tile_cells = cluster_tiles.get(key)
+        if tile_cells is None:
+            rows = incident_index.candidates(*tile_bounds(x, y, zoom))
+            tile_cells = aggregate_tile_columns(rows.lat, rows.lng, rows.severity,
+                                                incident_index.type_names(rows.type_code), x, y, zoom)
+            cluster_tiles.put(key, tile_cells)
+        cells.extend(tile_cells)
+    
+    return ClusterResponse(zoom=zoom, cells_per_tile=CELLS_PER_TILE, tiles=len(tiles), cells=cells)
+
 @api_router.get("/tollgates", response_model=List[TollGate])
 async def get_tollgates():
     """Get all toll gates"""
     tollgates = await db.tollgates.find({}, {"_id": 0}).to_list(1000)
     return tollgates
 
-@api_router.post("/routes/calculate", response_model=RouteResponse)
-async def calculate_route(request: RouteRequest):
-    """Calculate safest and shortest routes"""
-    # Get incidents and tollgates
-    incidents = await db.incidents.find({}, {"_id": 0}).to_list(1000)
-    tollgates = await db.tollgates.find({}, {"_id": 0}).to_list(1000)
-    
-    # Generate routes
-    safest_points = generate_route_points(request.start_lat, request.start_lng, 
-                                         request.end_lat, request.end_lng, 
-                                         incidents, is_safest=True)
-    shortest_points = generate_route_points(request.start_lat, request.start_lng, 
-                                           request.end_lat, request.end_lng, 
-                                           incidents, is_safest=False)
+@phase("route_generation")
+def plan_route(request: RouteRequest, incidents: IncidentStore) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+    """Return (safest, shortest) route points for a request"""
+    # Route on the graph when both endpoints are inside the service area
+    safest_points = shortest_points = None
+    if road_graph is not None:
+        shortest_points = road_graph.route(request.start_lat, request.start_lng,
+                                           request.end_lat, request.end_lng)
+        safest_points = road_graph.route(request.start_lat, request.start_lng,
+                                         request.end_lat, request.end_lng,
+                                         use_risk=True, heuristic_weight=SAFE_ROUTE_HEURISTIC_WEIGHT)
     
-    # Calculate safety metrics for safest route
-    incident_count, toll_count = await calculate_route_safety(safest_points, incidents, tollgates)
+    if safest_points is None or shortest_points is None:
+        safest_points = generate_route_points(request.start_lat, request.start_lng, 
+                                             request.end_lat, request.end_lng, 
+                                             incidents, is_safest=True)
+        shortest_points = generate_route_points(request.start_lat, request.start_lng, 
+                                               request.end_lat, request.end_lng, 
+                                               incidents, is_safest=False)
+    return safest_points, shortest_points
+
+@phase("response_build")
+def build_route_response(safest_points: List[Tuple[float, float]], shortest_points: List[Tuple[float, float]],
+                         incident_count: int, toll_count: int, incident_risk: float) -> dict:
+    """Assemble the route result from planned points and safety counts.
     
-    # Calculate distance
-    total_distance = calculate_distance(request.start_lat, request.start_lng, 
-                                       request.end_lat, request.end_lng)
+    Routes stay as (lat, lng) tuples; render_route() encodes them for the
+    response, so cached results never pay for per-point model objects.
+    """
+    # Calculate distance along the safest route
+    total_distance = polyline_length(safest_points)
     
     # Calculate safety score
-    safety_score = calculate_safety_score(incident_count, toll_count, total_distance)
+    safety_score = calculate_safety_score(incident_risk, toll_count, total_distance)
     
     # Estimated time (assuming 40 km/h average speed)
     estimated_time = int((total_distance / 40) * 60)
     
-    return RouteResponse(
-        safest_route=[RoutePoint(lat=p[0], lng=p[1]) for p in safest_points],
-        shortest_route=[RoutePoint(lat=p[0], lng=p[1]) for p in shortest_points],
-        safety_score=safety_score,
-        distance_km=round(total_distance, 2),
-        incident_count=incident_count,
-        toll_count=toll_count,
-        estimated_time_min=estimated_time
-    )
+    return {
+        "safest_route": list(safest_points),
+        "shortest_route": list(shortest_points),
+        "safety_score": safety_score,
+        "distance_km": round(total_distance, 2),
+        "incident_count": incident_count,
+        "toll_count": toll_count,
+        "estimated_time_min": estimated_time,
+    }
+
+def with_request_endpoints(result: dict, request: RouteRequest) -> dict:
+    """Cached result with its route ends moved to the exact requested coordinates"""
+    start = (request.start_lat, request.start_lng)
+    end = (request.end_lat, request.end_lng)
+    return {
+        **result,
+        "safest_route": [start, *result["safest_route"][1:-1], end],
+        "shortest_route": [start, *result["shortest_route"][1:-1], end],
+    }
+
+def render_route(result: dict, geometry: str = GEOMETRY_POINTS) -> dict:
+    """Route result with both routes in the requested geometry encoding"""
+    return {
+        **result,
+        "safest_route": encode_geometry(result["safest_route"], geometry),
+        "shortest_route": encode_geometry(result["shortest_route"], geometry),
+    }
+
+def compute_route(request: RouteRequest, incidents: IncidentStore, tollgates: SpatialIndex) -> dict:
+    """Plan and score one route; CPU-bound, run on the route executor"""
+    safest_points, shortest_points = plan_route(request, incidents)
+    
+    # Safety metrics along the whole safest route
+    incident_count, toll_count, incident_risk = score_routes([safest_points], incidents, tollgates)[0]
+    return build_route_response(safest_points, shortest_points, incident_count, toll_count, incident_risk)
+
+def compute_routes(requests: List[RouteRequest], incidents: IncidentStore, tollgates: SpatialIndex) -> List[object]:
+    """Plan many routes, then score each planned route; run on the route executor.
+    
+    Scoring is per route (corridor queries are vectorized within a route,
+    not across routes). Returns a result dict per request, or an error
+    string where planning failed.
+    """
+    results: List[object] = [None] * len(requests)
+    planned = {}
+    for position, item in enumerate(requests):
+        try:
+            planned[position] = plan_route(item, incidents)
+        except Exception as e:
+            logger.exception("Batch route planning failed")
+            results[position] = str(e)
+    
+    positions = list(planned)
+    counts = score_routes([planned[p][0] for p in positions], incidents, tollgates) if positions else []
+    for position, (incident_count, toll_count, incident_risk) in zip(positions, counts):
+        results[position] = build_route_response(*planned[position], incident_count, toll_count, incident_risk)
+    return results
+
+def route_geometry(geometry: Optional[str], accept: Optional[str]) -> str:
+    """Negotiated route geometry encoding; 406 for an unknown Accept parameter"""
+    try:
+        return negotiate_geometry(geometry, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+def route_response(result: dict, geometry: str, fast: bool):
+    """Validated RouteResponse by default; compact geometries and fast mode skip validation"""
+    if fast or geometry != GEOMETRY_POINTS:
+        return FastJSONResponse(render_route(result, geometry))
+    return render_route(result)
+
+@api_router.post("/routes/calculate", response_model=RouteResponse)
+async def calculate_route(
+    request: RouteRequest,
+    geometry: Optional[str] = Query(None, pattern=GEOMETRY_PATTERN,
+                                    description="Route encoding: points (default), flat [lat, lng, ...] or polyline"),
+    fast: bool = Query(False, description="Skip response model validation and encode with the fast JSON path"),
+    accept: Optional[str] = Header(None),
+):
+    """Calculate safest and shortest routes.
+    
+    The route geometry can also be negotiated with an Accept parameter, e.g.
+    `Accept: application/json; geometry=polyline` (precision 5).
+    """
+    encoding = route_geometry(geometry, accept)
+    cache_key = route_cache.key(request.start_lat, request.start_lng, request.end_lat, request.end_lng)
+    cached = route_cache.get(cache_key)
+    if cached is not None:
+        stats_counters.record_routes()
+        return route_response(with_request_endpoints(cached, request), encoding, fast)
+    
+    flight_key = route_flight.key(route_cache.version, request.start_lat, request.start_lng,
+                                  request.end_lat, request.end_lng)
+    try:
+        result = await route_flight.run(flight_key, calculate_and_cache_route, request, cache_key)
+    except Overloaded:
+        raise HTTPException(status_code=503, detail="Route service is busy, retry shortly",
+                            headers={"Retry-After": str(ROUTE_RETRY_AFTER_SECONDS)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Route calculation timed out")
+    stats_counters.record_routes()
+    
+    # Coalesced callers share the leader's result; each gets its own endpoints
+    return route_response(with_request_endpoints(result, request), encoding, fast)
+
+async def calculate_and_cache_route(request: RouteRequest, cache_key) -> dict:
+    """Compute a route on the executor and cache it; run once per group of coalesced requests"""
+    incidents, tollgates = await route_indexes(request)
+    result = await route_executor.run(compute_route, request, incidents, tollgates)
+    route_cache.put(cache_key, result)
+    return result
+
+@api_router.post("/routes/calculate/batch")
+async def calculate_route_batch(
+    batch: RouteBatchRequest,
+    geometry: Optional[str] = Query(None, pattern=GEOMETRY_PATTERN),
+    accept: Optional[str] = Header(None),
+):
+    """Calculate routes for many origin/destination pairs.
+    
+    Streams one NDJSON line per item, in request order, as each chunk
+    finishes: {"index": i, "result": RouteResponse | null, "error": str | null}.
+    Incident and tollgate data are loaded once for the whole batch. Route
+    geometry is negotiated as for /routes/calculate.
+    """
+    encoding = route_geometry(geometry, accept)
+    if len(batch.routes) > ROUTE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {ROUTE_BATCH_MAX_ITEMS} routes per batch")
+    
+    # Validate items individually so one bad pair does not fail the batch
+    requests_or_errors = []
+    for item in batch.routes:
+        try:
+            requests_or_errors.append(RouteRequest.model_validate(item))
+        except ValidationError as e:
+            requests_or_errors.append(e.errors(include_url=False)[0]['msg'])
+    
+    valid = [r for r in requests_or_errors if isinstance(r, RouteRequest)]
+    if valid:
+        # One read covering every pair when the snapshots are not cached
+        incidents, tollgates = await route_indexes(RouteRequest(
+            start_lat=min(min(r.start_lat, r.end_lat) for r in valid),
+            start_lng=min(min(r.start_lng, r.end_lng) for r in valid),
+            end_lat=max(max(r.start_lat, r.end_lat) for r in valid),
+            end_lng=max(max(r.start_lng, r.end_lng) for r in valid),
+        ))
+    
+    async def stream():
+        for chunk_start in range(0, len(requests_or_errors), ROUTE_BATCH_CHUNK_SIZE):
+            chunk = requests_or_errors[chunk_start:chunk_start + ROUTE_BATCH_CHUNK_SIZE]
+            pending = []
+            results = {}
+            errors = {}
+            # Keys carry the data version at lookup, so results computed across a bump are not cached
+            cache_keys = {}
+            for offset, item in enumerate(chunk):
+                if not isinstance(item, RouteRequest):
+                    errors[offset] = item
+                    continue
+                cache_keys[offset] = route_cache.key(item.start_lat, item.start_lng, item.end_lat, item.end_lng)
+                cached = route_cache.get(cache_keys[offset])
+                if cached is not None:
+                    results[offset] = with_request_endpoints(cached, item)
+                    continue
+                pending.append(offset)
+            
+            # Plan and score the rest of the chunk in one executor job
+            if pending:
+                try:
+                    computed = await route_executor.run(compute_routes, [chunk[o] for o in pending],
+                                                        incidents, tollgates)
+                except Overloaded:
+                    computed = ["Route service is busy, retry shortly"] * len(pending)
+                except asyncio.TimeoutError:
+                    computed = ["Route calculation timed out"] * len(pending)
+                for offset, outcome in zip(pending, computed):
+                    if isinstance(outcome, str):
+                        errors[offset] = outcome
+                        continue
+                    results[offset] = outcome
+                    route_cache.put(cache_keys[offset], outcome)
+            stats_counters.record_routes(len(results))
+            
+            lines = []
+            for offset in range(len(chunk)):
+                result = results.get(offset)
+                line = {"index": chunk_start + offset,
+                        "result": render_route(result, encoding) if result is not None else None,
+                        "error": errors.get(offset)}
+                lines.append(dumps(line) + b"\n")
+            yield b"".join(lines)
+            # Let other requests run between chunks
+            await asyncio.sleep(0)
+    
+    return StreamingResponse(stream(), media_type=NDJSON_MEDIA_TYPE)
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss metrics for the in-process data caches"""
+    return {
+        "incidents": incident_snapshot.stats(),
+        "tollgates": tollgate_snapshot.stats(),
+        "cluster_tiles": cluster_tiles.stats(),
+        "routes": route_cache.stats(),
+        "incident_feed": incident_feed.stats(),
+        "stats_flushes": stats_counters.flushes,
+        "route_executor": route_executor.stats(),
+        "incident_dedup": incident_dedup.stats() if incident_dedup is not None else None,
+        "coalescing": {flight.name: flight.stats() for flight in (route_flight, incident_flight)},
+        "shared_state": {**shared_state.stats(), "risk_generation": shared_risk_generation}
+        if shared_state is not None else None,
+    }
 
 @api_router.get("/emergency-contacts", response_model=List[EmergencyContact])
 async def get_emergency_contacts():
@@ -310,27 +1086,32 @@ async def get_emergency_contacts():
 
 @api_router.get("/stats", response_model=SafetyStats)
 async def get_safety_stats():
-    """Get safety statistics"""
-    total_incidents = await db.incidents.count_documents({})
-    total_tollgates = await db.tollgates.count_documents({})
-    high_risk = await db.incidents.count_documents({"severity": {"$gte": 4}})
-    
+    """Get safety statistics (served from in-memory counters)"""
     return SafetyStats(
-        total_incidents=total_incidents,
-        total_tollgates=total_tollgates,
-        high_risk_areas=high_risk,
-        safe_routes_calculated=0  # This would be tracked in production
+        total_incidents=stats_counters.total_incidents,
+        total_tollgates=stats_counters.total_tollgates,
+        high_risk_areas=stats_counters.high_risk_areas,
+        safe_routes_calculated=stats_counters.routes_calculated,
+        routes_by_hour=stats_counters.routes_by_hour()
     )
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition of request, phase and Mongo metrics"""
+    return Response(content=registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -344,7 +1125,51 @@ logger = logging.getLogger(__name__)
 async def startup_event():
     await init_sample_data()
     logger.info("Sample data initialized")
+    for collection in (db.incidents, db.tollgates):
+        migrated = await migrate_locations(collection)
+        if migrated:
+            logger.info(f"Backfilled {LOCATION_FIELD} on {migrated} {collection.name} documents")
+    migrated = await migrate_report_counts(db.incidents)
+    if migrated:
+        logger.info(f"Backfilled report_count on {migrated} incidents")
+    await ensure_indexes(db)
+    await stats_counters.load()
+    if shared_state is not None and shared_state.try_lead():
+        logger.info(f"Leading shared state in {SHARED_STATE_DIR} (pid {os.getpid()})")
+    started = time.perf_counter()
+    if not await incident_snapshot.load_file():
+        await incident_snapshot.reload()
+    logger.info(f"Incident store ready in {time.perf_counter() - started:.2f}s "
+                f"({incident_snapshot.store.memory_bytes() // 1024} KiB, mapped={incident_snapshot.store.mapped_path is not None})")
+    await tollgate_snapshot.reload()
+    await rebuild_derived_state()
+    incident_snapshot.on_reload(rebuild_derived_state)
+    tollgate_snapshot.on_reload(rebuild_derived_state)
+    logger.info(f"Snapshots loaded ({len(incident_index)} incidents, {len(tollgate_index)} tollgates)")
+    logger.info(f"Risk grid built ({risk_grid.rows}x{risk_grid.cols} cells, {risk_grid.memory_bytes() // 1024} KiB)")
+    global road_graph
+    road_graph = await load_road_graph()
+    logger.info(f"Road graph ready ({road_graph.node_count} nodes, {road_graph.edge_count} edges)")
+    
+    # Dedup folds only bump counters the snapshot does not hold
+    watch_incidents = incident_snapshot.watch(lambda doc: register_new_incidents([doc]), ignored_fields=FOLD_FIELDS)
+    background_tasks.append(asyncio.create_task(watch_incidents))
+    background_tasks.append(asyncio.create_task(tollgate_snapshot.watch(lambda doc: tollgate_snapshot.invalidate())))
+    background_tasks.append(asyncio.create_task(stats_counters.run_flusher(STATS_FLUSH_SECONDS)))
+    background_tasks.append(asyncio.create_task(monitor_event_loop()))
+    if DERIVED_STATE_REBUILD_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_derived_state_rebuilds(DERIVED_STATE_REBUILD_SECONDS)))
+    if shared_state is not None and not shared_state.is_leader:
+        background_tasks.append(asyncio.create_task(follow_shared_state()))
+    # Every worker runs the saver; save() skips followers, so a worker that
+    # takes over leadership starts writing the file
+    background_tasks.append(asyncio.create_task(incident_snapshot.run_saver(INCIDENT_SNAPSHOT_SAVE_SECONDS)))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    # Let the stats flusher write its final flush before the client closes
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    route_executor.shutdown()
     client.close()
\ No newline at end of file
@@ -0,0 +1,133 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SharedArrayStore:
+    """Generation-numbered NumPy array sets shared by worker processes through mmap.
+
+    One worker holds the leader lock and publishes derived arrays; every
+    other worker maps the published files instead of building its own copy,
+    so the pages are shared through the OS page cache. Arrays are mapped
+    copy-on-write: a worker may still patch them in place (new incidents),
+    which only duplicates the pages it touches.
+
+    Each named set has a small JSON manifest replaced atomically on publish.
+    Followers poll generation(), a stat and a tiny read, as the invalidation
+    channel. Old generations are unlinked after `keep` newer ones exist;
+    workers still mapping them keep their pages until they remap.
+    """
+
+    def __init__(self, directory: str, keep: int = 2):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self._lock_file = None
+        self._manifest_cache: Dict[str, Tuple[int, Optional[dict]]] = {}
+        self.published = 0
+        self.loads = 0
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_file is not None
+
+    def try_lead(self) -> bool:
+        """Take the leader lock without blocking; it is released when this process exits"""
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.directory / "leader.lock", "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._lock_file = lock_file
+        return True
+
+    def _manifest_path(self, name: str) -> Path:
+        return self.directory / f"{name}.json"
+
+    def _manifest(self, name: str) -> Optional[dict]:
+        path = self._manifest_path(name)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._manifest_cache.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            manifest = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        self._manifest_cache[name] = (mtime, manifest)
+        return manifest
+
+    def generation(self, name: str) -> Optional[int]:
+        """Latest published generation of a set, or None if it was never published"""
+        manifest = self._manifest(name)
+        return manifest["generation"] if manifest is not None else None
+
+    def publish(self, name: str, arrays: Dict[str, np.ndarray], meta: Optional[dict] = None) -> int:
+        """Write a new generation of a set and make it current; returns its number"""
+        generation = (self.generation(name) or 0) + 1
+        staging = Path(tempfile.mkdtemp(prefix=f".{name}-", dir=self.directory))
+        for key, array in arrays.items():
+            np.save(staging / f"{key}.npy", np.ascontiguousarray(array), allow_pickle=False)
+        target = self.directory / f"{name}-{generation}"
+        if target.exists():
+            shutil.rmtree(target)
+        os.rename(staging, target)
+
+        manifest = {"generation": generation, "arrays": sorted(arrays), "meta": meta or {}}
+        tmp = self._manifest_path(name).with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, self._manifest_path(name))
+        self.published += 1
+        self._prune(name, generation)
+        return generation
+
+    def load(self, name: str) -> Optional[Tuple[int, Dict[str, np.ndarray], dict]]:
+        """Map the current generation of a set: (generation, arrays, meta), or None if unpublished"""
+        manifest = self._manifest(name)
+        if manifest is None:
+            return None
+        folder = self.directory / f"{name}-{manifest['generation']}"
+        try:
+            arrays = {key: np.load(folder / f"{key}.npy", mmap_mode="c", allow_pickle=False)
+                      for key in manifest["arrays"]}
+        except FileNotFoundError:
+            # Pruned between reading the manifest and mapping; the next poll catches up
+            return None
+        self.loads += 1
+        return manifest["generation"], arrays, manifest["meta"]
+
+    def _prune(self, name: str, current: int) -> None:
+        for folder in self.directory.glob(f"{name}-*"):
+            try:
+                generation = int(folder.name.rsplit("-", 1)[1])
+            except ValueError:
+                continue
+            if generation <= current - self.keep:
+                shutil.rmtree(folder, ignore_errors=True)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "directory": str(self.directory),
+            "leader": self.is_leader,
+            "published": self.published,
+            "loads": self.loads,
+        }
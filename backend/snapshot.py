@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionSnapshot:
+    """Versioned in-process copy of a Mongo collection.
+
+    The first get() loads the collection; later calls return the cached list
+    without touching the database. Writes made by this process are patched
+    in with apply_insert(), and watch() follows a change stream when the
+    deployment supports one. Without a live change stream the copy expires
+    after ttl_seconds; the stale copy keeps being served while a background
+    task reloads it.
+
+    If the collection grows past max_documents the copy is evicted and get()
+    returns None, so callers fall back to querying Mongo directly.
+    """
+
+    def __init__(self, name: str, collection: Callable[[], object], projection: Optional[dict] = None,
+                 ttl_seconds: float = 300, max_documents: int = 1_000_000):
+        self.name = name
+        self._collection = collection
+        self.projection = projection if projection is not None else {"_id": 0}
+        self._excluded = {field for field, include in self.projection.items() if not include}
+        self.ttl_seconds = ttl_seconds
+        self.max_documents = max_documents
+
+        self.docs: List[dict] = []
+        self._ids = set()
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self.oversized = False
+        self._stale = True
+        # True while watch() follows a change stream, which then replaces the TTL
+        self.watching = False
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._reload_listeners: List[Callable[[List[dict]], Awaitable[None]]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.patches = 0
+        self.invalidations = 0
+
+    def on_reload(self, listener: Callable[[List[dict]], Awaitable[None]]) -> None:
+        """Register a coroutine called with the new document list after every reload"""
+        self._reload_listeners.append(listener)
+
+    @property
+    def available(self) -> bool:
+        return self.loaded_at is not None and not self.oversized
+
+    def _expired(self) -> bool:
+        if self._stale:
+            return True
+        return not self.watching and time.monotonic() - self.loaded_at > self.ttl_seconds
+
+    async def get(self) -> Optional[List[dict]]:
+        """Return the cached documents, or None when the collection is too large to cache"""
+        if self.loaded_at is None:
+            self.misses += 1
+            await self.reload()
+        elif self._expired():
+            self.misses += 1
+            self._schedule_refresh()
+        else:
+            self.hits += 1
+        return self.docs if not self.oversized else None
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.reload())
+
+    async def reload(self) -> None:
+        """Load the whole collection and notify reload listeners"""
+        async with self._lock:
+            collection = self._collection()
+            count = await collection.count_documents({})
+            if count > self.max_documents:
+                if not self.oversized:
+                    logger.warning(f"{self.name} snapshot evicted: {count} documents exceeds {self.max_documents}")
+                docs = []
+                self.oversized = True
+            else:
+                docs = await collection.find({}, self.projection).to_list(None)
+                self.oversized = False
+
+            self.docs = docs
+            self._ids = {doc.get('id') for doc in docs}
+            self.version += 1
+            self.loaded_at = time.monotonic()
+            self._stale = False
+            self.reloads += 1
+
+            for listener in self._reload_listeners:
+                await listener(docs)
+
+    def apply_insert(self, doc: dict) -> bool:
+        """Patch a newly written document in; returns False if it was already present"""
+        if self.oversized or doc.get('id') in self._ids:
+            return False
+        self.docs.append(doc)
+        self._ids.add(doc.get('id'))
+        self.version += 1
+        self.patches += 1
+        return True
+
+    def invalidate(self) -> None:
+        """Mark the copy stale so the next get() triggers a background reload"""
+        self._stale = True
+        self.invalidations += 1
+
+    async def watch(self, on_insert: Callable[[dict], None], ignored_fields: Iterable[str] = ()) -> None:
+        """Follow the collection's change stream until cancelled.
+
+        Inserts are handed to on_insert. Updates that only set
+        ignored_fields (fields the copy does not depend on) are skipped; any
+        other change invalidates the copy. While the stream is live the TTL
+        is not applied. Standalone servers have no change streams, in which
+        case this returns and the TTL alone keeps the copy fresh; a stream
+        that fails after opening invalidates the copy, since changes may
+        have been missed.
+        """
+        ignored = set(ignored_fields)
+        try:
+            async with self._collection().watch() as stream:
+                logger.info(f"Watching {self.name} change stream")
+                self.watching = True
+                async for change in stream:
+                    operation = change.get('operationType')
+                    if operation == 'insert':
+                        self._saw_insert(change['fullDocument'])
+                        doc = {k: v for k, v in change['fullDocument'].items() if k not in self._excluded}
+                        on_insert(doc)
+                    elif operation == 'update' and self._only_touches(change, ignored):
+                        continue
+                    else:
+                        self.invalidate()
+        except OperationFailure as e:
+            if self.watching:
+                logger.warning(f"{self.name} change stream stopped: {e}")
+                self.invalidate()
+            else:
+                logger.info(f"Change streams unavailable for {self.name} ({e.code}); relying on TTL refresh")
+        except (PyMongoError, NotImplementedError) as e:
+            logger.warning(f"{self.name} change stream stopped: {e}")
+            if self.watching:
+                self.invalidate()
+        finally:
+            self.watching = False
+
+    def _saw_insert(self, doc: dict) -> None:
+        """Hook called with each inserted document as stored, before it is projected"""
+
+    @staticmethod
+    def _only_touches(change: dict, fields: set) -> bool:
+        description = change.get('updateDescription') or {}
+        touched = set(description.get('updatedFields') or {}) | set(description.get('removedFields') or [])
+        return bool(fields) and touched <= fields
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "documents": len(self.docs),
+            "oversized": self.oversized,
+            "watching": self.watching,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.loaded_at is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "reloads": self.reloads,
+            "patches": self.patches,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,158 @@
+import math
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371
+# Cells a polyline walk may visit before it falls back to the polyline's bounding box
+MAX_POLYLINE_CELLS = 100_000
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in km (haversine formula)"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lng = math.radians(lng2 - lng1)
+
+    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lng/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def degree_window(lat: float, radius_km: float) -> Tuple[float, float]:
+    """Return (dlat, dlng) in degrees that fully contains a radius_km circle around lat.
+
+    dlat is exact along a meridian. dlng uses the spherical bound
+    asin(sin(r/R) / cos(lat)); near the poles the window covers every longitude.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angular)
+    cos_lat = math.cos(math.radians(min(90.0, abs(lat) + dlat)))
+    ratio = math.sin(angular) / cos_lat if cos_lat > 1e-12 else 2.0
+    dlng = 180.0 if ratio >= 1 else math.degrees(math.asin(ratio))
+    return dlat, dlng
+
+
+def polyline_window(points: Sequence[Tuple[float, float]], radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) containing everything within radius_km of the points"""
+    min_lat = min(p[0] for p in points)
+    max_lat = max(p[0] for p in points)
+    min_lng = min(p[1] for p in points)
+    max_lng = max(p[1] for p in points)
+    dlat, dlng = degree_window(max(abs(min_lat), abs(max_lat)), radius_km)
+    return min_lat - dlat, min_lng - dlng, max_lat + dlat, max_lng + dlng
+
+
+class SpatialIndex:
+    """Uniform lat/lng grid of buckets holding documents with 'lat'/'lng' keys.
+
+    Lookups only visit the buckets overlapping the query window and then apply
+    the exact haversine check, so results match a full scan.
+    """
+
+    def __init__(self, cell_size_deg: float = 0.01):
+        self.cell_size_deg = cell_size_deg
+        self._cells: Dict[Tuple[int, int], List[dict]] = defaultdict(list)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[dict]:
+        for docs in self._cells.values():
+            yield from docs
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_size_deg), math.floor(lng / self.cell_size_deg)
+
+    def insert(self, doc: dict) -> None:
+        """Add a document to the index"""
+        self._cells[self._cell(doc['lat'], doc['lng'])].append(doc)
+        self._size += 1
+
+    def extend(self, docs: Iterable[dict]) -> None:
+        for doc in docs:
+            self.insert(doc)
+
+    def remove(self, doc: dict) -> None:
+        """Remove this document object (compared by identity) if it is indexed"""
+        cell = self._cell(doc['lat'], doc['lng'])
+        docs = self._cells.get(cell, [])
+        for position, indexed in enumerate(docs):
+            if indexed is doc:
+                del docs[position]
+                self._size -= 1
+                if not docs:
+                    del self._cells[cell]
+                return
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._size = 0
+
+    def candidates(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> Iterator[dict]:
+        """Yield documents in buckets overlapping the bounding box (superset of the box)"""
+        lat0, lng0 = self._cell(min_lat, min_lng)
+        lat1, lng1 = self._cell(max_lat, max_lng)
+        if (lat1 - lat0 + 1) * (lng1 - lng0 + 1) > len(self._cells):
+            # Window spans more cells than are populated - walk the populated ones.
+            # A copy, since route threads read while the event loop inserts.
+            for (cell_lat, cell_lng), docs in list(self._cells.items()):
+                if lat0 <= cell_lat <= lat1 and lng0 <= cell_lng <= lng1:
+                    yield from docs
+            return
+        for cell_lat in range(lat0, lat1 + 1):
+            for cell_lng in range(lng0, lng1 + 1):
+                docs = self._cells.get((cell_lat, cell_lng))
+                if docs:
+                    yield from docs
+
+    def polyline_candidates(self, points: Sequence[Tuple[float, float]], radius_km: float) -> List[dict]:
+        """Documents in buckets that could lie within radius_km of any segment of the polyline.
+
+        Segments are walked in cell-sized pieces, so a long diagonal route
+        visits the cells along it rather than its whole bounding box. A walk
+        that would visit more than MAX_POLYLINE_CELLS cells (a very long
+        route, or a window that wraps every longitude near a pole) returns
+        the bounding box's candidates instead.
+        """
+        points = list(points)
+        if not points:
+            return []
+        if len(points) == 1:
+            points = points * 2
+        step = self.cell_size_deg
+        keys = set()
+        visited = 0
+        for (lat1, lng1), (lat2, lng2) in zip(points, points[1:]):
+            pieces = max(1, math.ceil(max(abs(lat2 - lat1), abs(lng2 - lng1)) / step))
+            for i in range(pieces):
+                a, b = i / pieces, (i + 1) / pieces
+                piece_lats = (lat1 + (lat2 - lat1) * a, lat1 + (lat2 - lat1) * b)
+                piece_lngs = (lng1 + (lng2 - lng1) * a, lng1 + (lng2 - lng1) * b)
+                min_lat, max_lat = min(piece_lats), max(piece_lats)
+                min_lng, max_lng = min(piece_lngs), max(piece_lngs)
+                dlat, dlng = degree_window(max(abs(min_lat), abs(max_lat)), radius_km)
+                row0, col0 = self._cell(min_lat - dlat, min_lng - dlng)
+                row1, col1 = self._cell(max_lat + dlat, max_lng + dlng)
+                visited += (row1 - row0 + 1) * (col1 - col0 + 1)
+                if visited > MAX_POLYLINE_CELLS:
+                    return list(self.candidates(*polyline_window(points, radius_km)))
+                keys.update((row, col) for row in range(row0, row1 + 1) for col in range(col0, col1 + 1))
+        docs: List[dict] = []
+        for key in keys:
+            cell_docs = self._cells.get(key)
+            if cell_docs:
+                docs.extend(cell_docs)
+        return docs
+
+    def nearby(self, lat: float, lng: float, radius_km: float,
+               predicate: Optional[Callable[[dict], bool]] = None) -> Iterator[dict]:
+        """Yield documents strictly closer than radius_km to (lat, lng)"""
+        dlat, dlng = degree_window(lat, radius_km)
+        for doc in self.candidates(lat - dlat, lng - dlng, lat + dlat, lng + dlng):
+            if predicate is not None and not predicate(doc):
+                continue
+            if haversine_km(lat, lng, doc['lat'], doc['lng']) < radius_km:
+                yield doc
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Incidents at or above this severity count as high-risk areas
+HIGH_RISK_SEVERITY = 4
+# Routes are counted per hour; bucket keys sort chronologically as strings
+ROUTE_BUCKET_FORMAT = "%Y-%m-%dT%H:00Z"
+ROUTE_BUCKETS_KEPT = 24 * 7
+
+
+def route_bucket(now: Optional[datetime] = None) -> str:
+    """Hourly bucket key for a timestamp (defaults to now, UTC)"""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(timezone.utc).strftime(ROUTE_BUCKET_FORMAT)
+
+
+class StatsCounters:
+    """Dashboard counters kept in memory and persisted to a single document.
+
+    Collection totals are recounted whenever the snapshots reload and bumped
+    on each write in between. Route counts only exist here: increments
+    accumulate locally and flush() adds them to the counters document with
+    $inc, so several workers can share it. Each flush reads the merged
+    document back, so every worker converges on the global route counts.
+    """
+
+    def __init__(self, collection: Callable[[], object], doc_id: str = "safety_stats",
+                 buckets_kept: int = ROUTE_BUCKETS_KEPT):
+        self._collection = collection
+        self.doc_id = doc_id
+        self.buckets_kept = buckets_kept
+
+        self.total_incidents = 0
+        self.total_tollgates = 0
+        self.high_risk_areas = 0
+        # Persisted route counts as of the last flush, plus local increments since
+        self._routes_flushed = 0
+        self._buckets_flushed: Dict[str, int] = {}
+        self._routes_pending = 0
+        self._buckets_pending: Dict[str, int] = {}
+        self.flushes = 0
+
+    @property
+    def routes_calculated(self) -> int:
+        return self._routes_flushed + self._routes_pending
+
+    def routes_by_hour(self, hours: int = 24) -> Dict[str, int]:
+        """Route counts for the last `hours` hourly buckets (empty buckets omitted)"""
+        oldest = route_bucket(datetime.now(timezone.utc) - timedelta(hours=hours - 1))
+        merged = dict(self._buckets_flushed)
+        for bucket, count in self._buckets_pending.items():
+            merged[bucket] = merged.get(bucket, 0) + count
+        return {bucket: merged[bucket] for bucket in sorted(merged) if bucket >= oldest}
+
+    def recount_columns(self, severities: np.ndarray, tollgates: Iterable[dict]) -> None:
+        """Reset collection totals from an incident severity column (see IncidentStore)"""
+        self.total_incidents = len(severities)
+        self.high_risk_areas = int(np.count_nonzero(np.asarray(severities) >= HIGH_RISK_SEVERITY))
+        self.total_tollgates = sum(1 for _ in tollgates)
+
+    async def recount_from_db(self, db) -> None:
+        """Reset collection totals with count queries, for collections too large to cache"""
+        self.total_incidents = await db.incidents.count_documents({})
+        self.total_tollgates = await db.tollgates.count_documents({})
+        self.high_risk_areas = await db.incidents.count_documents({"severity": {"$gte": HIGH_RISK_SEVERITY}})
+
+    def record_incident(self, incident: dict) -> None:
+        self.total_incidents += 1
+        if incident.get('severity', 0) >= HIGH_RISK_SEVERITY:
+            self.high_risk_areas += 1
+
+    def record_routes(self, count: int = 1, now: Optional[datetime] = None) -> None:
+        if count <= 0:
+            return
+        bucket = route_bucket(now)
+        self._routes_pending += count
+        self._buckets_pending[bucket] = self._buckets_pending.get(bucket, 0) + count
+
+    def _merge_persisted(self, doc: Optional[dict]) -> None:
+        doc = doc or {}
+        self._routes_flushed = doc.get('routes_calculated', 0)
+        self._buckets_flushed = dict(doc.get('routes_by_hour', {}))
+
+    async def load(self) -> None:
+        """Read persisted route counts (collection totals come from recount)"""
+        self._merge_persisted(await self._collection().find_one({"_id": self.doc_id}))
+
+    async def flush(self) -> None:
+        """Add pending route counts to the counters document and refresh from it"""
+        routes, buckets = self._routes_pending, self._buckets_pending
+        self._routes_pending, self._buckets_pending = 0, {}
+
+        update: Dict[str, dict] = {"$set": {
+            "total_incidents": self.total_incidents,
+            "total_tollgates": self.total_tollgates,
+            "high_risk_areas": self.high_risk_areas,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }}
+        if routes:
+            update["$inc"] = {"routes_calculated": routes,
+                              **{f"routes_by_hour.{bucket}": count for bucket, count in buckets.items()}}
+        try:
+            doc = await self._collection().find_one_and_update(
+                {"_id": self.doc_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except PyMongoError:
+            # Keep the counts for the next attempt
+            self._restore_pending(routes, buckets)
+            raise
+        self._merge_persisted(doc)
+        self.flushes += 1
+        await self._prune(doc)
+
+    def _restore_pending(self, routes: int, buckets: Dict[str, int]) -> None:
+        self._routes_pending += routes
+        for bucket, count in buckets.items():
+            self._buckets_pending[bucket] = self._buckets_pending.get(bucket, 0) + count
+
+    async def _prune(self, doc: Optional[dict]) -> None:
+        buckets = sorted((doc or {}).get('routes_by_hour', {}))
+        expired = buckets[:-self.buckets_kept] if len(buckets) > self.buckets_kept else []
+        if expired:
+            await self._collection().update_one(
+                {"_id": self.doc_id}, {"$unset": {f"routes_by_hour.{bucket}": "" for bucket in expired}}
+            )
+            for bucket in expired:
+                self._buckets_flushed.pop(bucket, None)
+
+    async def run_flusher(self, interval_seconds: float) -> None:
+        """Flush every interval_seconds until cancelled; the final flush happens on cancel"""
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                try:
+                    await self.flush()
+                except PyMongoError as e:
+                    logger.warning(f"Stats flush failed: {e}")
+        except asyncio.CancelledError:
+            try:
+                await self.flush()
+            except PyMongoError as e:
+                logger.warning(f"Final stats flush failed: {e}")
+            raise
@@ -64,6 +64,83 @@ class SafestPathAPITester:
             self.log_test("Get Incidents", False, str(e))
             return False, []
 
+    def test_get_incidents_filtered(self):
+        """Test viewport/severity filters, keyset pagination and NDJSON streaming"""
+        try:
+            params = {"bbox": "18.9,72.7,19.3,73.1", "min_severity": 2, "limit": 2}
+            response = requests.get(f"{self.api_url}/incidents", params=params, timeout=10)
+            success = response.status_code == 200
+            details = f"Status: {response.status_code}"
+            if success:
+                data = response.json()
+                details += f", Page size: {len(data)}"
+                if len(data) > 2 or any(i['severity'] < 2 for i in data):
+                    success = False
+                    details += ", Filters not applied"
+                next_cursor = response.headers.get("X-Next-Cursor")
+                if next_cursor:
+                    page2 = requests.get(f"{self.api_url}/incidents", params={**params, "cursor": next_cursor}, timeout=10).json()
+                    overlap = {i['id'] for i in data} & {i['id'] for i in page2}
+                    if overlap:
+                        success = False
+                        details += f", Pages overlap: {overlap}"
+                    details += f", Next page: {len(page2)}"
+            
+            stream = requests.get(f"{self.api_url}/incidents", params={"format": "ndjson", "limit": 3}, timeout=10)
+            lines = [json.loads(line) for line in stream.text.splitlines() if line]
+            if stream.status_code != 200 or len(lines) > 3:
+                success = False
+            details += f", NDJSON rows: {len(lines)}"
+            self.log_test("Get Incidents (filtered)", success, details)
+            return success
+        except Exception as e:
+            self.log_test("Get Incidents (filtered)", False, str(e))
+            return False
+
+    def test_get_incident_clusters(self):
+        """Test clustered incidents for a map viewport"""
+        try:
+            params = {"bbox": "18.9,72.7,19.3,73.1", "zoom": 11}
+            response = requests.get(f"{self.api_url}/incidents/clusters", params=params, timeout=10)
+            success = response.status_code == 200
+            details = f"Status: {response.status_code}"
+            if success:
+                data = response.json()
+                cells = data.get('cells', [])
+                details += f", Tiles: {data.get('tiles')}, Cells: {len(cells)}, Incidents: {sum(c['count'] for c in cells)}"
+                required_fields = ['lat', 'lng', 'count', 'max_severity', 'types']
+                if cells and any(field not in cells[0] for field in required_fields):
+                    success = False
+                    details += ", Missing cell fields"
+            self.log_test("Get Incident Clusters", success, details)
+            return success
+        except Exception as e:
+            self.log_test("Get Incident Clusters", False, str(e))
+            return False
+
+    def test_incident_stream(self):
+        """Test the server-sent incident stream handshake"""
+        try:
+            response = requests.get(
+                f"{self.api_url}/incidents/stream",
+                params={"bbox": "18.9,72.7,19.3,73.1"},
+                stream=True,
+                timeout=10
+            )
+            success = response.status_code == 200 and response.headers.get('content-type', '').startswith('text/event-stream')
+            details = f"Status: {response.status_code}, Content-Type: {response.headers.get('content-type')}"
+            if success:
+                first_line = next(response.iter_lines(decode_unicode=True), '')
+                if not first_line.startswith('retry:'):
+                    success = False
+                    details += f", Unexpected first line: {first_line[:50]}"
+            response.close()
+            self.log_test("Incident Stream", success, details)
+            return success
+        except Exception as e:
+            self.log_test("Incident Stream", False, str(e))
+            return False
+
     def test_get_tollgates(self):
         """Test getting toll gates"""
         try:
@@ -117,6 +194,37 @@ class SafestPathAPITester:
             self.log_test("Create Incident", False, str(e))
             return False
 
+    def test_bulk_create_incidents(self):
+        """Test bulk incident import (CSV) with a rejected row"""
+        try:
+            csv_body = (
+                "lat,lng,incident_type,severity,description\n"
+                "19.0761,72.8778,harassment,3,Bulk test incident\n"
+                "19.0762,72.8779,theft,9,Invalid severity\n"
+            )
+            response = requests.post(
+                f"{self.api_url}/incidents/bulk",
+                data=csv_body,
+                headers={'Content-Type': 'text/csv'},
+                timeout=30
+            )
+            success = response.status_code == 200
+            details = f"Status: {response.status_code}"
+            if success:
+                data = response.json()
+                details += f", Accepted: {data.get('accepted')}, Rejected: {data.get('rejected')}"
+                rejects = data.get('rejects', [])
+                if data.get('accepted') != 1 or data.get('rejected') != 1 or not rejects or rejects[0].get('line') != 3:
+                    success = False
+                    details += ", Unexpected ingest result"
+            else:
+                details += f", Response: {response.text[:100]}"
+            self.log_test("Bulk Create Incidents", success, details)
+            return success
+        except Exception as e:
+            self.log_test("Bulk Create Incidents", False, str(e))
+            return False
+
     def test_calculate_route(self):
         """Test route calculation"""
         try:
@@ -152,6 +260,31 @@ class SafestPathAPITester:
             self.log_test("Calculate Route", False, str(e))
             return False
 
+    def test_calculate_route_batch(self):
+        """Test batch route calculation (NDJSON, one line per pair)"""
+        try:
+            batch_request = {"routes": [
+                {"start_lat": 19.0760, "start_lng": 72.8777, "end_lat": 19.1136, "end_lng": 72.8697},
+                {"start_lat": 19.0330, "start_lng": 72.8570, "end_lat": 19.0596, "end_lng": 72.8295},
+                {"start_lat": "invalid", "start_lng": 72.8570, "end_lat": 19.0596, "end_lng": 72.8295},
+            ]}
+            response = requests.post(f"{self.api_url}/routes/calculate/batch", json=batch_request, timeout=30)
+            success = response.status_code == 200
+            details = f"Status: {response.status_code}"
+            if success:
+                lines = [json.loads(line) for line in response.text.splitlines() if line]
+                indexes = [line.get('index') for line in lines]
+                results = [line for line in lines if line.get('result')]
+                details += f", Lines: {len(lines)}, Results: {len(results)}"
+                if indexes != [0, 1, 2] or len(results) != 2 or lines[2].get('error') is None:
+                    success = False
+                    details += ", Unexpected batch output"
+            self.log_test("Calculate Route Batch", success, details)
+            return success
+        except Exception as e:
+            self.log_test("Calculate Route Batch", False, str(e))
+            return False
+
     def test_get_emergency_contacts(self):
         """Test getting emergency contacts"""
         try:
@@ -215,9 +348,14 @@ class SafestPathAPITester:
         
         # Test all endpoints
         self.test_get_incidents()
+        self.test_get_incidents_filtered()
+        self.test_get_incident_clusters()
+        self.test_incident_stream()
         self.test_get_tollgates()
         self.test_create_incident()
+        self.test_bulk_create_incidents()
         self.test_calculate_route()
+        self.test_calculate_route_batch()
         self.test_get_emergency_contacts()
         self.test_get_stats()
         
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import '@/App.css';
 import 'leaflet/dist/leaflet.css';
 import { BrowserRouter, Routes, Route, Link, useLocation } from 'react-router-dom';
@@ -10,12 +10,27 @@ import { SOSButton } from '@/components/SOSButton';
 import { IncidentReport } from '@/components/IncidentReport';
 import { SafetyStats } from '@/components/SafetyStats';
 import { Toaster } from '@/components/ui/sonner';
+import { useIncidentStream, addIncident } from '@/hooks/use-incident-stream';
 import { Shield, Map, FileText, BarChart3, Menu, X } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Below this zoom the map shows server-side clusters instead of individual markers
+const CLUSTER_MAX_ZOOM = 13;
+
+// Leaflet bounds -> "min_lat,min_lng,max_lat,max_lng", clamped for wrapped world views
+const toBboxParam = (bounds) => {
+  const clamp = (value, limit) => Math.max(-limit, Math.min(limit, value)).toFixed(5);
+  return [
+    clamp(bounds.getSouth(), 90),
+    clamp(bounds.getWest(), 180),
+    clamp(bounds.getNorth(), 90),
+    clamp(bounds.getEast(), 180),
+  ].join(',');
+};
+
 const Navigation = () => {
   const location = useLocation();
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
@@ -98,11 +113,14 @@ const Navigation = () => {
 
 const MapPage = () => {
   const [incidents, setIncidents] = useState([]);
+  const [clusters, setClusters] = useState([]);
   const [tollgates, setTollgates] = useState([]);
   const [routes, setRoutes] = useState(null);
   const [loading, setLoading] = useState(false);
   const [mapCenter, setMapCenter] = useState([19.0760, 72.8777]);
   const [emergencyContacts, setEmergencyContacts] = useState([]);
+  const [viewportBbox, setViewportBbox] = useState(null);
+  const viewport = useRef(null);
   
   useEffect(() => {
     fetchData();
@@ -111,17 +129,62 @@ const MapPage = () => {
   
   const fetchData = async () => {
     try {
-      const [incidentsRes, tollgatesRes] = await Promise.all([
-        axios.get(`${API}/incidents`),
-        axios.get(`${API}/tollgates`),
-      ]);
-      setIncidents(incidentsRes.data);
-      setTollgates(tollgatesRes.data);
+      const response = await axios.get(`${API}/tollgates`);
+      setTollgates(response.data);
     } catch (error) {
       console.error('Error fetching data:', error);
     }
   };
   
+  // Incidents are loaded for the visible map area only, clustered when zoomed out
+  const fetchViewportIncidents = useCallback(async (bounds, zoom) => {
+    viewport.current = { bounds, zoom };
+    setViewportBbox(toBboxParam(bounds));
+    try {
+      if (zoom <= CLUSTER_MAX_ZOOM) {
+        const response = await axios.get(`${API}/incidents/clusters`, {
+          params: { bbox: toBboxParam(bounds), zoom },
+        });
+        setClusters(response.data.cells);
+        setIncidents([]);
+      } else {
+        const response = await axios.get(`${API}/incidents`, {
+          params: { bbox: toBboxParam(bounds) },
+        });
+        setIncidents(response.data);
+        setClusters([]);
+      }
+    } catch (error) {
+      console.error('Error fetching incidents:', error);
+    }
+  }, []);
+  
+  // Coalesces bursts of pushes (e.g. a bulk import) into one viewport refetch per second
+  const refetchTimer = useRef(null);
+  const scheduleViewportRefetch = useCallback(() => {
+    if (refetchTimer.current) return;
+    refetchTimer.current = setTimeout(() => {
+      refetchTimer.current = null;
+      if (viewport.current) fetchViewportIncidents(viewport.current.bounds, viewport.current.zoom);
+    }, 1000);
+  }, [fetchViewportIncidents]);
+  
+  useEffect(() => () => clearTimeout(refetchTimer.current), []);
+  
+  // New reports in view are pushed by the server; clusters are aggregates, so refetch those
+  useIncidentStream(
+    API,
+    viewportBbox,
+    (incident) => {
+      if (viewport.current && viewport.current.zoom > CLUSTER_MAX_ZOOM) {
+        setIncidents((current) => addIncident(current, incident));
+      } else {
+        scheduleViewportRefetch();
+      }
+    },
+    scheduleViewportRefetch
+  );
+  
   const fetchEmergencyContacts = async () => {
     try {
       const response = await axios.get(`${API}/emergency-contacts`);
@@ -158,9 +221,11 @@ const MapPage = () => {
           <div className="lg:col-span-3 h-[600px] lg:h-[800px]">
             <MapView
               incidents={incidents}
+              clusters={clusters}
               tollgates={tollgates}
               routes={routes}
               center={mapCenter}
+              onViewportChange={fetchViewportIncidents}
             />
           </div>
         </div>
@@ -198,8 +263,10 @@ const ReportPage = () => {
     }
   };
   
+  // The new report arrives through the incident stream
+  useIncidentStream(API, null, (incident) => setIncidents((current) => addIncident(current, incident)), fetchIncidents);
+  
   const handleReportSubmitted = () => {
-    fetchIncidents();
     fetchStats();
   };
   
@@ -279,6 +346,8 @@ const StatsPage = () => {
     }
   };
   
+  useIncidentStream(API, null, (incident) => setIncidents((current) => addIncident(current, incident)), fetchAllData);
+  
   const incidentsByType = incidents.reduce((acc, incident) => {
     acc[incident.incident_type] = (acc[incident.incident_type] || 0) + 1;
     return acc;
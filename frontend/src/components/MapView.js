@@ -1,5 +1,5 @@
 import { useEffect, useRef, useState } from 'react';
-import { MapContainer, TileLayer, Marker, Popup, Polyline, useMap } from 'react-leaflet';
+import { MapContainer, TileLayer, Marker, Popup, Polyline, CircleMarker, useMap, useMapEvents } from 'react-leaflet';
 import L from 'leaflet';
 import 'leaflet/dist/leaflet.css';
 import { Shield, AlertTriangle, Navigation } from 'lucide-react';
@@ -38,12 +38,26 @@ function MapUpdater({ center }) {
   return null;
 }
 
+function ViewportWatcher({ onViewportChange }) {
+  const map = useMapEvents({
+    moveend: () => onViewportChange(map.getBounds(), map.getZoom()),
+  });
+  
+  useEffect(() => {
+    onViewportChange(map.getBounds(), map.getZoom());
+  }, [map, onViewportChange]);
+  
+  return null;
+}
+
 export const MapView = ({ 
   incidents = [], 
+  clusters = [],
   tollgates = [], 
   routes = null,
   center = [19.0760, 72.8777],
-  userLocation = null 
+  userLocation = null,
+  onViewportChange = null
 }) => {
   const [map, setMap] = useState(null);
   
@@ -61,6 +75,7 @@ export const MapView = ({
         />
         
         <MapUpdater center={center} />
+        {onViewportChange && <ViewportWatcher onViewportChange={onViewportChange} />}
         
         {/* User Location */}
         {userLocation && (
@@ -92,6 +107,32 @@ export const MapView = ({
           </Marker>
         ))}
         
+        {/* Incident clusters (zoomed out) */}
+        {clusters.map((cell) => (
+          <CircleMarker
+            key={`${cell.lat},${cell.lng}`}
+            center={[cell.lat, cell.lng]}
+            radius={Math.min(30, 8 + Math.sqrt(cell.count) * 3)}
+            pathOptions={{
+              color: cell.max_severity >= 4 ? '#EF4444' : '#F97316',
+              fillOpacity: 0.5,
+              weight: 2,
+            }}
+          >
+            <Popup>
+              <div className="text-white">
+                <strong className="text-destructive">{cell.count} incidents</strong>
+                <p className="text-sm mt-1">Max severity: {cell.max_severity}/5</p>
+                {Object.entries(cell.types).map(([type, count]) => (
+                  <p key={type} className="text-xs mt-1 text-muted-foreground capitalize">
+                    {type.replace('_', ' ')}: {count}
+                  </p>
+                ))}
+              </div>
+            </Popup>
+          </CircleMarker>
+        ))}
+        
         {/* Toll Gates */}
         {tollgates.map((toll) => (
           <Marker
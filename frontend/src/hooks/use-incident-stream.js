@@ -0,0 +1,26 @@
+import { useEffect, useRef } from 'react';
+
+// Subscribes to server-pushed incidents for a viewport ("min_lat,min_lng,max_lat,max_lng",
+// or null for everywhere). onIncident gets each newly created incident; onResync fires when
+// the server dropped events for this client and the data should be refetched once.
+export const useIncidentStream = (apiUrl, bbox, onIncident, onResync) => {
+  const handlers = useRef({ onIncident, onResync });
+  handlers.current = { onIncident, onResync };
+
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return undefined;
+    const query = bbox ? `?bbox=${encodeURIComponent(bbox)}` : '';
+    const source = new EventSource(`${apiUrl}/incidents/stream${query}`);
+    source.addEventListener('incident', (event) => {
+      handlers.current.onIncident(JSON.parse(event.data));
+    });
+    source.addEventListener('resync', () => {
+      if (handlers.current.onResync) handlers.current.onResync();
+    });
+    return () => source.close();
+  }, [apiUrl, bbox]);
+};
+
+// Prepends an incident unless one with the same id is already listed
+export const addIncident = (incidents, incident) =>
+  incidents.some((existing) => existing.id === incident.id) ? incidents : [incident, ...incidents];
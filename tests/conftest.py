@@ -0,0 +1,34 @@
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "safestpath_test")
+# An empty path keeps the incident store in memory only
+os.environ.setdefault("INCIDENT_SNAPSHOT_PATH", "")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def api():
+    """HTTP client for the app backed by a fresh in-memory database; yields (client, db)"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+
+    db = AsyncMongoMockClient()["safestpath_test"]
+    server.db = db
+    await server.stats_counters.load()
+    await server.incident_snapshot.reload()
+    await server.tollgate_snapshot.reload()
+    await server.rebuild_derived_state()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as http:
+        yield http, db
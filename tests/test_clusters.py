@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import server
+from clusters import CELLS_PER_TILE, TileCache, aggregate_tile_columns, tile_bounds, tile_xy, tiles_for_bbox
+
+VIEWPORT = "19.0,72.8,19.1,72.9"
+
+
+def test_tile_coordinates_round_trip():
+    x, y = tile_xy(19.05, 72.85, 12)
+    min_lat, min_lng, max_lat, max_lng = tile_bounds(int(x), int(y), 12)
+
+    assert (int(x), int(y)) == (2876, 1827)
+    assert min_lat <= 19.05 < max_lat and min_lng <= 72.85 < max_lng
+    assert tile_xy(0, -180, 0) == (0.0, 0.5)
+    # Latitudes past the mercator limit clamp to the edge rows
+    assert tile_xy(89, 0, 3)[1] == pytest.approx(0, abs=1e-9)
+
+
+def test_tiles_for_bbox_covers_the_viewport():
+    tiles = tiles_for_bbox(19.0, 72.8, 19.1, 72.9, 12)
+    xs = {x for x, _ in tiles}
+    ys = {y for _, y in tiles}
+
+    assert len(tiles) == len(xs) * len(ys)
+    assert tiles_for_bbox(19.05, 72.85, 19.05, 72.85, 12) == [(2876, 1827)]
+    assert tiles_for_bbox(-90, -180, 90, 180, 1) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+
+def test_aggregate_tile_columns_bins_into_cells():
+    x, y = (int(v) for v in tile_xy(19.05, 72.85, 12))
+    lats = np.array([19.0501, 19.0502, 19.0503, 19.2])
+    lngs = np.array([72.8501, 72.8502, 72.8503, 72.85])
+    cells = aggregate_tile_columns(lats, lngs, np.array([2, 5, 1, 3]), ["theft", "theft", "assault", "theft"],
+                                   x, y, 12)
+
+    [cell] = cells
+    assert cell["count"] == 3 and cell["max_severity"] == 5
+    assert cell["types"] == {"theft": 2, "assault": 1}
+    assert cell["lat"] == pytest.approx(19.0502) and cell["lng"] == pytest.approx(72.8502)
+    assert aggregate_tile_columns(lats[3:], lngs[3:], [3], ["theft"], x, y, 12) == []
+
+
+def test_tile_cache_evicts_lru_and_invalidates_by_point():
+    cache = TileCache(max_tiles=2)
+    x, y = (int(v) for v in tile_xy(19.05, 72.85, 12))
+    cache.put((12, x, y), [])
+    cache.put((12, 0, 0), [])
+    cache.get((12, x, y))
+    cache.put((12, 1, 1), [])
+
+    assert cache.get((12, 0, 0)) is None
+    cache.invalidate_points([(19.05, 72.85)])
+    assert cache.get((12, x, y)) is None
+    assert cache.get((12, 1, 1)) == []
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.anyio
+async def test_clusters_endpoint_sees_new_incidents(api):
+    http, _ = api
+    server.cluster_tiles.clear()
+    report = {"lat": 19.05, "lng": 72.85, "incident_type": "theft", "severity": 4}
+    await http.post("/api/incidents", json=report)
+
+    response = await http.get("/api/incidents/clusters", params={"bbox": VIEWPORT, "zoom": 12})
+    body = response.json()
+    assert body["cells_per_tile"] == CELLS_PER_TILE and body["tiles"] == len(tiles_for_bbox(19.0, 72.8, 19.1, 72.9, 12))
+    assert [cell["count"] for cell in body["cells"]] == [1]
+
+    # The cached tile is evicted when a report lands in it
+    await http.post("/api/incidents", json={**report, "lat": 19.06, "incident_type": "assault"})
+    body = (await http.get("/api/incidents/clusters", params={"bbox": VIEWPORT, "zoom": 12})).json()
+    assert sum(cell["count"] for cell in body["cells"]) == 2
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("params", [{"bbox": "19,72.8", "zoom": 12}, {"bbox": "-80,-170,80,170", "zoom": 10}])
+async def test_clusters_endpoint_rejects_bad_viewports(api, params):
+    http, _ = api
+    response = await http.get("/api/incidents/clusters", params=params)
+    assert response.status_code == 400
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from coalesce import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def compute(value):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    results = await asyncio.gather(*(flight.run("key", compute, 21) for _ in range(5)))
+    assert results == [42] * 5
+    assert calls == 1
+    assert (flight.leaders, flight.followers) == (1, 4)
+    assert flight.stats()["inflight"] == 0
+
+    # Finished computations are not reused
+    assert await flight.run("key", compute, 1) == 2
+    assert calls == 2
+
+
+async def test_followers_share_the_exception():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(flight.run("key", fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_cancelling_the_leader_does_not_cancel_the_computation():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def compute():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.ensure_future(flight.run("key", compute))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.run("key", compute))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await follower == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+def test_keys_snap_floats_to_the_precision_grid():
+    flight = SingleFlight("test", precision_deg=0.001)
+    assert flight.key(19.0001, 72.8502, "x") == flight.key(19.0, 72.85, "x")
+    assert flight.key(19.002, 72.85, "x") != flight.key(19.0, 72.85, "x")
+    assert SingleFlight("test").key(19.0001) != SingleFlight("test").key(19.0)
+
+
+
+def test_incident_pages_coalesce_only_on_the_exact_viewport():
+    import server
+
+    bounds = (19.0, 72.8, 19.1002, 73.0)
+    nudged = (19.0, 72.8, 19.1003, 73.0)
+    key = server.incident_flight.key(*bounds, None, None, 3, None, None, 1000)
+    assert key == server.incident_flight.key(*bounds, None, None, 3, None, None, 1000)
+    assert key != server.incident_flight.key(*nudged, None, None, 3, None, None, 1000)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from geometry import densify, polyline_distances, segment_lengths
+from haversine import haversine_to_many
+
+# About 1.11 km per 0.01 degree of latitude
+ROUTE = [(19.00, 72.85), (19.01, 72.85), (19.01, 72.86)]
+
+
+def test_polyline_distances_to_the_nearest_segment():
+    lats = np.array([19.005, 19.01, 19.015])
+    lngs = np.array([72.851, 72.855, 72.86])
+    distance, along = polyline_distances(lats, lngs, ROUTE)
+
+    first_leg, second_leg = segment_lengths(ROUTE)
+    offset = haversine_to_many(19.005, 72.85, np.array([19.005]), np.array([72.851]))[0]
+    np.testing.assert_allclose(distance[:2], [offset, 0.0], atol=1e-3)
+    np.testing.assert_allclose(along[:2], [first_leg / 2, first_leg + second_leg / 2], rtol=1e-3)
+    assert first_leg == pytest.approx(haversine_to_many(19.0, 72.85, np.array([19.01]), np.array([72.85]))[0],
+                                      rel=1e-3)
+    # Beyond the end of the last segment: distance to its end point
+    assert distance[2] == pytest.approx(0.556, rel=0.01)
+    assert along[2] == pytest.approx(segment_lengths(ROUTE).sum())
+
+
+def test_polyline_distances_degenerate_inputs():
+    distance, along = polyline_distances(np.array([19.0]), np.array([72.86]), [(19.0, 72.85)])
+    assert distance[0] == pytest.approx(1.052, rel=0.01)
+    assert along[0] == 0
+
+    distance, _ = polyline_distances(np.array([19.0]), np.array([72.86]), [])
+    assert np.isinf(distance[0])
+
+
+def test_densify_bounds_segment_length_and_keeps_vertices():
+    dense = densify(ROUTE, 0.25)
+
+    assert segment_lengths(dense).max() <= 0.25
+    assert all(point in dense for point in ROUTE)
+    assert len(densify(dense, 0.25)) == len(dense)
+    assert densify(ROUTE[:1], 0.25) == ROUTE[:1]
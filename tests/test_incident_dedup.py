@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+import pytest
+
+from incident_dedup import IncidentDeduplicator
+
+
+REPORT = {"lat": 19.1, "lng": 72.9, "incident_type": "theft", "severity": 3}
+
+
+def ndjson(rows):
+    return "\n".join(json.dumps(row) for row in rows)
+
+
+async def post_bulk(http, rows):
+    response = await http.post("/api/incidents/bulk", content=ndjson(rows),
+                               headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def report(lat, minutes=0, incident_type="theft"):
+    return {**REPORT, "lat": lat, "incident_type": incident_type,
+            "timestamp": f"2026-01-01T00:{minutes:02d}:00+00:00", "report_count": 1}
+
+
+def test_fold_batch_merges_reports_of_one_event():
+    dedup = IncidentDeduplicator(radius_km=0.1, window_seconds=600)
+    first, same, later, elsewhere, other_type = (report(19.1), report(19.1005, minutes=5), report(19.1, minutes=30),
+                                                 report(19.11), report(19.1, incident_type="assault"))
+    survivors = dedup.fold_batch([first, same, later, elsewhere, other_type])
+
+    assert survivors == [first, later, elsewhere, other_type]
+    assert first["report_count"] == 2
+    assert first["last_reported_at"] == same["timestamp"]
+    assert dedup.folded_in_batch == 1
+
+
+@pytest.mark.anyio
+async def test_reserve_waits_only_for_reports_of_the_same_event():
+    dedup = IncidentDeduplicator(radius_km=0.1, window_seconds=600)
+    first = report(19.1)
+    await dedup.reserve([first])
+
+    # Another event goes ahead at once
+    await asyncio.wait_for(dedup.reserve([report(19.2)]), 1)
+    duplicate = asyncio.create_task(dedup.reserve([report(19.1005, minutes=5)]))
+    cancelled = asyncio.create_task(dedup.reserve([report(19.1003)]))
+    await asyncio.sleep(0)
+    assert not duplicate.done()
+
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    dedup.release([first])
+    await asyncio.wait_for(duplicate, 1)
+    assert dedup.stats()["reserved"] == 2
+
+
+@pytest.mark.anyio
+async def test_nearby_report_folds_into_existing_incident(api):
+    http, db = api
+    first = (await http.post("/api/incidents", json=REPORT)).json()
+    again = (await http.post("/api/incidents", json={**REPORT, "lat": 19.1003})).json()
+
+    assert again["id"] == first["id"]
+    assert again["report_count"] == 2
+    assert await db.incidents.count_documents({}) == 1
+
+
+@pytest.mark.anyio
+async def test_other_type_or_distant_report_is_a_new_incident(api):
+    http, db = api
+    await http.post("/api/incidents", json=REPORT)
+    await http.post("/api/incidents", json={**REPORT, "incident_type": "assault"})
+    await http.post("/api/incidents", json={**REPORT, "lat": 19.11})
+
+    assert await db.incidents.count_documents({}) == 3
+
+
+@pytest.mark.anyio
+async def test_bulk_folds_rows_within_a_batch(api):
+    http, db = api
+    result = await post_bulk(http, [REPORT, {**REPORT, "lat": 19.1002}, {**REPORT, "lat": 19.2}])
+
+    assert (result["accepted"], result["merged"], result["rejected"]) == (3, 1, 0)
+    assert await db.incidents.count_documents({}) == 2
+
+
+@pytest.mark.anyio
+async def test_bulk_batch_of_only_duplicates(api):
+    http, db = api
+    stored = (await http.post("/api/incidents", json=REPORT)).json()
+    result = await post_bulk(http, [REPORT, {**REPORT, "lat": 19.1002}])
+
+    assert (result["accepted"], result["merged"], result["rejected"]) == (2, 2, 0)
+    assert await db.incidents.count_documents({}) == 1
+    assert (await db.incidents.find_one({"id": stored["id"]}))["report_count"] == 3
+
+
+@pytest.mark.anyio
+async def test_bulk_rows_with_feed_ids_are_not_folded(api):
+    http, db = api
+    result = await post_bulk(http, [{**REPORT, "id": "feed-1"}, {**REPORT, "id": "feed-2"}])
+
+    assert (result["accepted"], result["merged"]) == (2, 0)
+    assert await db.incidents.count_documents({}) == 2
+
+
+@pytest.mark.anyio
+async def test_concurrent_reports_of_one_event_store_one_incident(api):
+    http, db = api
+    responses = await asyncio.gather(*(http.post("/api/incidents", json=REPORT) for _ in range(5)))
+
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert await db.incidents.count_documents({}) == 1
+    assert (await db.incidents.find_one({}))["report_count"] == 5
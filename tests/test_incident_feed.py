@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import server
+from incident_feed import RESYNC, IncidentFeed
+
+pytestmark = pytest.mark.anyio
+
+VIEWPORT = (19.0, 72.8, 19.1, 72.9)
+
+
+class ClientRequest:
+    """Stands in for the Starlette request; disconnects after `polls` checks"""
+
+    def __init__(self, polls):
+        self.polls = polls
+
+    async def is_disconnected(self):
+        self.polls -= 1
+        return self.polls < 0
+
+
+def incident(lat, lng=72.85):
+    return {"id": f"{lat}", "lat": lat, "lng": lng}
+
+
+async def test_publish_reaches_subscribers_inside_their_viewport():
+    feed = IncidentFeed()
+    inside, everywhere = feed.subscribe(VIEWPORT), feed.subscribe()
+    feed.publish([incident(19.05), incident(19.5)])
+
+    assert await inside.next(0.1) == incident(19.05)
+    assert await inside.next(0.01) is None
+    assert [await everywhere.next(0.1) for _ in range(2)] == [incident(19.05), incident(19.5)]
+    assert feed.stats()["queued"] == 3
+
+    feed.unsubscribe(inside)
+    feed.publish([incident(19.06)])
+    assert len(feed) == 1 and await inside.next(0.01) is None
+
+
+async def test_a_full_queue_collapses_into_one_resync():
+    feed = IncidentFeed(max_queue=2)
+    slow = feed.subscribe()
+    feed.publish([incident(19.0 + i / 100) for i in range(5)])
+
+    assert slow.lagged
+    assert await slow.next(0.1) is RESYNC
+    assert not slow.lagged and await slow.next(0.01) is None
+    assert feed.stats()["resyncs"] == 1
+
+    feed.publish([incident(19.09)])
+    assert await slow.next(0.1) == incident(19.09)
+
+
+async def test_stream_sends_new_incidents_in_the_viewport(api, monkeypatch):
+    http, _ = api
+    monkeypatch.setattr(server, "FEED_HEARTBEAT_SECONDS", 0.01)
+    response = await server.stream_incidents(ClientRequest(polls=3), bbox="19.0,72.8,19.1,72.9")
+    events = response.body_iterator
+
+    assert await events.__anext__() == "retry: 5000\n\n"
+    assert len(server.incident_feed) == 1
+    await http.post("/api/incidents", json={"lat": 19.5, "lng": 72.85, "incident_type": "theft", "severity": 2})
+    await http.post("/api/incidents", json={"lat": 19.05, "lng": 72.85, "incident_type": "theft", "severity": 2})
+
+    event = await events.__anext__()
+    assert event.startswith("event: incident\ndata: ")
+    assert json.loads(event.split("data: ", 1)[1])["lat"] == 19.05
+    assert await events.__anext__() == ": keepalive\n\n"
+    assert [event async for event in events] == [": keepalive\n\n"]
+    assert len(server.incident_feed) == 0
+
+
+async def test_stream_rejects_bad_viewports_and_excess_subscribers(api, monkeypatch):
+    http, _ = api
+    assert (await http.get("/api/incidents/stream", params={"bbox": "19,72.8"})).status_code == 400
+
+    monkeypatch.setattr(server, "FEED_MAX_SUBSCRIBERS", 0)
+    assert (await http.get("/api/incidents/stream")).status_code == 503
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import server
+from incident_ingest import iter_lines, iter_records
+
+pytestmark = pytest.mark.anyio
+
+
+async def chunked(body: bytes, size: int = 7):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def row(i, **fields):
+    return {"lat": 19.0 + i * 0.01, "lng": 72.85, "incident_type": "theft", "severity": 3, **fields}
+
+
+async def test_lines_split_across_chunks():
+    body = "first\r\nsecond ä\n\nlast".encode()
+    assert await collect(iter_lines(chunked(body, 3))) == ["first", "second ä", "", "last"]
+
+
+async def test_ndjson_records_report_bad_lines():
+    body = b'{"lat": 1}\n\nnot json\n[1, 2]\n{"lat": 2}'
+    records = await collect(iter_records(chunked(body), is_csv=False))
+
+    assert [line for line, _ in records] == [1, 3, 4, 5]
+    assert records[0][1] == {"lat": 1} and records[3][1] == {"lat": 2}
+    assert records[1][1].startswith("Invalid JSON") and records[2][1] == "Expected a JSON object"
+
+
+async def test_csv_records_drop_empty_cells():
+    body = b'lat, lng ,description\n19.1,72.9,\n19.2,72.9,"a, b"\n19.3\n'
+    records = await collect(iter_records(chunked(body), is_csv=True))
+
+    assert records == [(2, {"lat": "19.1", "lng": "72.9"}),
+                       (3, {"lat": "19.2", "lng": "72.9", "description": "a, b"}),
+                       (4, "Expected 3 columns, got 1")]
+
+
+async def test_bulk_ndjson_reports_rejects_by_line(api):
+    http, db = api
+    await db.incidents.create_index("id", unique=True)
+    rows = [json.dumps(row(0, id="feed-1")), "{oops", json.dumps(row(1, severity=9)), "",
+            json.dumps(row(2)), json.dumps(row(3, id="feed-1"))]
+    response = await http.post("/api/incidents/bulk", content="\n".join(rows),
+                               headers={"content-type": server.NDJSON_MEDIA_TYPE})
+    result = response.json()
+
+    assert (result["accepted"], result["rejected"]) == (2, 3)
+    assert [reject["line"] for reject in result["rejects"]] == [2, 3, 6]
+    assert result["rejects"][1]["error"].startswith("severity")
+    assert await db.incidents.count_documents({}) == 2
+    assert server.incident_index.contains_id("feed-1")
+
+
+async def test_bulk_csv_ingest_folds_repeat_reports(api):
+    http, db = api
+    body = ("lat,lng,incident_type,severity,timestamp\n"
+            "19.05,72.85,theft,3,2026-01-01T00:00:00Z\n"
+            "19.0502,72.85,theft,4,2026-01-01T00:05:00Z\n"
+            "19.05,72.85,assault,2,\n"
+            "19.05,north,theft,3,\n")
+    response = await http.post("/api/incidents/bulk", content=body, headers={"content-type": "text/csv"})
+    result = response.json()
+
+    assert (result["accepted"], result["merged"], result["rejected"]) == (3, 1, 1)
+    assert result["rejects"][0]["line"] == 5
+    assert await db.incidents.count_documents({}) == 2
+    merged = await db.incidents.find_one({"incident_type": "theft"})
+    assert merged["report_count"] == 2 and merged["severity"] == 3
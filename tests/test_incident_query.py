@@ -0,0 +1,86 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+from incident_query import decode_cursor, encode_cursor, incident_filter, parse_bbox
+
+
+def incident(i, severity=3, timestamp="2026-01-01T00:00:00+00:00"):
+    return {"id": f"i{i:03d}", "lat": 19.05, "lng": 72.85, "incident_type": "theft", "severity": severity,
+            "timestamp": timestamp}
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    cursor = encode_cursor("2026-01-01T00:00:00+00:00", "ä-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2026-01-01T00:00:00+00:00", "ä-1")
+
+    for bad in ("not a cursor", encode_cursor("x", "y")[:-3], "WzEsMl0"):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_parse_bbox():
+    assert parse_bbox(None) is None
+    assert parse_bbox("19,72.8,19.1,72.9") == (19.0, 72.8, 19.1, 72.9)
+    for bad in ("19,72.8,19.1", "a,b,c,d", "19.1,72.8,19,72.9", "19,72.8,95,72.9"):
+        with pytest.raises(ValueError):
+            parse_bbox(bad)
+
+
+def test_incident_filter_combines_clauses():
+    assert incident_filter() == {}
+    assert incident_filter(min_severity=3) == {"severity": {"$gte": 3}}
+
+    query = incident_filter(since=datetime(2026, 1, 1), until=datetime(2026, 1, 2, tzinfo=timezone.utc),
+                            max_severity=4, cursor=("2026-01-01T12:00:00+00:00", "i5"))
+    assert query["$and"][0] == {"timestamp": {"$gte": "2026-01-01T00:00:00+00:00",
+                                              "$lt": "2026-01-02T00:00:00+00:00"}}
+    assert query["$and"][1] == {"severity": {"$lte": 4}}
+    assert query["$and"][2]["$or"][1] == {"timestamp": "2026-01-01T12:00:00+00:00", "id": {"$lt": "i5"}}
+
+
+@pytest.mark.anyio
+async def test_pages_follow_the_cursor_newest_first(api):
+    http, db = api
+    # Shared timestamps make the id tie-break matter
+    await db.incidents.insert_many([incident(i, timestamp=f"2026-01-0{1 + i % 3}T00:00:00+00:00") for i in range(7)])
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = await http.get("/api/incidents", params=params)
+        assert response.status_code == 200
+        ids.extend(doc["id"] for doc in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert ids == ["i005", "i002", "i004", "i001", "i006", "i003", "i000"]
+
+
+@pytest.mark.anyio
+async def test_filters_and_ndjson_export(api):
+    http, db = api
+    await db.incidents.insert_many([incident(i, severity=1 + i % 5) for i in range(10)])
+
+    response = await http.get("/api/incidents", params={"min_severity": 4, "format": "ndjson"})
+    assert response.headers["content-type"].startswith(server.NDJSON_MEDIA_TYPE)
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["id"] for row in rows) == ["i003", "i004", "i008", "i009"]
+
+    response = await http.get("/api/incidents", params={"limit": 2},
+                              headers={"Accept": server.NDJSON_MEDIA_TYPE})
+    assert len(response.text.splitlines()) == 2
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("params", [{"bbox": "19,72.8"}, {"cursor": "garbage"},
+                                    {"limit": server.INCIDENT_MAX_PAGE_SIZE + 1}])
+async def test_bad_listing_parameters_are_rejected(api, params):
+    http, _ = api
+    response = await http.get("/api/incidents", params=params)
+    assert response.status_code == 400
@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from haversine import haversine_to_many
+from incident_store import TAIL_MERGE_SIZE, IncidentSnapshot, IncidentStore
+
+PROJECTION = {"_id": 0, "location": 0}
+
+
+def incident(i, lat=19.05, lng=72.85, severity=3, incident_type="theft"):
+    return {"id": f"i{i}", "lat": lat, "lng": lng, "severity": severity, "incident_type": incident_type,
+            "timestamp": "2026-01-01T00:00:00+00:00"}
+
+
+def scattered(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [incident(i, float(lat), float(lng), int(severity))
+            for i, (lat, lng, severity) in enumerate(zip(rng.uniform(18.9, 19.3, count), rng.uniform(72.8, 73.0, count),
+                                                         rng.integers(1, 6, count)))]
+
+
+def test_add_and_extend_skip_known_ids():
+    store = IncidentStore()
+    assert store.add(incident(1))
+    assert not store.add(incident(1))
+    assert store.extend([incident(1), incident(2), incident(2)]) == 1
+
+    docs = scattered(TAIL_MERGE_SIZE + 10)
+    store.merge()
+    assert store.extend(docs) == len(docs) - 2
+    assert store.extend(docs) == 0
+    assert len(store) == len(docs)
+    assert store.contains_id("i5") and not store.contains_id("missing")
+
+
+def test_queries_see_the_same_rows_before_and_after_merge():
+    docs = scattered(500)
+    store = IncidentStore()
+    store.extend(docs)
+    before = store.within(19.1, 72.9, 2.0)
+    store.merge()
+    after = store.within(19.1, 72.9, 2.0)
+
+    assert len(before) == len(after) > 0
+    assert sorted(before.lat.tolist()) == sorted(after.lat.tolist())
+    lats = np.array([doc["lat"] for doc in docs])
+    lngs = np.array([doc["lng"] for doc in docs])
+    assert len(after) == int(np.count_nonzero(haversine_to_many(19.1, 72.9, lats, lngs) < 2.0))
+    assert store.types == ["theft"]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    store = IncidentStore()
+    store.extend(scattered(300))
+    store.add(incident(999, incident_type="assault", severity=5))
+    store.merge()
+    path = tmp_path / "incidents.bin"
+    store.save(path, {"watermark": None, "version": 7})
+
+    loaded, meta = IncidentStore.load(path)
+    assert meta["version"] == 7
+    assert len(loaded) == len(store)
+    assert loaded.types == store.types
+    for name, column in store.all()._asdict().items():
+        np.testing.assert_array_equal(getattr(loaded.all(), name), column)
+    # Mapped rows are read-only, but new rows still go to the tail
+    assert loaded.add(incident(1000))
+    assert len(loaded.within(19.05, 72.85, 0.1)) >= 1
+
+
+
+def test_non_ascii_ids_survive_merge_extend_and_save(tmp_path):
+    store = IncidentStore()
+    assert store.add({**incident(0), "id": "féed-1"})
+    store.merge()
+    assert store.contains_id("féed-1") and not store.contains_id("féed-2")
+
+    docs = [{**doc, "id": f"flux-ü-{doc['id']}"} for doc in scattered(TAIL_MERGE_SIZE)]
+    assert store.extend(docs) == len(docs)
+    assert store.extend(docs) == 0
+    assert store.add({**incident(0), "id": "事件"})
+    store.merge()
+
+    path = tmp_path / "incidents.bin"
+    store.save(path)
+    loaded, _ = IncidentStore.load(path)
+    assert all(loaded.contains_id(incident_id) for incident_id in ("féed-1", "事件", "flux-ü-i7"))
+    assert not loaded.add({**incident(0), "id": "féed-1"})
+
+
+@pytest.mark.anyio
+async def test_bulk_import_with_a_non_ascii_id(api):
+    http, db = api
+    body = '{"id": "féed-1", "lat": 19.1, "lng": 72.9, "incident_type": "theft", "severity": 3}'
+    response = await http.post("/api/incidents/bulk", content=body.encode(),
+                               headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 1
+
+    created = await http.post("/api/incidents", json={"lat": 19.2, "lng": 72.9, "incident_type": "theft",
+                                                      "severity": 2})
+    assert created.status_code == 200
+    assert await db.incidents.count_documents({}) == 2
+
+
+@pytest.fixture
+def collection():
+    return AsyncMongoMockClient()["safestpath_test"]["incidents"]
+
+
+def snapshot_of(collection, path, **kwargs):
+    return IncidentSnapshot("incidents", lambda: collection, PROJECTION, path=str(path), **kwargs)
+
+
+@pytest.mark.anyio
+async def test_load_file_catches_up_from_the_watermark(collection, tmp_path):
+    path = tmp_path / "incidents.bin"
+    await collection.insert_many(scattered(50))
+    first = snapshot_of(collection, path)
+    await first.reload()
+    assert path.exists() and first.saves == 1
+
+    # Inserted after the save, one of them with an ObjectId older than the watermark
+    late = first.watermark.generation_time - timedelta(seconds=60)
+    await collection.insert_many([{**incident(100), "_id": ObjectId.from_datetime(late)}, incident(101)])
+
+    restarted = snapshot_of(collection, path)
+    assert await restarted.load_file()
+    assert len(restarted.store) == 52
+    assert restarted.caught_up == 2
+    assert restarted.store.contains_id("i100") and restarted.store.contains_id("i101")
+    assert restarted.watermark > first.watermark
+
+
+@pytest.mark.anyio
+async def test_load_file_declines_a_file_missing_deletes_or_edits(collection, tmp_path):
+    path = tmp_path / "incidents.bin"
+    await collection.insert_many(scattered(50))
+    await snapshot_of(collection, path).reload()
+
+    await collection.update_one({"id": "i3"}, {"$inc": {"severity": 1}})
+    assert not await snapshot_of(collection, path).load_file()
+
+    await snapshot_of(collection, path).reload()
+    await collection.delete_one({"id": "i4"})
+    restarted = snapshot_of(collection, path)
+    assert not await restarted.load_file()
+    await restarted.reload()
+    assert len(restarted.store) == 49
+
+
+def test_documents_without_an_id_are_kept_apart():
+    store = IncidentStore()
+    assert store.extend([{**incident(0), "id": None}, {**incident(1), "id": None},
+                         {**incident(2), "id": None, "_id": ObjectId()}]) == 3
+    assert not store.contains_id("None")
+
+
+@pytest.mark.anyio
+async def test_watermark_advances_on_inserts(collection, tmp_path):
+    snapshot = snapshot_of(collection, tmp_path / "incidents.bin")
+    await snapshot.reload()
+    assert snapshot.watermark is None
+
+    newer = ObjectId.from_datetime(datetime.now(timezone.utc))
+    snapshot._saw_insert({**incident(1), "_id": newer})
+    snapshot.advance_watermark(ObjectId.from_datetime(datetime(2020, 1, 1, tzinfo=timezone.utc)))
+    assert snapshot.watermark == newer
+
+
+@pytest.mark.anyio
+async def test_only_the_writer_saves(collection, tmp_path):
+    path = tmp_path / "incidents.bin"
+    await collection.insert_many(scattered(10))
+    follower = snapshot_of(collection, path, is_writer=lambda: False)
+    await follower.reload()
+    assert not path.exists() and follower.saves == 0
+
+    leader = snapshot_of(collection, path)
+    await leader.reload()
+    assert path.exists() and leader.saves == 1
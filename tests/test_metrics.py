@@ -0,0 +1,43 @@
+import re
+
+import pytest
+
+from metrics import COUNT_BUCKETS, PROMETHEUS_MEDIA_TYPE, Registry
+
+SAMPLE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[0-9.e+-]+$')
+
+
+def test_counter_and_histogram_exposition():
+    registry = Registry()
+    requests = registry.counter("app_requests_total", "Requests", ("method",))
+    sizes = registry.histogram("app_batch_size", "Batch sizes", buckets=COUNT_BUCKETS)
+    requests.inc("GET")
+    requests.inc("GET")
+    requests.inc('P"O\nST')
+    for value in (0, 2, 7, 500):
+        sizes.observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP app_requests_total Requests", "# TYPE app_requests_total counter"]
+    assert 'app_requests_total{method="GET"} 2' in lines
+    assert 'app_requests_total{method="P\\"O\\nST"} 1' in lines
+    assert 'app_batch_size_bucket{le="0"} 1' in lines
+    assert 'app_batch_size_bucket{le="10"} 3' in lines
+    assert 'app_batch_size_bucket{le="+Inf"} 4' in lines
+    assert "app_batch_size_sum 509" in lines
+    assert "app_batch_size_count 4" in lines
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_serves_prometheus_text(api):
+    http, _ = api
+    await http.get("/api/stats")
+    response = await http.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == PROMETHEUS_MEDIA_TYPE
+    lines = response.text.splitlines()
+    assert response.text.endswith("\n")
+    assert any(line.startswith("safestpath_requests_total{") for line in lines)
+    for line in lines:
+        assert line.startswith("# HELP ") or line.startswith("# TYPE ") or SAMPLE.match(line), line
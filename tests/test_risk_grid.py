@@ -0,0 +1,117 @@
+import threading
+
+import numpy as np
+import pytest
+
+from haversine import haversine_to_many
+from risk_grid import RISK_RADIUS_KM, TOLLGATE_BONUS, RiskGrid
+
+BBOX = (19.0, 72.8, 19.1, 72.9)
+
+
+def incident(lat, lng, severity=5):
+    return {"lat": lat, "lng": lng, "severity": severity, "timestamp": "2026-01-01T00:00:00+00:00"}
+
+
+def test_rebuild_swaps_in_a_new_raster():
+    grid = RiskGrid(*BBOX, 0.001)
+    before = grid.risk
+    grid.rebuild([incident(19.05, 72.85)], [])
+
+    assert grid.risk is not before
+    assert not before.any()
+    assert grid.risk.max() > 0
+    assert grid.version == 1
+
+
+def test_rebuild_columns_matches_rebuild():
+    docs = [incident(19.05, 72.85, 5), incident(19.02, 72.81, 2)]
+    by_docs = RiskGrid(*BBOX, 0.001)
+    by_docs.rebuild(docs, [{"lat": 19.05, "lng": 72.85}])
+    by_columns = RiskGrid(*BBOX, 0.001)
+    by_columns.rebuild_columns(np.array([19.05, 19.02]), np.array([72.85, 72.81]), np.array([5, 2]),
+                               np.array([1767225600, 1767225600]), [{"lat": 19.05, "lng": 72.85}])
+
+    np.testing.assert_allclose(by_columns.risk, by_docs.risk, rtol=1e-5)
+
+
+def test_incidents_added_during_a_rebuild_reach_the_new_raster():
+    grid = RiskGrid(*BBOX, 0.001)
+    journal = grid.begin_rebuild()
+    stamping = threading.Event()
+    release = threading.Event()
+
+    def slow_incidents():
+        stamping.set()
+        release.wait(5)
+        yield incident(19.02, 72.82)
+
+    worker = threading.Thread(target=grid.rebuild, args=(slow_incidents(), [], journal))
+    worker.start()
+    stamping.wait(5)
+    # Not blocked by the rebuild, and visible on the current raster at once
+    grid.add_incidents([incident(19.08, 72.88)])
+    assert grid.risk[80, 80] > 0
+    release.set()
+    worker.join(5)
+
+    assert grid.risk[80, 80] > 0
+    assert grid.risk[20, 20] > 0
+    assert grid._journals == []
+
+
+def test_corridor_cells_age_the_aggregate_at_read_time():
+    grid = RiskGrid(*BBOX, 0.001)
+    route = [(19.02, 72.85), (19.08, 72.85)]
+    assert grid.corridor_cells(route, 0.5) is None
+
+    grid.rebuild([incident(19.05, 72.85), incident(19.05, 72.851), incident(19.05, 72.87)], [])
+    weights, counts, along = grid.corridor_cells(route, 0.5, grid.decay_epoch)
+    assert counts.sum() == 2
+    np.testing.assert_allclose(along, [3.336] * len(along), rtol=1e-3)
+
+    half_life = grid.decay.half_life_days * 86400
+    aged, _, _ = grid.corridor_cells(route, 0.5, grid.decay_epoch + half_life)
+    np.testing.assert_allclose(aged, weights / 2, rtol=1e-6)
+
+    # Part of the corridor lies outside the grid
+    assert grid.corridor_cells([(19.09, 72.85), (19.2, 72.85)], 0.5) is None
+    grid.clear()
+    assert grid.corridor_cells(route, 0.5) is None
+
+
+def test_stamp_covers_cells_within_the_radius():
+    grid = RiskGrid(*BBOX, 0.001)
+    grid.rebuild([incident(19.05, 72.85)], [])
+    rows, cols = np.nonzero(grid.risk)
+    centre_lats = BBOX[0] + rows * 0.001
+    centre_lngs = BBOX[1] + cols * 0.001
+
+    assert grid.risk[50, 50] > 0
+    np.testing.assert_allclose(grid.risk[rows, cols], grid.risk[50, 50])
+    assert haversine_to_many(19.05, 72.85, centre_lats, centre_lngs).max() < RISK_RADIUS_KM
+    # 0.5 km is ~4.5 cells north-south and ~4.75 cells east-west at this latitude
+    assert (rows.min(), rows.max(), cols.min(), cols.max()) == (46, 54, 46, 54)
+    assert grid.incident_count.sum() == 1 and grid.incident_count[50, 50] == 1
+
+
+def test_tollgates_lower_risk_and_stamps_clip_at_the_edge():
+    grid = RiskGrid(*BBOX, 0.001)
+    grid.rebuild([incident(19.0, 72.8)], [{"lat": 19.0, "lng": 72.8}])
+    severity_weight = grid.risk[0, 0] + TOLLGATE_BONUS
+
+    grid.rebuild([incident(19.0, 72.8)], [])
+    np.testing.assert_allclose(grid.risk[0, 0], severity_weight, rtol=1e-5)
+    assert grid.risk[:4, :4].all() and not grid.risk[10:, 10:].any()
+
+
+def test_adopt_checks_layer_shapes():
+    grid = RiskGrid(*BBOX, 0.001)
+    other = RiskGrid(*BBOX, 0.001)
+    other.rebuild([incident(19.05, 72.85)], [])
+    grid.adopt(other.layers(), other.decay_epoch)
+
+    assert grid.ready and grid.risk is other.risk
+    assert grid.memory_bytes() == 3 * 101 * 101 * 4
+    with pytest.raises(ValueError):
+        grid.adopt({"risk": np.zeros((3, 3), dtype=np.float32)}, other.decay_epoch)
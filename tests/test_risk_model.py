@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from risk_model import NO_TIMESTAMP, SECONDS_PER_DAY, DecayModel
+
+NOW = 1_780_000_000.0
+
+
+def test_column_weights_match_weight():
+    model = DecayModel(half_life_days=30)
+    severities = np.array([1, 3, 5, 9, 2], dtype=np.int8)
+    timestamps = np.array([NOW - 10 * SECONDS_PER_DAY, NOW - 30 * SECONDS_PER_DAY, NOW, NOW - 1, NOW - 400 * SECONDS_PER_DAY])
+    incidents = [{"severity": int(s), "timestamp": datetime.fromtimestamp(t, timezone.utc).isoformat()}
+                 for s, t in zip(severities, timestamps)]
+
+    expected = [model.weight(incident, NOW) for incident in incidents]
+    np.testing.assert_allclose(model.column_weights(severities, timestamps, NOW), expected)
+
+
+def test_column_weights_halve_every_half_life():
+    model = DecayModel(half_life_days=30)
+    weights = model.column_weights(np.array([5, 5]), np.array([NOW, NOW - 30 * SECONDS_PER_DAY]), NOW)
+    assert weights[1] == pytest.approx(weights[0] / 2)
+
+
+def test_missing_and_future_timestamps_count_as_now():
+    model = DecayModel(half_life_days=30)
+    reference = NOW - 60 * SECONDS_PER_DAY
+    weights = model.column_weights(np.array([5, 5, 5]), np.array([NO_TIMESTAMP, NOW + 3600, NOW]), reference, NOW)
+    assert weights[0] == pytest.approx(weights[2])
+    assert weights[1] == pytest.approx(weights[2])
+    # Relative to a reference two half-lives earlier
+    assert weights[2] == pytest.approx(4.0)
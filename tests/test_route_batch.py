@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+ROUTE = {"start_lat": 19.02, "start_lng": 72.84, "end_lat": 19.08, "end_lng": 72.88}
+
+
+def lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+async def post_batch(http, routes, **params):
+    response = await http.post("/api/routes/calculate/batch", json={"routes": routes}, params=params)
+    assert response.status_code == 200
+    return lines(response)
+
+
+async def test_batch_streams_one_line_per_item_in_order(api):
+    http, db = api
+    await http.post("/api/incidents", json={"lat": 19.05, "lng": 72.86, "incident_type": "theft", "severity": 2})
+    routes = [ROUTE, {**ROUTE, "start_lat": 123}, {**ROUTE, "end_lng": 72.881}]
+    results = await post_batch(http, routes * 10)
+
+    assert [line["index"] for line in results] == list(range(30))
+    for index, line in enumerate(results):
+        if index % 3 == 1:
+            assert line["result"] is None and line["error"]
+        else:
+            assert line["error"] is None
+            assert line["result"]["incident_count"] == 1
+            assert line["result"]["safest_route"][0] == {"lat": ROUTE["start_lat"], "lng": ROUTE["start_lng"]}
+
+
+async def test_batch_matches_the_single_route_endpoint(api):
+    http, _ = api
+    single = (await http.post("/api/routes/calculate", json=ROUTE)).json()
+    [line] = await post_batch(http, [ROUTE], geometry="polyline")
+
+    assert line["result"]["safety_score"] == single["safety_score"]
+    assert isinstance(line["result"]["safest_route"], str)
+
+
+async def test_batch_rejects_oversized_batches(api):
+    http, _ = api
+    response = await http.post("/api/routes/calculate/batch",
+                               json={"routes": [ROUTE] * (server.ROUTE_BATCH_MAX_ITEMS + 1)})
+    assert response.status_code == 400
+
+
+async def test_results_computed_across_a_version_bump_are_not_cached(api, monkeypatch):
+    http, _ = api
+    compute_routes = server.compute_routes
+
+    def compute_and_bump(*args):
+        results = compute_routes(*args)
+        # Data changed while the chunk was being computed
+        server.route_cache.bump_version()
+        return results
+
+    monkeypatch.setattr(server, "compute_routes", compute_and_bump)
+    route = {**ROUTE, "end_lat": 19.09}
+    await post_batch(http, [route])
+
+    assert server.route_cache.get(server.route_cache.key(*route.values())) is None
@@ -0,0 +1,48 @@
+from route_cache import RouteCache
+
+
+def test_nearby_requests_share_an_entry():
+    cache = RouteCache(precision_deg=0.001)
+    cache.put(cache.key(19.0, 72.85, 19.1, 72.9), "route")
+
+    assert cache.get(cache.key(19.0002, 72.8503, 19.1, 72.9)) == "route"
+    assert cache.get(cache.key(19.01, 72.85, 19.1, 72.9)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_incidents_evict_only_routes_whose_corridor_they_touch():
+    cache = RouteCache(precision_deg=0.001, corridor_km=1.0)
+    near = cache.key(19.0, 72.85, 19.1, 72.9)
+    far = cache.key(18.5, 73.5, 18.6, 73.6)
+    cache.put(near, "near")
+    cache.put(far, "far")
+
+    assert cache.invalidate_points([(19.05, 72.905)]) == 1
+    assert cache.get(near) is None
+    assert cache.get(far) == "far"
+
+
+def test_bump_version_retires_every_entry_and_rejects_stale_puts():
+    cache = RouteCache()
+    stale_key = cache.key(19.0, 72.85, 19.1, 72.9)
+    cache.put(stale_key, "route")
+    cache.bump_version()
+
+    assert len(cache) == 0
+    assert cache.key(19.0, 72.85, 19.1, 72.9) != stale_key
+    # A result computed before the bump must not be cached under the old version
+    cache.put(stale_key, "route")
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RouteCache(max_entries=2)
+    keys = [cache.key(19.0 + i / 10, 72.85, 19.5, 72.9) for i in range(3)]
+    cache.put(keys[0], 0)
+    cache.put(keys[1], 1)
+    cache.get(keys[0])
+    cache.put(keys[2], 2)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == 0
+    assert cache.evictions == 1
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from route_executor import Overloaded, RouteExecutor
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_results_and_admission_limit():
+    executor = RouteExecutor(max_workers=1, max_pending=1)
+    assert await executor.run(sum, [1, 2, 3]) == 6
+    assert executor.pending == 0
+
+    release = threading.Event()
+    task = asyncio.ensure_future(executor.run(release.wait, 5))
+    await asyncio.sleep(0.01)
+    with pytest.raises(Overloaded):
+        await executor.run(sum, [1])
+    release.set()
+    assert await task is True
+    executor.shutdown()
+
+
+async def test_timeout_frees_the_slot_and_retires_a_stuck_pool():
+    executor = RouteExecutor(max_workers=1, max_pending=1, timeout_seconds=0.05)
+    release = threading.Event()
+    with pytest.raises(asyncio.TimeoutError):
+        await executor.run(release.wait, 5)
+
+    assert executor.pending == 0
+    assert (executor.abandoned, executor.retired_pools) == (1, 1)
+    # The stuck thread is still running, yet new work is admitted and served at once
+    started = time.perf_counter()
+    assert await executor.run(sum, [1, 2]) == 3
+    assert time.perf_counter() - started < 1
+    release.set()
+    executor.shutdown()
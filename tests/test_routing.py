@@ -0,0 +1,94 @@
+import heapq
+import math
+
+import numpy as np
+import pytest
+
+from routing import MIN_COST_FACTOR, RISK_WEIGHT, TIE_BREAK_WEIGHT, RoadGraph, polyline_length, simplify_lattice_path
+
+BBOX = (19.0, 72.8, 19.03, 72.83)
+STEP = 0.001
+
+
+def dijkstra_cost(graph, source, target, use_risk=False):
+    """Reference search over the CSR arrays, without a heuristic or search window"""
+    best = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if node == target:
+            return cost
+        if cost > best[node]:
+            continue
+        for edge in range(graph.indptr[node], graph.indptr[node + 1]):
+            neighbour = int(graph.indices[edge])
+            edge_cost = float(graph.lengths[edge])
+            if use_risk:
+                edge_cost *= max(MIN_COST_FACTOR,
+                                 1 + RISK_WEIGHT * (graph.node_risk[node] + graph.node_risk[neighbour]) / 2)
+            if cost + edge_cost < best.get(neighbour, math.inf):
+                best[neighbour] = cost + edge_cost
+                heapq.heappush(heap, (cost + edge_cost, neighbour))
+    return math.inf
+
+
+def path_cost(graph, nodes, use_risk=False):
+    total = 0.0
+    for a, b in zip(nodes, nodes[1:]):
+        edge = next(e for e in range(graph.indptr[a], graph.indptr[a + 1]) if graph.indices[e] == b)
+        factor = max(MIN_COST_FACTOR, 1 + RISK_WEIGHT * (graph.node_risk[a] + graph.node_risk[b]) / 2)
+        total += float(graph.lengths[edge]) * (factor if use_risk else 1.0)
+    return total
+
+
+def test_lattice_shape_and_nearest_node():
+    graph = RoadGraph(*BBOX, STEP)
+
+    assert (graph.rows, graph.cols) == (31, 31)
+    # Interior nodes have 8 neighbours, corners 3, other edge nodes 5
+    assert graph.edge_count == 29 * 29 * 8 + 4 * 29 * 5 + 4 * 3
+    assert graph.node_coords(graph.nearest_node(19.0104, 72.8196)) == pytest.approx((19.010, 72.820))
+    assert graph.nearest_node(18.9, 72.81) is None
+
+
+@pytest.mark.parametrize("use_risk", [False, True])
+def test_a_star_matches_dijkstra(use_risk):
+    rng = np.random.default_rng(7)
+    graph = RoadGraph(*BBOX, STEP, node_risk=rng.uniform(-0.1, 1.0, 31 * 31).astype(np.float32))
+    for _ in range(5):
+        source, target = (int(node) for node in rng.integers(0, graph.node_count, 2))
+        nodes = graph.shortest_path(source, target, use_risk=use_risk, margin_km=10)
+
+        assert nodes[0] == source and nodes[-1] == target
+        expected = dijkstra_cost(graph, source, target, use_risk)
+        assert path_cost(graph, nodes, use_risk) == pytest.approx(expected, rel=TIE_BREAK_WEIGHT - 1 + 1e-6)
+
+
+def test_safest_route_goes_around_a_risky_band():
+    risk = np.zeros((31, 31), dtype=np.float32)
+    # A wall of risk across the middle with a gap at the east edge
+    risk[15, :28] = 5.0
+    graph = RoadGraph(*BBOX, STEP, node_risk=risk.reshape(-1))
+
+    shortest = graph.route(19.005, 72.815, 19.025, 72.815)
+    safest = graph.route(19.005, 72.815, 19.025, 72.815, use_risk=True)
+
+    assert shortest[0] == (19.005, 72.815) and shortest[-1] == (19.025, 72.815)
+    assert polyline_length(shortest) == pytest.approx(2.224, rel=0.01)
+    crossing = [lng for lat, lng in safest if abs(lat - 19.015) < 1e-9]
+    assert crossing and min(crossing) >= 72.828 - 1e-9
+    assert graph.route(18.9, 72.815, 19.025, 72.815) is None
+
+
+def test_set_node_risk_and_shared_arrays():
+    graph = RoadGraph(*BBOX, STEP)
+    with pytest.raises(ValueError):
+        graph.set_node_risk(np.zeros(5, dtype=np.float32))
+
+    copy = RoadGraph.from_arrays(*BBOX, STEP, graph.edge_arrays())
+    assert copy.route(19.001, 72.801, 19.02, 72.82) == graph.route(19.001, 72.801, 19.02, 72.82)
+
+
+def test_simplify_lattice_path_keeps_turns():
+    assert simplify_lattice_path([0, 1, 2, 3, 34, 65, 66]) == [0, 3, 65, 66]
+    assert simplify_lattice_path([4, 5]) == [4, 5]
@@ -0,0 +1,19 @@
+import numpy as np
+
+from serialization import decode_polyline, encode_polyline
+
+
+def test_polyline_encoding_matches_the_reference_example():
+    points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    encoded = encode_polyline(points)
+
+    assert encoded == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert decode_polyline(encoded) == points
+
+
+def test_polyline_round_trip_at_precision():
+    rng = np.random.default_rng(3)
+    points = list(zip(rng.uniform(-89, 89, 50).round(6).tolist(), rng.uniform(-179, 179, 50).round(6).tolist()))
+    for precision in (5, 6):
+        decoded = decode_polyline(encode_polyline(points, precision), precision)
+        np.testing.assert_allclose(decoded, points, atol=0.5 / 10 ** precision + 1e-12)
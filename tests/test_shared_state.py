@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from risk_grid import RiskGrid
+from shared_state import SharedArrayStore
+
+
+def test_one_leader_per_directory(tmp_path):
+    first, second = SharedArrayStore(tmp_path), SharedArrayStore(tmp_path)
+
+    assert first.try_lead() and first.try_lead()
+    assert not second.try_lead() and not second.is_leader
+    # The lock goes with the leader's file (its process exiting)
+    first._lock_file.close()
+    assert second.try_lead()
+
+
+def test_followers_map_the_latest_generation(tmp_path):
+    leader, follower = SharedArrayStore(tmp_path), SharedArrayStore(tmp_path)
+    assert follower.generation("risk") is None and follower.load("risk") is None
+
+    layer = np.arange(12, dtype=np.float32).reshape(3, 4)
+    assert leader.publish("risk", {"risk": layer}, {"decay_epoch": 1.5}) == 1
+    generation, arrays, meta = follower.load("risk")
+
+    assert (generation, meta) == (1, {"decay_epoch": 1.5})
+    np.testing.assert_array_equal(arrays["risk"], layer)
+    # Copy-on-write: patching the mapped array leaves the published file alone
+    arrays["risk"][0, 0] = 99
+    np.testing.assert_array_equal(follower.load("risk")[1]["risk"], layer)
+
+
+def test_publish_prunes_old_generations(tmp_path):
+    store = SharedArrayStore(tmp_path, keep=2)
+    for value in range(4):
+        store.publish("graph", {"lengths": np.full(3, value)})
+
+    assert store.generation("graph") == 4
+    assert sorted(path.name for path in tmp_path.glob("graph-*")) == ["graph-3", "graph-4"]
+    assert store.load("graph")[1]["lengths"].tolist() == [3, 3, 3]
+    assert store.stats()["published"] == 4
+
+
+def test_risk_layers_survive_the_round_trip(tmp_path):
+    built = RiskGrid(19.0, 72.8, 19.1, 72.9, 0.001)
+    built.rebuild([{"lat": 19.05, "lng": 72.85, "severity": 5, "timestamp": "2026-01-01T00:00:00+00:00"}], [])
+    SharedArrayStore(tmp_path).publish("risk", built.layers(), {"decay_epoch": built.decay_epoch})
+
+    _, layers, meta = SharedArrayStore(tmp_path).load("risk")
+    mapped = RiskGrid(19.0, 72.8, 19.1, 72.9, 0.001)
+    mapped.adopt(layers, meta["decay_epoch"])
+
+    np.testing.assert_array_equal(mapped.incident_count, built.incident_count)
+    assert mapped.corridor_cells([(19.02, 72.85), (19.08, 72.85)], 0.5, built.decay_epoch)[1].sum() == 1
+    with pytest.raises(ValueError):
+        RiskGrid(19.0, 72.8, 19.2, 72.9, 0.001).adopt(layers, meta["decay_epoch"])
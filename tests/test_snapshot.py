@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from snapshot import CollectionSnapshot
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeStream:
+    def __init__(self):
+        self.changes = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        change = await self.changes.get()
+        if change is None:
+            raise StopAsyncIteration
+        return change
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return list(self.docs)
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.stream = FakeStream()
+
+    async def count_documents(self, query):
+        return len(self.docs)
+
+    def find(self, query, projection=None):
+        return FakeCursor(self.docs)
+
+    def watch(self):
+        return self.stream
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_ttl_does_not_expire_the_copy_while_the_change_stream_is_live():
+    collection = FakeCollection([{"id": "a"}])
+    snapshot = CollectionSnapshot("things", lambda: collection, ttl_seconds=0)
+    await snapshot.reload()
+    watcher = asyncio.create_task(snapshot.watch(lambda doc: snapshot.apply_insert(doc)))
+    await settle()
+
+    assert snapshot.watching
+    await snapshot.get()
+    assert (snapshot.hits, snapshot.reloads) == (1, 1)
+
+    await collection.stream.changes.put(None)
+    await watcher
+    assert not snapshot.watching
+    await snapshot.get()
+    await settle()
+    assert snapshot.reloads == 2
+
+
+async def test_updates_to_ignored_fields_do_not_invalidate():
+    collection = FakeCollection([{"id": "a"}])
+    snapshot = CollectionSnapshot("things", lambda: collection)
+    await snapshot.reload()
+    watcher = asyncio.create_task(snapshot.watch(lambda doc: snapshot.apply_insert(doc),
+                                                 ignored_fields=("report_count",)))
+    await settle()
+
+    await collection.stream.changes.put({"operationType": "update",
+                                         "updateDescription": {"updatedFields": {"report_count": 2}}})
+    await collection.stream.changes.put({"operationType": "insert", "fullDocument": {"_id": 1, "id": "b"}})
+    await settle()
+    assert snapshot.invalidations == 0
+    assert [doc["id"] for doc in snapshot.docs] == ["a", "b"]
+
+    await collection.stream.changes.put({"operationType": "update",
+                                         "updateDescription": {"updatedFields": {"severity": 5}}})
+    await settle()
+    assert snapshot.invalidations == 1
+    await collection.stream.changes.put(None)
+    await watcher
+
+
+async def test_periodic_rebuild_re_bases_the_risk_grid(api, monkeypatch):
+    import server
+
+    epoch = server.risk_grid.decay_epoch
+    sleeps = 0
+
+    async def sleep(_seconds):
+        nonlocal sleeps
+        sleeps += 1
+        if sleeps > 2:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(server.asyncio, "sleep", sleep)
+    with pytest.raises(asyncio.CancelledError):
+        await server.run_derived_state_rebuilds(3600)
+    assert server.risk_grid.decay_epoch > epoch
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import PyMongoError
+
+from stats_counters import StatsCounters, route_bucket
+
+
+class FailingCollection:
+    async def find_one_and_update(self, *args, **kwargs):
+        raise PyMongoError("down")
+
+
+def test_route_bucket_is_hourly_utc():
+    now = datetime(2026, 3, 1, 5, 59, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    assert route_bucket(now) == "2026-03-01T00:00Z"
+
+
+def test_collection_totals_and_route_buckets():
+    counters = StatsCounters(lambda: None)
+    counters.recount_columns(np.array([1, 4, 5, 3]), [{}, {}])
+    counters.record_incident({"severity": 4})
+    counters.record_incident({"severity": 2})
+    now = datetime.now(timezone.utc)
+    counters.record_routes(3, now)
+    counters.record_routes(2, now - timedelta(hours=30))
+    counters.record_routes(0)
+
+    assert (counters.total_incidents, counters.high_risk_areas, counters.total_tollgates) == (6, 3, 2)
+    assert counters.routes_calculated == 5
+    assert counters.routes_by_hour() == {route_bucket(now): 3}
+    assert sum(counters.routes_by_hour(48).values()) == 5
+
+
+@pytest.mark.anyio
+async def test_flush_merges_counts_from_every_worker():
+    collection = AsyncMongoMockClient()["stats"]["counters"]
+    first, second = StatsCounters(lambda: collection), StatsCounters(lambda: collection)
+    first.record_routes(2)
+    second.record_routes(3)
+    await first.flush()
+    await second.flush()
+
+    assert second.routes_calculated == 5
+    await first.flush()
+    assert first.routes_calculated == 5 and first.flushes == 2
+
+    restarted = StatsCounters(lambda: collection)
+    await restarted.load()
+    assert restarted.routes_by_hour() == {route_bucket(): 5}
+
+
+@pytest.mark.anyio
+async def test_failed_flush_keeps_pending_counts():
+    counters = StatsCounters(lambda: FailingCollection())
+    counters.record_routes(4)
+    with pytest.raises(PyMongoError):
+        await counters.flush()
+    assert counters.routes_calculated == 4 and counters.flushes == 0
+
+
+@pytest.mark.anyio
+async def test_flush_prunes_old_buckets():
+    collection = AsyncMongoMockClient()["stats"]["counters"]
+    counters = StatsCounters(lambda: collection, buckets_kept=2)
+    now = datetime.now(timezone.utc)
+    for hours in range(4):
+        counters.record_routes(1, now - timedelta(hours=hours))
+    await counters.flush()
+
+    doc = await collection.find_one({"_id": counters.doc_id})
+    assert sorted(doc["routes_by_hour"]) == [route_bucket(now - timedelta(hours=1)), route_bucket(now)]
+    assert doc["routes_calculated"] == 4
+
+
+@pytest.mark.anyio
+async def test_stats_endpoint_counts_reports_and_routes(api):
+    http, _ = api
+    before = (await http.get("/api/stats")).json()
+    await http.post("/api/incidents", json={"lat": 19.05, "lng": 72.85, "incident_type": "theft", "severity": 5})
+    await http.post("/api/routes/calculate",
+                    json={"start_lat": 19.02, "start_lng": 72.84, "end_lat": 19.08, "end_lng": 72.88})
+    after = (await http.get("/api/stats")).json()
+
+    assert after["total_incidents"] == before["total_incidents"] + 1
+    assert after["high_risk_areas"] == before["high_risk_areas"] + 1
+    assert after["safe_routes_calculated"] == before["safe_routes_calculated"] + 1
+    assert after["routes_by_hour"][route_bucket()] >= 1
@@ -0,0 +1,36 @@
+import pytest
+
+from incident_store import IncidentStore
+from spatial_index import SpatialIndex
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("field, value", [("start_lat", 95), ("end_lat", -91), ("start_lng", 181), ("end_lng", -200)])
+async def test_route_coordinates_out_of_range_are_rejected(api, field, value):
+    http, _ = api
+    body = {"start_lat": 19.0, "start_lng": 72.85, "end_lat": 19.1, "end_lng": 72.9, field: value}
+    response = await http.post("/api/routes/calculate", json=body)
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("field, value", [("lat", 90.5), ("lng", 180.5)])
+async def test_incident_coordinates_out_of_range_are_rejected(api, field, value):
+    http, db = api
+    body = {"lat": 19.1, "lng": 72.9, "incident_type": "theft", "severity": 3, field: value}
+    response = await http.post("/api/incidents", json=body)
+    assert response.status_code == 422
+    assert await db.incidents.count_documents({}) == 0
+
+
+def test_polyline_candidates_near_a_pole_fall_back_to_the_bounding_box():
+    doc = {"id": "polar", "lat": 89.99, "lng": 120.0, "severity": 3,
+           "timestamp": "2026-01-01T00:00:00+00:00", "incident_type": "theft"}
+    index = SpatialIndex()
+    index.insert(doc)
+    store = IncidentStore()
+    store.add(doc)
+
+    polyline = [(89.99, 170.0), (89.995, 171.0)]
+    assert index.polyline_candidates(polyline, 0.5) == [doc]
+    assert len(store.polyline_candidates(polyline, 0.5)) == 1